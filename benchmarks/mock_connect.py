@@ -0,0 +1,170 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import json
+import random
+import threading
+import time
+from collections import Counter
+from functools import partial
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+
+class SyntheticCluster:
+    """Generates the REST API view of a Kafka Connect cluster of any size on demand instead of reading fixtures.
+
+    Every connector's status is derived from the seed and the connector's index, so the same cluster can be
+    regenerated for each request without holding thousands of statuses in memory.
+    """
+
+    def __init__(self, connectors=100, tasks_per_connector=4, workers=3, failure_ratio=0.0, trace_lines=40, seed=0):
+        self.connectors = connectors
+        self.tasks_per_connector = tasks_per_connector
+        self.workers = workers
+        self.failure_ratio = failure_ratio
+        self.trace_lines = trace_lines
+        self.seed = seed
+        self.trace = "org.apache.kafka.connect.errors.ConnectException: synthetic failure\n" + "\n".join(
+            "\tat org.apache.kafka.connect.runtime.WorkerTask.frame{}(WorkerTask.java:{})".format(i, 100 + i)
+            for i in range(trace_lines)
+        )
+
+    def get_connector_names(self):
+        return ["connector-{}".format(index) for index in range(self.connectors)]
+
+    def iter_statuses(self):
+        for index in range(self.connectors):
+            yield self.get_status(index)
+
+    def get_status(self, index):
+        rng = random.Random(self.seed * 1000003 + index)
+        name = "connector-{}".format(index)
+        tasks = []
+        for task_id in range(self.tasks_per_connector):
+            task = {"id": task_id, "state": "RUNNING", "worker_id": self.get_worker_id(index + task_id)}
+            if rng.random() < self.failure_ratio:
+                task["state"] = "FAILED"
+                task["trace"] = self.trace
+            tasks.append(task)
+        return {
+            "name": name,
+            "connector": {
+                "state": "FAILED" if rng.random() < self.failure_ratio else "RUNNING",
+                "worker_id": self.get_worker_id(index)
+            },
+            "tasks": tasks,
+            "type": "sink" if index % 2 else "source"
+        }
+
+    def get_worker_id(self, index):
+        return "worker-{}:8083".format(index % self.workers)
+
+    def get_index(self, connector_name):
+        prefix, _, index = connector_name.rpartition("-")
+        if prefix != "connector" or not index.isdigit() or int(index) >= self.connectors:
+            return None
+        return int(index)
+
+
+class MockConnectRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately; without TCP_NODELAY keep-alive clients stall on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def __init__(self, mock_server, *args, **kwargs):
+        self.mock_server = mock_server
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.mock_server.record_request(url.path, url.query)
+        if self.mock_server.latency > 0:
+            time.sleep(self.mock_server.latency)
+
+        cluster = self.mock_server.cluster
+        parts = url.path.strip("/").split("/")
+        if parts == ["connectors"]:
+            if "status" in parse_qs(url.query).get("expand", []):
+                payload = {status["name"]: {"status": status} for status in cluster.iter_statuses()}
+            else:
+                payload = cluster.get_connector_names()
+            self.respond(200, payload)
+        elif len(parts) in [2, 3] and parts[0] == "connectors" and cluster.get_index(parts[1]) is not None:
+            index = cluster.get_index(parts[1])
+            if len(parts) == 3 and parts[2] == "status":
+                self.respond(200, cluster.get_status(index))
+            elif len(parts) == 2:
+                self.respond(200, {"name": parts[1], "config": {}, "tasks": [], "type": "source"})
+            else:
+                self.respond(404, {"error_code": 404, "message": "Not found"})
+        else:
+            self.respond(404, {"error_code": 404, "message": "Not found"})
+
+    def respond(self, status_code, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        return
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class MockConnectServer:
+    """Serves a SyntheticCluster over HTTP with optional injected latency and counts the requests it receives."""
+
+    def __init__(self, cluster, latency=0.0, port=0):
+        self.cluster = cluster
+        self.latency = latency
+        self.request_counts = Counter()
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("localhost", port), partial(MockConnectRequestHandler, self))
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return "http://localhost:{}".format(self.httpd.server_address[1])
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def record_request(self, path, query):
+        if path.endswith("/status"):
+            endpoint = "connector_status"
+        elif path.strip("/") == "connectors":
+            endpoint = "connectors_expanded" if "expand" in query else "connectors"
+        else:
+            endpoint = "connector_details"
+        with self.lock:
+            self.request_counts[endpoint] += 1
+
+    def reset_counts(self):
+        with self.lock:
+            counts = dict(self.request_counts)
+            self.request_counts.clear()
+        return counts
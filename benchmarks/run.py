@@ -0,0 +1,219 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+"""Benchmarks the healthcheck against a synthetic Kafka Connect cluster.
+
+For each mode, a healthcheck process is started against a generated mock Connect server and probed with concurrent
+requests. Probe latency percentiles, probes per second, upstream requests per probe and the peak RSS of the
+healthcheck process are reported so performance regressions can be caught.
+
+Usage: python -m benchmarks.run --connectors 1000 --tasks 4 --latency 0.005 --modes threaded-bulk,asyncio-bulk
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from benchmarks.mock_connect import MockConnectServer, SyntheticCluster
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+MODES = {
+    "threaded-bulk": {"HEALTHCHECK_ENGINE": "threaded", "HEALTHCHECK_COLLECTION_MODE": "bulk"},
+    "threaded-per-connector": {"HEALTHCHECK_ENGINE": "threaded", "HEALTHCHECK_COLLECTION_MODE": "per-connector"},
+    "threaded-adaptive": {"HEALTHCHECK_ENGINE": "threaded", "HEALTHCHECK_COLLECTION_MODE": "per-connector",
+                          "HEALTHCHECK_ADAPTIVE_POLLING": "true"},
+    "threaded-poll": {"HEALTHCHECK_ENGINE": "threaded", "HEALTHCHECK_POLL_INTERVAL": "1"},
+    "asyncio-bulk": {"HEALTHCHECK_ENGINE": "asyncio", "HEALTHCHECK_COLLECTION_MODE": "bulk"},
+    "asyncio-per-connector": {"HEALTHCHECK_ENGINE": "asyncio", "HEALTHCHECK_COLLECTION_MODE": "per-connector"},
+    "asyncio-poll": {"HEALTHCHECK_ENGINE": "asyncio", "HEALTHCHECK_POLL_INTERVAL": "1"},
+}
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="Benchmark kafka-connect-healthcheck against a synthetic Kafka Connect cluster.")
+    parser.add_argument("--connectors", type=int, default=500, help="Number of connectors in the cluster. Default: 500.")
+    parser.add_argument("--tasks", type=int, default=4, help="Number of tasks per connector. Default: 4.")
+    parser.add_argument("--workers", type=int, default=3, help="Number of Connect workers. Default: 3.")
+    parser.add_argument("--failure-ratio", type=float, default=0.01, help="Ratio of failed connectors and tasks. Default: 0.01.")
+    parser.add_argument("--trace-lines", type=int, default=40, help="Number of stack trace lines per failed task. Default: 40.")
+    parser.add_argument("--latency", type=float, default=0.002, help="Seconds of latency injected per REST call. Default: 0.002.")
+    parser.add_argument("--probes", type=int, default=200, help="Number of probes sent per mode. Default: 200.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent probe clients. Default: 8.")
+    parser.add_argument("--path", default="/", help="The healthcheck path to probe. Default: /.")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma separated modes to run. Default: all.")
+    parser.add_argument("--extra-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Additional environment variables passed to every healthcheck process.")
+    parser.add_argument("--json", dest="json_output", help="Also write the results as JSON to this file.")
+    return parser
+
+
+def get_free_port():
+    s = socket.socket(socket.AF_INET, type=socket.SOCK_STREAM)
+    s.bind(("localhost", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def get_peak_rss_kb(pid):
+    try:
+        with open("/proc/{}/status".format(pid), "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (IOError, OSError):
+        pass
+    return None
+
+
+def get_percentile(sorted_values, percentile):
+    if not sorted_values:
+        return None
+    index = min(int(round(percentile * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def start_healthcheck(connect_url, mode_env, extra_env):
+    port = get_free_port()
+    env = os.environ.copy()
+    env.update({"HEALTHCHECK_PORT": str(port), "HEALTHCHECK_CONNECT_URL": connect_url, "HEALTHCHECK_LOG_LEVEL": "ERROR"})
+    env.update(mode_env)
+    env.update(extra_env)
+    process = subprocess.Popen([sys.executable, "-m", "kafka_connect_healthcheck.main"], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = "http://localhost:{}".format(port)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if requests.get("{}/ping".format(url), timeout=1).status_code == 200:
+                return process, url
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("Healthcheck process did not start within 30 seconds")
+
+
+def send_probes(url, probe_count, concurrency):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    remaining = [probe_count]
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                response = session.get(url, timeout=60)
+                response.content
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            except requests.exceptions.RequestException as ex:
+                with lock:
+                    errors.append(ex)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def run_mode(mode, mock_server, args, extra_env):
+    process, url = start_healthcheck(mock_server.url, MODES[mode], extra_env)
+    try:
+        send_probes(url + args.path, 1, 1)
+        mock_server.reset_counts()
+        latencies, errors, elapsed = send_probes(url + args.path, args.probes, args.concurrency)
+        upstream_counts = mock_server.reset_counts()
+        peak_rss_kb = get_peak_rss_kb(process.pid)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    latencies.sort()
+    upstream_requests = sum(upstream_counts.values())
+    return {
+        "mode": mode,
+        "probes": len(latencies),
+        "errors": len(errors),
+        "p50_ms": to_ms(get_percentile(latencies, 0.50)),
+        "p95_ms": to_ms(get_percentile(latencies, 0.95)),
+        "p99_ms": to_ms(get_percentile(latencies, 0.99)),
+        "probes_per_second": round(len(latencies) / elapsed, 1) if elapsed > 0 else None,
+        "upstream_requests": upstream_requests,
+        "upstream_requests_per_probe": round(upstream_requests / max(len(latencies), 1), 2),
+        "upstream_counts": upstream_counts,
+        "peak_rss_mb": round(peak_rss_kb / 1024.0, 1) if peak_rss_kb is not None else None
+    }
+
+
+def to_ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def print_results(results):
+    columns = ["mode", "probes", "errors", "p50_ms", "p95_ms", "p99_ms", "probes_per_second", "upstream_requests_per_probe",
+               "peak_rss_mb"]
+    widths = [max(len(column), *(len(str(result[column])) for result in results)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result[column]).ljust(width) for column, width in zip(columns, widths)))
+
+
+def main():
+    args = get_parser().parse_args()
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown_modes = [mode for mode in modes if mode not in MODES]
+    if unknown_modes:
+        sys.exit("Unknown modes: {}. Valid modes: {}".format(", ".join(unknown_modes), ", ".join(MODES)))
+    extra_env = dict(item.split("=", 1) for item in args.extra_env)
+
+    cluster = SyntheticCluster(args.connectors, args.tasks, args.workers, args.failure_ratio, args.trace_lines)
+    mock_server = MockConnectServer(cluster, args.latency).start()
+    print("Synthetic cluster: {} connectors, {} tasks each, {} workers, failure ratio {}, {}s latency".format(
+        args.connectors, args.tasks, args.workers, args.failure_ratio, args.latency
+    ))
+    try:
+        results = [run_mode(mode, mock_server, args, extra_env) for mode in modes]
+    finally:
+        mock_server.stop()
+
+    print_results(results)
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
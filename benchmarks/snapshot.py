@@ -0,0 +1,191 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+"""Compares the columnar status snapshot with nested status dicts for a large synthetic cluster.
+
+Both representations are built from the same decoded GET /connectors?expand=status response and evaluated in process,
+without HTTP, so only the in-memory model is measured: the memory retained between evaluations, the CPU time of reading
+the response into the model, and the CPU time of failure collection, per-worker filtering and the threshold check. The
+dict path is the evaluation the healthcheck ran before statuses were stored in a StatusSnapshot; the snapshot path fills
+its columns straight from the response, as the healthcheck does in bulk mode.
+
+Usage: python -m benchmarks.snapshot --connectors 10000 --tasks 4 --worker-id worker-0:8083
+"""
+
+import argparse
+import gc
+import json
+import logging
+import time
+import tracemalloc
+
+from benchmarks.mock_connect import SyntheticCluster
+from kafka_connect_healthcheck import health
+from kafka_connect_healthcheck import snapshots
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="Compare the columnar status snapshot with nested status dicts.")
+    parser.add_argument("--connectors", type=int, default=10000, help="Number of connectors in the cluster. Default: 10000.")
+    parser.add_argument("--tasks", type=int, default=4, help="Number of tasks per connector. Default: 4.")
+    parser.add_argument("--workers", type=int, default=10, help="Number of Connect workers. Default: 10.")
+    parser.add_argument("--failure-ratio", type=float, default=0.01, help="Ratio of failed connectors and tasks. Default: 0.01.")
+    parser.add_argument("--worker-id", default=None, help="Evaluate the health of this worker only. Default: all workers.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed evaluations per path. Default: 5.")
+    parser.add_argument("--json", dest="json_output", help="Also write the results as JSON to this file.")
+    return parser
+
+
+def build_dicts(health_object, expanded):
+    statuses = []
+    for name, value in expanded.items():
+        try:
+            statuses.append(health_object.parse_connector_status(name, value["status"]))
+        except Exception as ex:
+            statuses.append(health_object.get_connector_error(name, ex))
+    return statuses
+
+
+def build_snapshot(health_object, expanded):
+    return snapshots.StatusSnapshot.from_expanded(expanded, health_object.get_connector_error)
+
+
+def evaluate_dicts(health_object, connector_statuses):
+    health_result = health_object.new_health_result()
+    for connector in connector_statuses:
+        if "error" in connector:
+            if "connector" in health_object.considered_containers:
+                health_result["failures"].append(get_dict_connector_failure(connector))
+            continue
+        if health_object.is_on_this_worker(connector["worker_id"]) and "connector" in health_object.considered_containers:
+            if health_object.is_in_unhealthy_state(connector["state"]):
+                health_result["failures"].append(get_dict_connector_failure(connector))
+        if "task" in health_object.considered_containers:
+            for task in connector["tasks"]:
+                if health_object.is_on_this_worker(task["worker_id"]) and health_object.is_in_unhealthy_state(task["state"]):
+                    health_result["failures"].append({"type": "task", "connector": connector["name"], "id": task["id"],
+                                                      "state": task["state"], "worker_id": task["worker_id"],
+                                                      "trace": task.get("trace", None)})
+
+    container_count = 0
+    if "connector" in health_object.considered_containers:
+        container_count += len(connector_statuses)
+    if "task" in health_object.considered_containers:
+        container_count += sum(len(c["tasks"]) for c in connector_statuses)
+    failure_count = len([f for f in health_result["failures"] if f["type"] in health_object.considered_containers])
+    health_result["failure_rate"] = failure_count / container_count if container_count > 0 else 0.0
+    health_result["failure_threshold"] = health_object.failure_threshold
+    health_result["healthy"] = health_result["failure_rate"] <= health_result["failure_threshold"]
+    if any([f for f in health_result["failures"] if f["type"] == "broker"]):
+        health_result["healthy"] = False
+    return health_result
+
+
+def get_dict_connector_failure(connector):
+    failure = {"type": "connector", "connector": connector["name"], "state": connector["state"], "worker_id": connector["worker_id"]}
+    if "error" in connector:
+        failure["error"] = connector["error"]
+    return failure
+
+
+def evaluate_snapshot(health_object, snapshot):
+    health_result = health_object.new_health_result()
+    health_object.handle_connectors_healthcheck(snapshot, health_result)
+    health_object.calculate_health_result(snapshot, health_result)
+    return health_result
+
+
+def measure_retained_bytes(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    model = build()
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return model, retained
+
+
+def time_median(function, model, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(model)
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    return result, durations[len(durations) // 2]
+
+
+def run(args):
+    cluster = SyntheticCluster(args.connectors, args.tasks, args.workers, args.failure_ratio)
+    payload = json.dumps({status["name"]: {"status": status} for status in cluster.iter_statuses()})
+    health_object = health.Health("http://localhost:8083", args.worker_id, ["FAILED"], None, 0, ["connector", "task"])
+
+    # decoding the response costs both paths the same, so builds are timed from an already decoded one
+    expanded = json.loads(payload)
+    statuses, dict_build_seconds = time_median(lambda model: build_dicts(health_object, model), expanded, args.repeat)
+    del statuses
+    statuses, dict_bytes = measure_retained_bytes(lambda: build_dicts(health_object, json.loads(payload)))
+    dict_result, dict_seconds = time_median(lambda model: evaluate_dicts(health_object, model), statuses, args.repeat)
+    del statuses
+
+    snapshot, snapshot_build_seconds = time_median(lambda model: build_snapshot(health_object, model), expanded, args.repeat)
+    del snapshot, expanded
+    snapshot, snapshot_bytes = measure_retained_bytes(lambda: build_snapshot(health_object, json.loads(payload)))
+    snapshot_result, snapshot_seconds = time_median(lambda model: evaluate_snapshot(health_object, model), snapshot, args.repeat)
+
+    if snapshot_result != dict_result:
+        raise RuntimeError("The snapshot and dict paths returned different health results")
+    return [
+        {"path": "dicts", "retained_mb": to_mb(dict_bytes), "build_ms": to_ms(dict_build_seconds), "evaluate_ms": to_ms(dict_seconds),
+         "total_ms": to_ms(dict_build_seconds + dict_seconds), "failures": len(dict_result["failures"])},
+        {"path": "snapshot", "retained_mb": to_mb(snapshot_bytes), "build_ms": to_ms(snapshot_build_seconds),
+         "evaluate_ms": to_ms(snapshot_seconds), "total_ms": to_ms(snapshot_build_seconds + snapshot_seconds),
+         "failures": len(snapshot_result["failures"])},
+    ]
+
+
+def to_mb(size):
+    return round(size / 1024.0 / 1024.0, 2)
+
+
+def to_ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def print_results(results):
+    columns = ["path", "retained_mb", "build_ms", "evaluate_ms", "total_ms", "failures"]
+    widths = [max(len(column), *(len(str(result[column])) for result in results)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result[column]).ljust(width) for column, width in zip(columns, widths)))
+
+
+def main():
+    args = get_parser().parse_args()
+    # per-item log lines would dominate both paths; only the model is measured
+    logging.disable(logging.CRITICAL)
+    print("Synthetic cluster: {} connectors, {} tasks each, {} workers, failure ratio {}, worker id {}".format(
+        args.connectors, args.tasks, args.workers, args.failure_ratio, args.worker_id
+    ))
+    results = run(args)
+    print_results(results)
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,18 +13,51 @@
 #  ANY KIND, either express or implied. See the License for the specific
 #  language governing permissions and limitations under the License.
 
-from kafka_connect_healthcheck import handler
-from kafka_connect_healthcheck import health
-from kafka_connect_healthcheck import helpers
-from kafka_connect_healthcheck import main
-from kafka_connect_healthcheck import version
+import importlib
+import sys
 
 name = "kafka_connect_healthcheck"
 
 __all__ = [
+    "aggregator",
+    "aio",
+    "broker_check",
+    "calls",
+    "client",
+    "coalescer",
+    "connector_index",
+    "deadlines",
+    "fleet",
     "handler",
     "health",
     "helpers",
+    "history",
+    "indexes",
     "main",
-    "version"
+    "metrics",
+    "poller",
+    "prefork",
+    "probes",
+    "snapshots",
+    "state_cache",
+    "stdlib_client",
+    "timings",
+    "traces",
+    "transitions",
+    "version",
+    "watch"
 ]
+
+
+def __getattr__(attribute):
+    # submodules are imported on first access (PEP 562), so importing the package does not import requests or the
+    # engines and modes a configuration does not use
+    if attribute in __all__:
+        return importlib.import_module("{}.{}".format(__name__, attribute))
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, attribute))
+
+
+if sys.version_info < (3, 7):
+    # module level __getattr__ is not supported before python 3.7, so every submodule is imported up front
+    for submodule in __all__:
+        importlib.import_module("{}.{}".format(__name__, submodule))
@@ -0,0 +1,81 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+from kafka_connect_healthcheck import indexes
+from kafka_connect_healthcheck import snapshots
+
+
+class WorkerHealthIndex(indexes.EvaluationIndex):
+    """Failures of one cluster-wide evaluation grouped by worker, so the result for any worker is built without another sweep.
+
+    Each result has the same shape and values as the result of a healthcheck started with that worker id.
+    """
+
+    def __init__(self, health, snapshot, broker_failures):
+        super().__init__(health, snapshot, broker_failures)
+        considered_containers = health.considered_containers
+        failure_states = snapshot.states.select(health.is_in_unhealthy_state)
+        # (worker key, failure) pairs in evaluation order; a key of None applies to every worker
+        self.failures = [(self.get_worker_key(*position), snapshot.get_failure(*position))
+                         for position in snapshot.get_failure_positions(failure_states, None, considered_containers)]
+        connector_worker_codes = snapshot.get_resolved_worker_codes() if "connector" in considered_containers else set()
+        task_worker_codes = set(snapshot.task_workers) if "task" in considered_containers else set()
+        self.workers_with_connectors = self.get_worker_keys(connector_worker_codes)
+        self.worker_keys = self.get_worker_keys(connector_worker_codes | task_worker_codes)
+
+    def get_worker_key(self, connector_index, task_index):
+        snapshot = self.snapshot
+        if task_index >= 0:
+            return snapshot.workers.decode(snapshot.task_workers[task_index]).lower()
+        # the status could not be fetched, so the failure counts against every worker
+        if snapshot.connector_flags[connector_index] & snapshots.ERROR:
+            return None
+        return snapshot.workers.decode(snapshot.connector_workers[connector_index]).lower()
+
+    def get_worker_keys(self, worker_codes):
+        return {self.snapshot.workers.decode(code).lower() for code in worker_codes if code != snapshots.NO_WORKER}
+
+    def is_known(self, worker_key):
+        return worker_key in self.worker_keys
+
+    def build_health_result(self, worker_key):
+        health_result = self.health.new_health_result()
+        self.health.handle_unresolved_connectors(self.snapshot, health_result)
+        health_result["failures"] = [failure for key, failure in self.failures if key is None or key == worker_key]
+        # a worker running no connectors falls back to the broker check, as a healthcheck for that worker would
+        if worker_key not in self.workers_with_connectors:
+            health_result["failures"].extend(self.broker_failures)
+        self.health.calculate_health_result(self.snapshot, health_result)
+        return health_result
+
+
+class HealthAggregator(indexes.IndexedResults):
+    """Serves the health result of any worker in the cluster from the index built by the last cluster-wide evaluation.
+
+    Requests arriving within max_age seconds of an evaluation are served from it without evaluating again.
+    """
+
+    def __init__(self, health, max_age=0):
+        super().__init__(max_age)
+        self.health = health
+
+    def build_index(self, snapshot, broker_failures):
+        return WorkerHealthIndex(self.health, snapshot, broker_failures)
+
+    def get_fresh_worker_health_result(self, worker_id):
+        return self.get_fresh_health_result(worker_id.lower())
+
+    def get_worker_health_result(self, worker_id, cluster_result):
+        return self.get_evaluated_health_result(worker_id.lower(), cluster_result)
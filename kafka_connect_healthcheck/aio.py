@@ -0,0 +1,405 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import asyncio
+import base64
+import json
+import logging
+import signal
+import ssl
+from collections import deque
+from http.client import responses
+from urllib.parse import urlencode, urlsplit
+
+from kafka_connect_healthcheck import calls
+from kafka_connect_healthcheck import deadlines
+from kafka_connect_healthcheck import handler
+from kafka_connect_healthcheck import helpers
+from kafka_connect_healthcheck import metrics
+from kafka_connect_healthcheck import poller
+from kafka_connect_healthcheck import probes
+from kafka_connect_healthcheck import traces
+from kafka_connect_healthcheck import watch
+
+
+class HTTPError(Exception):
+    pass
+
+
+class AsyncConnectClient:
+    """Minimal HTTP/1.1 client for the Kafka Connect REST API built on asyncio streams, with a pool of keep-alive connections."""
+
+    def __init__(self, connect_url, auth=None, pool_size=10, connect_timeout=5.0, read_timeout=30.0, keep_alive=True):
+        url = urlsplit(connect_url)
+        self.connect_url = connect_url
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if url.scheme == "https" else None
+        self.base_path = url.path.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.keep_alive = keep_alive
+        self.auth = tuple(auth.split(":", 1)) if auth and ":" in auth else None
+        self.idle_connections = deque()
+        self.request_count = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+
+        self.headers = "Host: {}\r\nAccept: application/json\r\nConnection: {}\r\n".format(
+            url.netloc.rsplit("@", 1)[-1], "keep-alive" if keep_alive else "close"
+        )
+        if self.auth is not None:
+            credentials = base64.b64encode(":".join(self.auth).encode("utf-8")).decode("ascii")
+            self.headers += "Authorization: Basic {}\r\n".format(credentials)
+
+    async def get_json(self, path, params=None, raise_for_status=False, timeout=None):
+        status, body = await self.get(path, params, timeout)
+        if raise_for_status and status >= 400:
+            raise HTTPError("{} Error for url: {}{}".format(status, self.connect_url, path))
+        return json.loads(body.decode("utf-8"))
+
+    async def get(self, path, params=None, timeout=None):
+        timeout = timeout or self.timeout
+        self.request_count += 1
+        target = "{}{}".format(self.base_path, path)
+        if params:
+            target = "{}?{}".format(target, urlencode(params))
+        request = "GET {} HTTP/1.1\r\n{}\r\n".format(target, self.headers).encode("latin-1")
+
+        reused = bool(self.idle_connections)
+        if reused:
+            self.connections_reused += 1
+            reader, writer = self.idle_connections.pop()
+        else:
+            reader, writer = await self.open_connection(timeout[0])
+        try:
+            writer.write(request)
+            status, body, reusable = await asyncio.wait_for(self.read_response(reader), timeout[1])
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+            if not reused:
+                raise
+            # the server may have closed an idle pooled connection; retry once on a fresh one
+            self.request_count -= 1
+            return await self.get(path, params, timeout)
+        except BaseException:
+            writer.close()
+            raise
+
+        if reusable and self.keep_alive and len(self.idle_connections) < self.pool_size:
+            self.idle_connections.append((reader, writer))
+        else:
+            writer.close()
+        return status, body
+
+    async def open_connection(self, timeout):
+        connection = await asyncio.wait_for(asyncio.open_connection(self.host, self.port, ssl=self.ssl), timeout)
+        self.connections_created += 1
+        return connection
+
+    async def read_response(self, reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise asyncio.IncompleteReadError(status_line, None)
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        reusable = headers.get("connection", "").lower() != "close" and not status_line.startswith(b"HTTP/1.0")
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = await self.read_chunked_body(reader)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await reader.read()
+            reusable = False
+        return status, body, reusable
+
+    async def read_chunked_body(self, reader):
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0].strip(), 16)
+            if size == 0:
+                # skip optional trailers until the terminating blank line
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+
+    def get_stats(self):
+        return {
+            "requests": self.request_count,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "pool_size": self.pool_size
+        }
+
+    def close(self):
+        while self.idle_connections:
+            self.idle_connections.pop()[1].close()
+
+
+class AsyncHealth:
+    """Runs the steps of a Health object on an event loop, issuing every REST call they make through an AsyncConnectClient."""
+
+    def __init__(self, health, client):
+        self.health = health
+        self.client = client
+        self.in_flight = None
+
+    async def get_health_result(self):
+        # single-flight: concurrent callers share the evaluation that is already running
+        if self.in_flight is None:
+            self.in_flight = asyncio.ensure_future(self.run(self.health.evaluate()))
+            self.in_flight.add_done_callback(self.clear_in_flight)
+        return await asyncio.shield(self.in_flight)
+
+    def clear_in_flight(self, future):
+        if self.in_flight is future:
+            self.in_flight = None
+
+    async def get_connector_health_result(self, connector_name, task_id=None):
+        return await self.run(self.health.connectors.evaluate_connector(connector_name, task_id))
+
+    async def run(self, step):
+        """Runs a step of the evaluation, awaiting each call it makes to Kafka Connect. See calls.run."""
+        try:
+            call = next(step)
+            while True:
+                try:
+                    result = await self.perform(call)
+                except Exception as ex:
+                    call = step.throw(ex)
+                else:
+                    call = step.send(result)
+        except StopIteration as stop:
+            return stop.value
+
+    async def perform(self, call):
+        if isinstance(call, calls.FetchStatuses):
+            return await self.fetch_statuses(call.connector_names, call.deadline)
+        if isinstance(call, calls.Sleep):
+            await asyncio.sleep(call.seconds)
+            return None
+        with self.health.metrics.track_upstream(call.endpoint):
+            return await self.client.get_json(call.path, params=call.params, raise_for_status=call.raise_for_status,
+                                              timeout=call.deadline.get_timeout(self.client.timeout))
+
+    async def fetch_statuses(self, connector_names, deadline=deadlines.NO_DEADLINE):
+        semaphore = asyncio.Semaphore(self.health.max_concurrency)
+        futures = [asyncio.ensure_future(self.fetch_status(connector_name, semaphore, deadline)) for connector_name in connector_names]
+        if futures:
+            await asyncio.wait(futures, timeout=deadline.get_remaining())
+        statuses = []
+        for future in futures:
+            if future.done():
+                statuses.append(future.result())
+            else:
+                future.cancel()
+                statuses.append(None)
+        return statuses
+
+    async def fetch_status(self, connector_name, semaphore, deadline=deadlines.NO_DEADLINE):
+        async with semaphore:
+            return await self.run(self.health.get_connector_health(connector_name, deadline))
+
+
+class AsyncHealthServer:
+    """HTTP server for the healthcheck API built on asyncio streams. Connections are kept alive for HTTP/1.1 clients."""
+
+    def __init__(self, async_health, health_poller=None, trace_mode=traces.FULL, trace_max_lines=None):
+        self.async_health = async_health
+        self.health_poller = health_poller
+        self.trace_mode = trace_mode
+        self.trace_max_lines = trace_max_lines
+        self.response_cache = handler.EncodedResponseCache()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                if method == "GET" and path.partition("?")[0] == "/watch" and self.async_health.health.watch is not None:
+                    await self.stream_watch(writer)
+                    break
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(await self.get_response(method, path, keep_alive, headers.get("if-none-match"), headers.get("accept-encoding")))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def get_response(self, method, target, keep_alive, if_none_match=None, accept_encoding=None):
+        if method == "HEAD":
+            return self.encode_response(200, b"", {"Content-type": "text/html"}, keep_alive, send_body=False)
+        if method != "GET":
+            return self.encode_response(501, b"", {}, keep_alive)
+
+        health = self.async_health.health
+        path, _, query = target.partition("?")
+        trace_mode = handler.get_trace_mode(query, self.trace_mode)
+        # health responses are negotiated and compressed once by the response cache, other bodies are compressed here
+        compressed = path in ["/"] or path.startswith("/workers/") or path.startswith("/connectors/") or path[1:] in probes.PROBES
+        if path in ["/"]:
+            status, payload, headers = self.get_health_response(await self.get_health_result(), if_none_match, trace_mode, accept_encoding)
+        elif path in ["/ping"]:
+            status, payload, headers = handler.get_ping_response()
+        elif handler.get_path_parameter(path, "/workers/") is not None and health.aggregator is not None:
+            worker_id = handler.get_path_parameter(path, "/workers/")
+            payload = health.aggregator.get_fresh_worker_health_result(worker_id)
+            if payload is None:
+                payload = health.aggregator.get_worker_health_result(worker_id, await self.get_health_result())
+            status, payload, headers = self.get_health_response(payload, if_none_match, trace_mode, accept_encoding)
+        elif handler.get_connector_path(path) is not None:
+            payload = await self.async_health.get_connector_health_result(*handler.get_connector_path(path))
+            if payload is not None:
+                status, payload, headers = self.get_health_response(payload, if_none_match, trace_mode, accept_encoding)
+            else:
+                status, payload, headers = 404, "", {}
+        elif path[1:] in probes.PROBES:
+            payload = health.probes.get_fresh_probe_health_result(path[1:])
+            if payload is None:
+                payload = health.probes.get_probe_health_result(path[1:], await self.get_health_result())
+            status, payload, headers = self.get_health_response(payload, if_none_match, trace_mode, accept_encoding)
+        elif path in ["/history"] and health.history is not None:
+            status, payload, headers = handler.get_history_response(health.history)
+        elif path in ["/metrics"]:
+            await self.get_health_result()
+            headers = {"Content-type": metrics.CONTENT_TYPE}
+            body = handler.compress_response(health.metrics.render().encode("utf-8"), headers, accept_encoding)
+            return self.encode_response(200, body, headers, keep_alive)
+        elif path in ["/debug/timings"] and health.timings.enabled:
+            status, payload, headers = handler.get_timings_response(health.timings)
+        else:
+            status, payload, headers = 404, "", {}
+        headers["Content-type"] = "application/json"
+        body = payload if isinstance(payload, bytes) else bytes(payload, "UTF-8")
+        if body and not compressed:
+            body = handler.compress_response(body, headers, accept_encoding)
+        return self.encode_response(status, body, headers, keep_alive)
+
+    async def stream_watch(self, writer):
+        health_watch = self.async_health.health.watch
+        writer.write(self.encode_response(200, None, {"Content-type": watch.CONTENT_TYPE, "Cache-Control": "no-cache"}, False))
+        wakeup = asyncio.Event()
+        subscription = health_watch.subscribe(wakeup.set)
+        try:
+            while not subscription.evicted:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), health_watch.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    writer.write(watch.HEARTBEAT)
+                    await writer.drain()
+                    continue
+                wakeup.clear()
+                chunk = subscription.take()
+                if chunk is not None:
+                    writer.write(chunk)
+                    await writer.drain()
+        finally:
+            health_watch.unsubscribe(subscription)
+
+    def get_health_response(self, payload, if_none_match, trace_mode, accept_encoding=None):
+        return handler.get_health_response(payload, self.async_health.health.timings, self.response_cache, if_none_match, trace_mode,
+                                           self.trace_max_lines, accept_encoding)
+
+    async def get_health_result(self):
+        if self.health_poller is not None:
+            if self.health_poller.snapshot is None:
+                # probes sent before the first snapshot share the evaluation started by the poll loop
+                self.health_poller.publish(await self.async_health.get_health_result())
+            return self.health_poller.get_health_result()
+        return await self.async_health.get_health_result()
+
+    @staticmethod
+    def encode_response(status, body, headers, keep_alive, send_body=True):
+        """Encodes a response. A body of None encodes only the head of a response whose length is not known."""
+        lines = ["HTTP/1.1 {} {}".format(status, responses.get(status, ""))]
+        lines.extend("{}: {}".format(key, value) for key, value in headers.items())
+        if body is not None and status != 304:
+            lines.append("Content-Length: {}".format(len(body)))
+        lines.append("Connection: {}".format("keep-alive" if keep_alive else "close"))
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        return head + body if send_body and body is not None else head
+
+    async def poll(self, poll_interval):
+        while True:
+            try:
+                self.health_poller.publish(await self.async_health.get_health_result())
+            except Exception as ex:
+                logging.error("Error while refreshing the health snapshot. Error: {}".format(ex))
+            await asyncio.sleep(poll_interval)
+
+
+def run_server(health_object, port, auth, client_options, poll_interval=0, max_staleness=None, trace_mode=traces.FULL,
+               trace_max_lines=None, probe_max_age=0):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    async_client = AsyncConnectClient(health_object.connect_url, auth, **client_options)
+    async_health = AsyncHealth(health_object, async_client)
+    health_object.metrics.client_stats = async_client.get_stats
+    health_poller = None
+    if poll_interval > 0:
+        health_poller = poller.HealthPoller(health_object, poll_interval, max_staleness)
+        health_object.connectors.max_age = health_poller.max_staleness
+        health_object.set_index_max_age(health_poller.max_staleness)
+        logging.info("Server will refresh the health result every {}s and report unhealthy once it is older than {}s".format(
+            health_poller.poll_interval, health_poller.max_staleness
+        ))
+
+    else:
+        health_object.set_index_max_age(probe_max_age)
+
+    http_server = AsyncHealthServer(async_health, health_poller, trace_mode, trace_max_lines)
+    server = loop.run_until_complete(asyncio.start_server(http_server.handle_connection, "0.0.0.0", port))
+    if health_poller is not None:
+        loop.create_task(http_server.poll(poll_interval))
+    elif health_object.broker_check.ttl > 0:
+        loop.create_task(async_health.run(health_object.refresh_broker_check()))
+    startup_duration = helpers.get_process_uptime()
+    health_object.metrics.observe_startup(startup_duration)
+    logging.info("Healthcheck server started at: http://localhost:{} in {:.3f}s (engine: asyncio)".format(port, startup_duration))
+    helpers.log_line_break()
+
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, loop.stop)
+    try:
+        loop.run_forever()
+    finally:
+        logging.info("SIGINT/SIGTERM; exiting...")
+        server.close()
+        async_client.close()
+        loop.close()
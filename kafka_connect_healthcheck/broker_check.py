@@ -0,0 +1,76 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import threading
+import time
+
+
+class BrokerCheck:
+    """Caches the result of the broker connectivity check and decides when it is due and which connector it uses.
+
+    The check fetches the details of a connector, which Kafka Connect can only answer while it reaches the brokers. A
+    result is reused for ttl seconds, so probes between checks only read the cache. Once the check is refreshed in the
+    background every ttl seconds, the last result is reused for up to twice the ttl, so an evaluation only checks again
+    itself when the refresh has stalled.
+    Each attempt uses the next connector in turn, so a single slow connector does not decide every result, and a failed
+    attempt is retried up to retries times, waiting backoff seconds doubled on each retry, before a broker failure is reported.
+    """
+
+    def __init__(self, ttl=30, retries=2, backoff=0.1):
+        self.ttl = ttl
+        self.retries = retries
+        self.backoff = backoff
+        self.failures = None
+        self.checked_at = None
+        self.rotation = 0
+        # the connectors of the last evaluation that needed the check, or None when it did not
+        self.connector_names = None
+        self.refreshed_in_background = False
+        self.lock = threading.Lock()
+
+    def get_cached_failures(self, now=None):
+        """Returns the broker failures of the last check while it is fresh, or None when a check is due."""
+        now = now if now is not None else time.monotonic()
+        with self.lock:
+            max_age = self.ttl * 2 if self.refreshed_in_background else self.ttl
+            if self.checked_at is None or now - self.checked_at >= max_age:
+                return None
+            return list(self.failures)
+
+    def get_connector_name(self, connector_names):
+        with self.lock:
+            connector_name = connector_names[self.rotation % len(connector_names)]
+            self.rotation += 1
+        return connector_name
+
+    def get_retry_delay(self, attempt, deadline):
+        """Returns the seconds to wait before retrying a failed attempt, or None when no retry is left or fits the deadline."""
+        delay = self.backoff * 2 ** attempt
+        remaining = deadline.get_remaining()
+        if attempt >= self.retries or (remaining is not None and delay >= remaining):
+            return None
+        return delay
+
+    def forget(self):
+        """Drops the last result, so the next evaluation that needs the check runs it again."""
+        with self.lock:
+            self.failures = None
+            self.checked_at = None
+
+    def record(self, failures, now=None):
+        with self.lock:
+            self.failures = list(failures)
+            self.checked_at = now if now is not None else time.monotonic()
+        return failures
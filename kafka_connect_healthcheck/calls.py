@@ -0,0 +1,74 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+"""The calls a health evaluation makes to Kafka Connect, performed by the engine running it.
+
+The steps of an evaluation are generators. A step yields a call, the engine performs it and sends its result back into
+the step, or throws the error it raised there. Every decision is made once, in the steps, and each engine only
+implements the calls: the threaded engine blocks on them and the asyncio engine awaits them.
+"""
+
+from kafka_connect_healthcheck import deadlines
+
+
+class Get:
+    """Returns the JSON body of a GET of a Kafka Connect REST path, recorded as a request to endpoint."""
+
+    __slots__ = ("endpoint", "path", "params", "raise_for_status", "deadline")
+
+    def __init__(self, endpoint, path, params=None, raise_for_status=False, deadline=deadlines.NO_DEADLINE):
+        self.endpoint = endpoint
+        self.path = path
+        self.params = params
+        self.raise_for_status = raise_for_status
+        self.deadline = deadline
+
+
+class FetchStatuses:
+    """Runs the get_connector_health step of every connector, with up to max_concurrency of them in flight.
+
+    Returns the status of each connector in the order of connector_names, or None for connectors whose status was not
+    fetched before the deadline.
+    """
+
+    __slots__ = ("connector_names", "deadline")
+
+    def __init__(self, connector_names, deadline=deadlines.NO_DEADLINE):
+        self.connector_names = connector_names
+        self.deadline = deadline
+
+
+class Sleep:
+    """Waits for a number of seconds, as between the attempts of the broker check."""
+
+    __slots__ = ("seconds",)
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+
+def run(step, perform):
+    """Runs a step to completion, performing each call it yields with perform, and returns what the step returns."""
+    try:
+        call = next(step)
+        while True:
+            try:
+                result = perform(call)
+            except Exception as ex:
+                call = step.throw(ex)
+            else:
+                call = step.send(result)
+    except StopIteration as stop:
+        return stop.value
@@ -0,0 +1,107 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that counts how many new connections its pools had to open and how many were reused from them."""
+
+    def __init__(self, *args, **kwargs):
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        adapter = self
+
+        class CountingHTTPConnection(HTTPConnection):
+            def connect(self):
+                super().connect()
+                adapter.connection_created()
+
+        class CountingHTTPSConnection(HTTPSConnection):
+            def connect(self):
+                super().connect()
+                adapter.connection_created()
+
+        def get_conn(pool_class):
+            def _get_conn(self, timeout=None):
+                conn = pool_class._get_conn(self, timeout)
+                # the pool closes connections the server dropped, so only an open connection is a reused one
+                if conn.sock is not None:
+                    adapter.connection_reused()
+                return conn
+            return _get_conn
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": type("CountingHTTPConnectionPool", (HTTPConnectionPool,),
+                         {"ConnectionCls": CountingHTTPConnection, "_get_conn": get_conn(HTTPConnectionPool)}),
+            "https": type("CountingHTTPSConnectionPool", (HTTPSConnectionPool,),
+                          {"ConnectionCls": CountingHTTPSConnection, "_get_conn": get_conn(HTTPSConnectionPool)})
+        }
+
+    def connection_created(self):
+        with self.lock:
+            self.connections_created += 1
+
+    def connection_reused(self):
+        with self.lock:
+            self.connections_reused += 1
+
+
+class ConnectClient:
+    """HTTP client for the Kafka Connect REST API backed by a pool of keep-alive connections that is reused across probes."""
+
+    def __init__(self, connect_url, auth=None, pool_size=10, connect_timeout=5.0, read_timeout=30.0, keep_alive=True, adapter=None):
+        self.connect_url = connect_url
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.keep_alive = keep_alive
+        self.auth = tuple(auth.split(":", 1)) if auth and ":" in auth else None
+
+        self.request_count = 0
+        self.lock = threading.Lock()
+        # an adapter shared between clients pools connections for all of them, with one pool per host
+        self.adapter = adapter if adapter is not None else PooledHTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.session.auth = self.auth
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+
+    def get(self, path, params=None, timeout=None):
+        with self.lock:
+            self.request_count += 1
+        return self.session.get("{}{}".format(self.connect_url, path), params=params, timeout=timeout or self.timeout)
+
+    def get_stats(self):
+        return {
+            "requests": self.request_count,
+            "connections_created": self.adapter.connections_created,
+            "connections_reused": self.adapter.connections_reused,
+            "pool_size": self.pool_size
+        }
+
+    def close(self):
+        self.session.close()
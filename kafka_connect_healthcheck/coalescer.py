@@ -0,0 +1,56 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import threading
+
+
+class Evaluation:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class HealthCoalescer:
+    """Single-flight wrapper: callers arriving while an evaluation is in flight wait for and share its result."""
+
+    def __init__(self, health):
+        self.health = health
+        self.lock = threading.Lock()
+        self.in_flight = None
+
+    def get_health_result(self):
+        with self.lock:
+            evaluation = self.in_flight
+            is_leader = evaluation is None
+            if is_leader:
+                evaluation = self.in_flight = Evaluation()
+
+        if not is_leader:
+            evaluation.done.wait()
+        else:
+            try:
+                evaluation.result = self.health.get_health_result()
+            except Exception as ex:
+                evaluation.error = ex
+            finally:
+                with self.lock:
+                    self.in_flight = None
+                evaluation.done.set()
+
+        if evaluation.error is not None:
+            raise evaluation.error
+        return evaluation.result
@@ -0,0 +1,126 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import time
+
+from kafka_connect_healthcheck import deadlines
+from kafka_connect_healthcheck import indexes
+from kafka_connect_healthcheck import snapshots
+
+
+class ConnectorIndex:
+    """The position of every connector in the snapshot of one evaluation, keyed by name, and the results built from it."""
+
+    def __init__(self, snapshot, timestamp):
+        self.snapshot = snapshot
+        self.timestamp = timestamp
+        self.positions = {name: index for index, name in enumerate(snapshot.connector_names)}
+        self.results = {}
+
+    def get_status(self, connector_name):
+        index = self.positions.get(connector_name)
+        return self.snapshot.get_status(index) if index is not None else None
+
+
+class HealthConnectors(indexes.IndexedResults):
+    """Serves the health of a single connector or task at /connectors/{name} and /connectors/{name}/tasks/{id}.
+
+    Results are read from an index of the last evaluation while it is at most max_age seconds old, which is only the case
+    with a poll interval. Otherwise only the status of that connector is fetched from Kafka Connect. A connector result has
+    the same shape and values as the result of a healthcheck of a cluster running only that connector, on any worker.
+    """
+
+    def __init__(self, health, max_age=0):
+        super().__init__(max_age)
+        self.health = health
+
+    def build_index(self, snapshot):
+        return ConnectorIndex(snapshot, time.time())
+
+    def get_connector_health_result(self, connector_name, task_id=None):
+        """Returns the health result of a connector, or of one of its tasks, or None when Kafka Connect does not know it."""
+        return self.health.run(self.evaluate_connector(connector_name, task_id))
+
+    def evaluate_connector(self, connector_name, task_id=None):
+        """The steps of get_connector_health_result. The status request is yielded to the engine running them."""
+        connector_index = self.get_fresh_index()
+        if connector_index is not None:
+            return self.get_indexed_health_result(connector_index, connector_name, task_id)
+        connector_status = yield from self.fetch_status(connector_name)
+        return self.build_health_result(connector_status, task_id)
+
+    def get_indexed_health_result(self, connector_index, connector_name, task_id=None):
+        key = (connector_name, task_id)
+        health_result = connector_index.results.get(key)
+        if health_result is None:
+            health_result = self.build_health_result(connector_index.get_status(connector_name), task_id)
+            if health_result is None:
+                return None
+            health_result["snapshot_timestamp"] = connector_index.timestamp
+            health_result["max_staleness"] = self.max_age
+            # only connectors and tasks seen in this evaluation are kept so arbitrary names cannot grow the index
+            connector_index.results[key] = health_result
+        return health_result
+
+    def fetch_status(self, connector_name):
+        deadline = deadlines.Deadline(self.health.evaluation_timeout)
+        try:
+            connector_status = yield self.health.get_connector_status(connector_name, deadline)
+        except Exception as ex:
+            return self.health.get_connector_error(connector_name, ex)
+        return self.parse_status(connector_name, connector_status)
+
+    def parse_status(self, connector_name, connector_status):
+        # kafka connect answers with an error body rather than a status for connectors it does not know
+        if isinstance(connector_status, dict) and connector_status.get("error_code") == 404:
+            return None
+        try:
+            return self.health.parse_connector_status(connector_name, connector_status)
+        except Exception as ex:
+            return self.health.get_connector_error(connector_name, ex)
+
+    def build_health_result(self, connector_status, task_id=None):
+        if connector_status is None:
+            return None
+        snapshot = snapshots.StatusSnapshot.from_statuses([connector_status])
+        # a connector whose status could not be fetched says nothing about its tasks, so its own result is returned
+        if task_id is None or snapshot.connector_flags[0]:
+            return self.build_connector_health_result(snapshot)
+        for task_index in snapshot.get_task_range(0):
+            if snapshot.task_ids[task_index] == task_id:
+                return self.build_task_health_result(snapshot, task_index)
+        return None
+
+    def build_connector_health_result(self, snapshot):
+        health = self.health
+        health_result = {
+            "connector": snapshot.connector_names[0],
+            "state": snapshot.states.decode(snapshot.connector_states[0]),
+            "worker_id": snapshot.decode_worker(snapshot.connector_workers[0])
+        }
+        health_result.update(health.new_health_result())
+        health.handle_unresolved_connectors(snapshot, health_result)
+        failure_states = snapshot.states.select(health.is_in_unhealthy_state)
+        positions = snapshot.get_failure_positions(failure_states, None, health.considered_containers)
+        health_result["failures"].extend(snapshot.get_failure(*position) for position in positions)
+        health.calculate_health_result(snapshot, health_result)
+        return health_result
+
+    def build_task_health_result(self, snapshot, task_index):
+        health_result = snapshot.get_failure(0, task_index)
+        del health_result["type"]
+        health_result["failure_states"] = self.health.unhealthy_states
+        health_result["healthy"] = not self.health.is_in_unhealthy_state(health_result["state"])
+        return health_result
@@ -0,0 +1,52 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import time
+
+FAILED = "failed"
+HEALTHY = "healthy"
+IGNORE = "ignore"
+UNRESOLVED_POLICIES = [FAILED, HEALTHY, IGNORE]
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    """The time budget of one health evaluation. Every Kafka Connect REST call made for it is bounded by what is left."""
+
+    def __init__(self, budget=None):
+        self.expires_at = time.monotonic() + budget if budget else None
+
+    def get_remaining(self):
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def is_expired(self):
+        remaining = self.get_remaining()
+        return remaining is not None and remaining <= 0
+
+    def get_timeout(self, timeout):
+        remaining = self.get_remaining()
+        if remaining is None:
+            return timeout
+        if remaining <= 0:
+            raise DeadlineExceeded("Evaluation deadline exceeded")
+        return tuple(min(value, remaining) for value in timeout)
+
+
+NO_DEADLINE = Deadline()
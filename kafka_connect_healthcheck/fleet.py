@@ -0,0 +1,146 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from kafka_connect_healthcheck import coalescer
+from kafka_connect_healthcheck import health
+from kafka_connect_healthcheck import poller
+from kafka_connect_healthcheck import stdlib_client
+
+CLUSTER_SETTINGS = ["connect_url", "connect_worker_id", "unhealthy_states", "basic_auth", "failure_threshold_percentage",
+                    "considered_containers"]
+
+
+def load_clusters(value):
+    # the value is either an inline JSON object or the path to a file containing one
+    if value.strip().startswith("{"):
+        clusters = json.loads(value, object_pairs_hook=OrderedDict)
+    else:
+        with open(value, "r") as f:
+            clusters = json.load(f, object_pairs_hook=OrderedDict)
+    for name, settings in clusters.items():
+        unknown_settings = set(settings) - set(CLUSTER_SETTINGS)
+        if unknown_settings:
+            raise ValueError("Unknown settings for cluster '{}': {}".format(name, ", ".join(sorted(unknown_settings))))
+    return clusters
+
+
+def get_cluster_healths(clusters, args, client_options):
+    """Creates a Health object per named cluster. Settings a cluster does not set are taken from the command line."""
+    # one executor for connector statuses and, with requests, one adapter holding a connection pool per host are shared
+    if args.http_client == stdlib_client.REQUESTS:
+        from kafka_connect_healthcheck import client
+        client_options = dict(client_options, adapter=client.PooledHTTPAdapter(pool_connections=len(clusters),
+                                                                               pool_maxsize=args.connection_pool_size))
+    executor = ThreadPoolExecutor(max_workers=args.max_concurrency) if args.max_concurrency > 1 else None
+    adaptive_polling = (args.adaptive_min_interval, args.adaptive_max_interval) if args.adaptive_polling else None
+
+    healths = OrderedDict()
+    for name, cluster in clusters.items():
+        settings = {key: getattr(args, key) for key in CLUSTER_SETTINGS}
+        settings.update(cluster)
+        logging.info("Initializing health for cluster '{}'...".format(name))
+        healths[name] = health.Health(settings["connect_url"], settings["connect_worker_id"], settings["unhealthy_states"].split(","),
+                                      settings["basic_auth"], int(settings["failure_threshold_percentage"]),
+                                      settings["considered_containers"].split(","), args.collection_mode,
+                                      client_options, args.max_concurrency, adaptive_polling,
+                                      executor=executor, evaluation_timeout=args.evaluation_timeout,
+                                      unresolved_policy=args.unresolved_policy, log_mode=args.log_mode,
+                                      log_summary_interval=args.log_summary_interval, http_client=args.http_client,
+                                      broker_check_ttl=args.broker_check_ttl, broker_check_retries=args.broker_check_retries,
+                                      broker_check_backoff=args.broker_check_backoff)
+    return healths
+
+
+class Fleet:
+    """Serves the health of several named Kafka Connect clusters, evaluating them concurrently on a shared scheduler.
+
+    Without a poll interval each cluster is evaluated on demand behind its own single-flight wrapper. With a poll interval,
+    a single background thread refreshes every cluster's snapshot on each tick, starting with the first one, and a cluster
+    is reported unhealthy until its first snapshot is taken.
+    """
+
+    def __init__(self, healths, poll_interval=0, max_staleness=None):
+        self.healths = healths
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=len(healths))
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="fleet-poller", daemon=True)
+        if poll_interval > 0:
+            self.providers = OrderedDict((name, poller.HealthPoller(h, poll_interval, max_staleness)) for name, h in healths.items())
+        else:
+            self.providers = OrderedDict((name, coalescer.HealthCoalescer(h)) for name, h in healths.items())
+
+    def start(self):
+        logging.info("Server will healthcheck clusters: '{}'".format(", ".join(self.providers)))
+        if self.poll_interval > 0:
+            logging.info("Server will refresh the health result of every cluster every {}s".format(self.poll_interval))
+            self.thread.start()
+            return
+        for cluster_health in self.healths.values():
+            if cluster_health.broker_check.ttl > 0:
+                cluster_health.start_broker_check_refresh()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        while True:
+            self.refresh()
+            if self.stop_event.wait(self.poll_interval):
+                return
+
+    def refresh(self):
+        list(self.executor.map(self.refresh_cluster, self.providers))
+
+    def refresh_cluster(self, name):
+        try:
+            self.providers[name].refresh()
+        except Exception as ex:
+            logging.error("Error while refreshing the health snapshot of cluster '{}'. Error: {}".format(name, ex))
+
+    def get_cluster_health_result(self, name):
+        provider = self.providers.get(name)
+        if provider is None:
+            return None
+        if self.poll_interval > 0 and not provider.first_snapshot.is_set():
+            # unlike a single poller, the fleet answers while its first refresh is running instead of waiting for it
+            return {"healthy": False, "failures": [], "message": "The first health evaluation of this cluster has not finished yet."}
+        return provider.get_health_result()
+
+    def get_summary(self):
+        if self.poll_interval > 0:
+            # snapshots are read without waiting, while the executor may still be busy refreshing them
+            health_results = map(self.get_cluster_health_result, self.providers)
+        else:
+            health_results = self.executor.map(self.get_cluster_health_result, self.providers)
+        clusters = OrderedDict((name, self.summarize(health_result)) for name, health_result in zip(self.providers, health_results))
+        return {
+            "healthy": all(cluster["healthy"] for cluster in clusters.values()),
+            "clusters": clusters
+        }
+
+    @staticmethod
+    def summarize(health_result):
+        summary = {"healthy": health_result["healthy"], "failures": len(health_result.get("failures", []))}
+        for key in ["failure_rate", "error", "message", "snapshot_timestamp"]:
+            if key in health_result:
+                summary[key] = health_result[key]
+        return summary
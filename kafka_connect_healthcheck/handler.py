@@ -13,43 +13,311 @@
 #  ANY KIND, either express or implied. See the License for the specific
 #  language governing permissions and limitations under the License.
 
+import hashlib
 import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
 
 from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from kafka_connect_healthcheck import metrics
+from kafka_connect_healthcheck import probes
+from kafka_connect_healthcheck import timings
+from kafka_connect_healthcheck import traces
+from kafka_connect_healthcheck import watch
+
+GZIP = "gzip"
+# smaller bodies fit in a packet either way, so compressing them only costs CPU
+GZIP_MIN_SIZE = 1024
+
+
+class EncodedResponse:
+    """An encoded health result and its ETag, with the gzip-compressed body created the first time a client accepts it."""
+
+    __slots__ = ("body", "etag", "gzipped")
+
+    def __init__(self, body, etag):
+        self.body = body
+        self.etag = etag
+        self.gzipped = None
+
+    def get_body(self, accept_gzip=False):
+        """Returns the body, ETag and content encoding to send, each encoding having its own ETag."""
+        if not accept_gzip or len(self.body) < GZIP_MIN_SIZE:
+            return self.body, self.etag, None
+        if self.gzipped is None:
+            self.gzipped = compress(self.body)
+        return self.gzipped, '{}-gzip"'.format(self.etag[:-1]), GZIP
+
+
+class EncodedResponseCache:
+    """Keeps the encoded body and ETag of the most recent health results, so a result served many times is encoded once.
+
+    Entries are keyed by the identity of the result, which is shared by every request served from the same evaluation or snapshot.
+    """
+
+    def __init__(self, capacity=16):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, payload, phase_timings=timings.NULL_TIMINGS, trace_mode=traces.FULL, trace_max_lines=None):
+        key = (id(payload), trace_mode)
+        with self.lock:
+            entry = self.entries.get(key)
+            # the stored reference keeps the result alive, so its id cannot be reused by another result while cached
+            if entry is not None and entry[0] is payload:
+                self.entries.move_to_end(key)
+                return entry[1]
+
+        encoded = EncodedResponse(*encode_payload(traces.apply_trace_mode(payload, trace_mode, trace_max_lines), phase_timings))
+        with self.lock:
+            self.entries[key] = (payload, encoded)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+        return encoded
+
+
+def encode_payload(payload, phase_timings=timings.NULL_TIMINGS):
+    with phase_timings.phase("json_encode"):
+        body = json.dumps(payload).encode("utf-8")
+    return body, '"{}"'.format(hashlib.sha1(body).hexdigest())
+
+
+def compress(body):
+    # a gzip stream without a file name or modification time, so the same body always compresses to the same bytes
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+def accepts_gzip(accept_encoding):
+    for coding in (accept_encoding or "").split(","):
+        name, _, parameters = coding.partition(";")
+        if name.strip().lower() not in [GZIP, "x-gzip", "*"]:
+            continue
+        quality = parameters.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        return True
+    return False
+
+
+def compress_response(body, headers, accept_encoding):
+    """Returns the body to send for a response that is not cached, compressing it if the client accepts gzip."""
+    headers["Vary"] = "Accept-Encoding"
+    if len(body) < GZIP_MIN_SIZE or not accepts_gzip(accept_encoding):
+        return body
+    headers["Content-Encoding"] = GZIP
+    return compress(body)
+
+
+def is_not_modified(if_none_match, etag):
+    if not if_none_match:
+        return False
+    # If-None-Match uses the weak comparison, so a weak validator matches its strong counterpart
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(get_opaque_tag(candidate) == etag for candidate in candidates)
+
+
+def get_opaque_tag(etag):
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def get_health_response(payload, phase_timings=timings.NULL_TIMINGS, response_cache=None, if_none_match=None, trace_mode=traces.FULL,
+                        trace_max_lines=None, accept_encoding=None):
+    status = 200 if payload["healthy"] else 503
+    headers = {}
+    if "snapshot_timestamp" in payload:
+        headers["Age"] = str(int(max(time.time() - payload["snapshot_timestamp"], 0)))
+    if response_cache is not None:
+        encoded = response_cache.get(payload, phase_timings, trace_mode, trace_max_lines)
+    else:
+        encoded = EncodedResponse(*encode_payload(traces.apply_trace_mode(payload, trace_mode, trace_max_lines), phase_timings))
+    return get_encoded_response(status, encoded, headers, if_none_match, accept_encoding)
+
+
+def get_encoded_response(status, encoded, headers, if_none_match=None, accept_encoding=None):
+    body, headers["ETag"], content_encoding = encoded.get_body(accepts_gzip(accept_encoding))
+    headers["Vary"] = "Accept-Encoding"
+    # a 304 tells the client that the result it already holds, healthy or not, is still current
+    if is_not_modified(if_none_match, headers["ETag"]):
+        return 304, b"", headers
+    if content_encoding is not None:
+        headers["Content-Encoding"] = content_encoding
+    return status, body, headers
+
+
+def get_path_parameter(path, prefix):
+    if not path.startswith(prefix):
+        return None
+    parameter = unquote(path[len(prefix):])
+    return parameter if parameter and "/" not in parameter else None
+
+
+def get_connector_path(path):
+    """Returns the connector name and task id, or None for the connector itself, of a /connectors/ path."""
+    if not path.startswith("/connectors/"):
+        return None
+    connector_name, separator, task_id = path[len("/connectors/"):].partition("/tasks/")
+    if not connector_name or "/" in connector_name or (separator and not task_id.isdigit()):
+        return None
+    return unquote(connector_name), int(task_id) if separator else None
+
+
+def get_trace_mode(query, default_trace_mode):
+    trace_mode = parse_qs(query).get("traces", [default_trace_mode])[0].lower()
+    return trace_mode if trace_mode in traces.TRACE_MODES else default_trace_mode
+
+
+def get_timings_response(phase_timings):
+    return 200, json.dumps(phase_timings.get_summary()), {}
+
+
+def get_history_response(health_history):
+    return 200, json.dumps(health_history.get_summary()), {}
+
+
+def get_ping_response():
+    return 200, json.dumps({"status": "UP"}), {}
 
 
 class RequestHandler(BaseHTTPRequestHandler):
+    # connections are kept alive between requests, and closed once idle for this many seconds
+    protocol_version = "HTTP/1.1"
+    timeout = 60
 
-    def __init__(self, health, *args, **kwargs):
+    def __init__(self, health, *args, health_metrics=None, phase_timings=timings.NULL_TIMINGS, health_aggregator=None, health_fleet=None,
+                 health_history=None, health_watch=None, health_probes=None, health_connectors=None, response_cache=None,
+                 trace_mode=traces.FULL, trace_max_lines=None, **kwargs):
         self.health = health
+        self.health_metrics = health_metrics
+        self.phase_timings = phase_timings
+        self.health_aggregator = health_aggregator
+        self.health_fleet = health_fleet
+        self.health_history = health_history
+        self.health_watch = health_watch
+        self.health_probes = health_probes
+        self.health_connectors = health_connectors
+        self.response_cache = response_cache
+        self.trace_mode = trace_mode
+        self.trace_max_lines = trace_max_lines
         super().__init__(*args, **kwargs)
 
     def do_HEAD(self):
         self.send_response(200)
         self.send_header("Content-type", "text/html")
+        self.send_header("Content-Length", "0")
         self.end_headers()
 
     def do_GET(self):
-        if self.path in ["/"]:
-            payload = self.health.get_health_result()
-            payload_json = json.dumps(payload)
-            status = 200 if payload["healthy"] else 503
-            self.respond(status, payload_json)
-        elif self.path in ["/ping"]:
-            payload_json = json.dumps({"status": "UP"})
-            self.respond(200, payload_json)
+        url = urlsplit(self.path)
+        if self.health_fleet is not None:
+            self.handle_fleet_request(url)
+        elif url.path in ["/"]:
+            self.respond_health(self.health.get_health_result(), url.query)
+        elif url.path in ["/ping"]:
+            self.respond(*get_ping_response())
+        elif get_path_parameter(url.path, "/workers/") is not None and self.health_aggregator is not None:
+            worker_id = get_path_parameter(url.path, "/workers/")
+            payload = self.health_aggregator.get_fresh_worker_health_result(worker_id)
+            if payload is None:
+                payload = self.health_aggregator.get_worker_health_result(worker_id, self.health.get_health_result())
+            self.respond_health(payload, url.query)
+        elif get_connector_path(url.path) is not None and self.health_connectors is not None:
+            payload = self.health_connectors.get_connector_health_result(*get_connector_path(url.path))
+            if payload is not None:
+                self.respond_health(payload, url.query)
+            else:
+                self.respond(404, "")
+        elif url.path[1:] in probes.PROBES and self.health_probes is not None:
+            payload = self.health_probes.get_fresh_probe_health_result(url.path[1:])
+            if payload is None:
+                payload = self.health_probes.get_probe_health_result(url.path[1:], self.health.get_health_result())
+            self.respond_health(payload, url.query)
+        elif url.path in ["/watch"] and self.health_watch is not None:
+            self.respond_watch()
+        elif url.path in ["/history"] and self.health_history is not None:
+            self.respond(*get_history_response(self.health_history))
+        elif url.path in ["/metrics"] and self.health_metrics is not None:
+            # scrapes share the evaluation (or snapshot) that probes use, so metrics never cause an extra sweep
+            self.health.get_health_result()
+            self.respond(200, self.health_metrics.render(), content_type=metrics.CONTENT_TYPE)
+        elif url.path in ["/debug/timings"] and self.phase_timings.enabled:
+            self.respond(*get_timings_response(self.phase_timings))
+        else:
+            self.respond(404, "")
+
+    def handle_fleet_request(self, url):
+        cluster_name = get_path_parameter(url.path, "/clusters/")
+        cluster_result = self.health_fleet.get_cluster_health_result(cluster_name) if cluster_name is not None else None
+        if url.path in ["/", "/clusters"]:
+            self.respond_health(self.health_fleet.get_summary(), url.query)
+        elif url.path in ["/ping"]:
+            self.respond(*get_ping_response())
+        elif cluster_result is not None:
+            self.respond_health(cluster_result, url.query)
         else:
             self.respond(404, "")
 
     def log_message(self, format, *args):
         return
 
-    def handle_http(self, status_code, payload):
+    def handle_http(self, status_code, payload, headers=None, content_type="application/json"):
+        body = payload if isinstance(payload, bytes) else bytes(payload, "UTF-8")
         self.send_response(status_code)
-        self.send_header("Content-type", "application/json")
+        self.send_header("Content-type", content_type)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        # a 304 has no body, and a Content-Length on it would have to be the length of the body it stands for
+        if status_code != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        return body
+
+    def respond_health(self, payload, query=""):
+        trace_mode = get_trace_mode(query, self.trace_mode)
+        self.respond(*get_health_response(payload, self.phase_timings, self.response_cache, self.headers.get("If-None-Match"),
+                                          trace_mode, self.trace_max_lines, self.headers.get("Accept-Encoding")), compressed=True)
+
+    def respond_watch(self):
+        # the stream has no length, so it is delimited by closing the connection
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-type", watch.CONTENT_TYPE)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
         self.end_headers()
-        return bytes(payload, "UTF-8")
+        wakeup = threading.Event()
+        subscription = self.health_watch.subscribe(wakeup.set)
+        try:
+            while not subscription.evicted:
+                if not wakeup.wait(self.health_watch.heartbeat_interval):
+                    # heartbeats keep proxies from timing out an idle stream and reveal clients that went away
+                    self.wfile.write(watch.HEARTBEAT)
+                    self.wfile.flush()
+                    continue
+                wakeup.clear()
+                chunk = subscription.take()
+                if chunk is not None:
+                    self.wfile.write(chunk)
+                    self.wfile.flush()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.health_watch.unsubscribe(subscription)
 
-    def respond(self, status, payload):
-        response = self.handle_http(status, payload)
+    def respond(self, status, payload, headers=None, content_type="application/json", compressed=False):
+        """Sends a response. Bodies not already negotiated (compressed) are gzipped here when the client accepts it."""
+        headers = dict(headers or {})
+        if not compressed and payload:
+            payload = compress_response(payload if isinstance(payload, bytes) else bytes(payload, "UTF-8"), headers,
+                                        self.headers.get("Accept-Encoding"))
+        response = self.handle_http(status, payload, headers, content_type)
         self.wfile.write(response)
@@ -14,129 +14,434 @@
 #  language governing permissions and limitations under the License.
 
 import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
 
-import requests
-
+from kafka_connect_healthcheck import aggregator
+from kafka_connect_healthcheck import broker_check
+from kafka_connect_healthcheck import calls
+from kafka_connect_healthcheck import connector_index
+from kafka_connect_healthcheck import deadlines
 from kafka_connect_healthcheck import helpers
+from kafka_connect_healthcheck import history
+from kafka_connect_healthcheck import metrics
+from kafka_connect_healthcheck import probes
+from kafka_connect_healthcheck import snapshots
+from kafka_connect_healthcheck import state_cache
+from kafka_connect_healthcheck import stdlib_client
+from kafka_connect_healthcheck import timings
+from kafka_connect_healthcheck import transitions
+from kafka_connect_healthcheck import watch
+
+
+def get_connect_client(connect_url, auth, http_client, client_options):
+    if http_client == stdlib_client.HTTP_CLIENT:
+        return stdlib_client.StdlibConnectClient(connect_url, auth, **client_options)
+    # requests is only imported when it is used, as it makes up most of the startup time of the healthcheck
+    from kafka_connect_healthcheck import client
+    return client.ConnectClient(connect_url, auth, **client_options)
 
 
 class Health:
 
-    def __init__(self, connect_url, worker_id, unhealthy_states, auth, failure_threshold_percentage, considered_containers):
+    def __init__(self, connect_url, worker_id, unhealthy_states, auth, failure_threshold_percentage, considered_containers,
+                 collection_mode="bulk", client_options=None, max_concurrency=1, adaptive_polling=None, debug_timings=False,
+                 aggregate_workers=False, executor=None, evaluation_timeout=0, unresolved_policy=deadlines.FAILED,
+                 log_mode=transitions.ALL, log_summary_interval=60.0, history_size=0, flap_window=600.0, flap_threshold=3,
+                 http_client=stdlib_client.REQUESTS, broker_check_ttl=30, broker_check_retries=2, broker_check_backoff=0.1,
+                 watch_buffer_size=0, watch_heartbeat_interval=15.0, probe_settings=None):
         self.connect_url = connect_url
         self.worker_id = worker_id
         self.unhealthy_states = [x.upper().strip() for x in unhealthy_states]
         self.failure_threshold = failure_threshold_percentage * .01
         self.considered_containers = [x.lower().strip() for x in considered_containers]
-        self.kwargs = {}
-        if auth and ":" in auth:
-            self.kwargs["auth"] = tuple(auth.split(":"))
-            self.log_initialization_values()
+        self.collection_mode = collection_mode.lower().strip()
+        self.client = get_connect_client(connect_url, auth, http_client, client_options or {})
+        self.timings = timings.Timings() if debug_timings else timings.NULL_TIMINGS
+        self.metrics = metrics.HealthMetrics(self.client.get_stats, self.timings)
+        self.max_concurrency = max(max_concurrency, 1)
+        self.executor = executor
+        if self.executor is None and self.max_concurrency > 1:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        self.state_cache = state_cache.ConnectorStateCache(*adaptive_polling) if adaptive_polling else None
+        self.aggregator = aggregator.HealthAggregator(self) if aggregate_workers else None
+        self.evaluation_timeout = evaluation_timeout
+        self.unresolved_policy = unresolved_policy.lower().strip()
+        self.state_log = transitions.StateTransitionLog(log_summary_interval) if log_mode == transitions.TRANSITIONS else None
+        self.history = history.HealthHistory(history_size, flap_window, flap_threshold) if history_size > 0 else None
+        self.broker_check = broker_check.BrokerCheck(broker_check_ttl, broker_check_retries, broker_check_backoff)
+        self.watch = watch.WatchHub(watch_buffer_size, watch_heartbeat_interval) if watch_buffer_size > 0 else None
+        self.probes = probes.HealthProbes(self, probes.get_probes(self, probe_settings))
+        self.connectors = connector_index.HealthConnectors(self)
+        self.log_initialization_values()
 
     def get_health_result(self):
-        try:
-            health_result = {"failures": [], "failure_states": self.unhealthy_states}
-            connector_names = self.get_connector_names()
-            connector_statuses = self.get_connectors_health(connector_names)
-            self.handle_healthcheck(connector_statuses, health_result)
+        return self.run(self.evaluate())
+
+    def run(self, step):
+        """Runs a step of the evaluation, blocking on each call it makes to Kafka Connect."""
+        return calls.run(step, self.perform)
+
+    def perform(self, call):
+        if isinstance(call, calls.FetchStatuses):
+            return self.fetch_statuses(call.connector_names, call.deadline)
+        if isinstance(call, calls.Sleep):
+            time.sleep(call.seconds)
+            return None
+        with self.metrics.track_upstream(call.endpoint):
+            response = self.client.get(call.path, params=call.params, timeout=call.deadline.get_timeout(self.client.timeout))
+            if call.raise_for_status:
+                response.raise_for_status()
+        return response.json()
+
+    def fetch_statuses(self, connector_names, deadline=deadlines.NO_DEADLINE):
+        if self.executor is None:
+            return [self.run(self.get_connector_health(connector_name, deadline)) for connector_name in connector_names]
+        futures = [self.executor.submit(self.run, self.get_connector_health(connector_name, deadline)) for connector_name in connector_names]
+        done, _ = wait(futures, timeout=deadline.get_remaining())
+        statuses = []
+        for future in futures:
+            if future in done:
+                statuses.append(future.result())
+            else:
+                future.cancel()
+                statuses.append(None)
+        return statuses
 
-            connector_count = len(connector_names)
-            task_count = sum(len(c["tasks"]) for c in connector_statuses)
+    def evaluate(self):
+        """The steps of one health evaluation. The calls to Kafka Connect are yielded to the engine running it."""
+        start = time.perf_counter()
+        snapshot = None
+        deadline = deadlines.Deadline(self.evaluation_timeout)
+        try:
+            health_result = self.new_health_result()
+            with self.timings.phase("collect_statuses"):
+                connector_statuses = yield from self.get_all_connectors_health(deadline)
+            with self.timings.phase("build_snapshot"):
+                snapshot = self.build_snapshot(connector_statuses)
+            with self.timings.phase("handle_healthcheck"):
+                broker_failures = yield from self.handle_healthcheck(snapshot, health_result, deadline)
+            with self.timings.phase("calculate_health_result"):
+                self.calculate_health_result(snapshot, health_result)
+            if self.aggregator is not None:
+                with self.timings.phase("index_workers"):
+                    self.aggregator.index(snapshot, broker_failures)
+            with self.timings.phase("index_probes"):
+                self.probes.index(snapshot, broker_failures)
+            with self.timings.phase("index_connectors"):
+                self.connectors.index(snapshot)
+        except Exception as ex:
+            health_result = self.get_error_result(ex)
+            # probes and workers must not keep serving the index of an earlier evaluation once one fails
+            for indexed_results in self.get_indexed_results():
+                indexed_results.forget()
+        self.finish_evaluation(snapshot, health_result, start)
+        return health_result
 
-            container_count = 0
-            if "connector" in self.considered_containers:
-                container_count += connector_count
-            if "task" in self.considered_containers:
-                container_count += task_count
+    def get_indexed_results(self):
+        """Returns the probes and, when workers are aggregated, the per-worker results served from the last evaluation."""
+        return [self.probes] if self.aggregator is None else [self.probes, self.aggregator]
 
-            failure_count = len([f for f in health_result["failures"] if f["type"] in self.considered_containers])
+    def set_index_max_age(self, max_age):
+        for indexed_results in self.get_indexed_results():
+            indexed_results.max_age = max_age
 
-            # guards against division by zero. if we have no connectors or tasks we are deciding to pass
-            if container_count > 0:
-                health_result["failure_rate"] = failure_count / container_count
+    def finish_evaluation(self, snapshot, health_result, start):
+        duration = time.perf_counter() - start
+        self.timings.record("evaluation", duration)
+        self.metrics.observe_evaluation(snapshot, health_result, duration)
+        if self.history is not None:
+            with self.timings.phase("record_history"):
+                failure_states = snapshot.states.select(self.is_in_unhealthy_state) if snapshot is not None else frozenset()
+                self.history.record(snapshot, health_result, failure_states)
+        if self.watch is not None:
+            with self.timings.phase("publish_watch"):
+                self.watch.publish(snapshot, health_result)
+        with self.timings.phase("logging"):
+            logging.debug("Kafka Connect REST client stats: %s", self.metrics.client_stats())
+            if self.state_log is not None:
+                self.state_log.finish_evaluation(health_result if snapshot is not None else None)
             else:
-                health_result["failure_rate"] = 0.0
+                helpers.log_line_break()
 
-            health_result["failure_threshold"] = self.failure_threshold
-            health_result["healthy"] = health_result["failure_rate"] <= health_result["failure_threshold"]
+    def new_health_result(self):
+        return {"failures": [], "failure_states": self.unhealthy_states}
 
-            # broker errors override any failure calculation
-            if any([f for f in health_result["failures"] if f["type"] == "broker"]):
-                health_result["healthy"] = False
+    def calculate_health_result(self, snapshot, health_result, considered_containers=None, failure_threshold=None):
+        considered_containers = considered_containers if considered_containers is not None else self.considered_containers
+        failure_threshold = failure_threshold if failure_threshold is not None else self.failure_threshold
+        connector_count = len(snapshot)
+        if self.unresolved_policy == deadlines.IGNORE:
+            connector_count -= snapshot.get_unresolved_count()
+        task_count = snapshot.get_task_count()
 
-        except Exception as ex:
-            logging.error("Error while attempting to calculate health result. Assuming unhealthy. Error: {}".format(ex))
-            logging.error(ex)
-            health_result = {
-                "healthy": False,
-                "message": "Exception raised while attempting to calculate health result, assuming unhealthy.",
-                "error": "{}".format(ex),
-                "failure_states": self.unhealthy_states
-            }
-        helpers.log_line_break()
-        return health_result
+        container_count = 0
+        if "connector" in considered_containers:
+            container_count += connector_count
+        if "task" in considered_containers:
+            container_count += task_count
+
+        # a single pass over the failures counts every type, including broker failures checked below
+        failure_types = Counter(f["type"] for f in health_result["failures"])
+        failure_count = sum(count for failure_type, count in failure_types.items() if failure_type in considered_containers)
+
+        # guards against division by zero. if we have no connectors or tasks we are deciding to pass
+        if container_count > 0:
+            health_result["failure_rate"] = failure_count / container_count
+        else:
+            health_result["failure_rate"] = 0.0
+
+        health_result["failure_threshold"] = failure_threshold
+        health_result["healthy"] = health_result["failure_rate"] <= health_result["failure_threshold"]
+
+        # broker errors override any failure calculation
+        if failure_types["broker"] > 0:
+            health_result["healthy"] = False
+
+    def get_error_result(self, ex):
+        logging.error("Error while attempting to calculate health result. Assuming unhealthy. Error: {}".format(ex))
+        logging.error(ex)
+        return {
+            "healthy": False,
+            "message": "Exception raised while attempting to calculate health result, assuming unhealthy.",
+            "error": "{}".format(ex),
+            "failure_states": self.unhealthy_states
+        }
+
+    def handle_healthcheck(self, snapshot, health_result, deadline=deadlines.NO_DEADLINE):
+        """Returns the broker failures of this evaluation, which are part of the result when no connector runs on this worker.
+
+        The broker check runs at most once per evaluation, and only when the result, the per-worker index or a probe needs it.
+        """
+        connectors_on_this_worker = self.handle_connectors_healthcheck(snapshot, health_result)
+        broker_failures = []
+        connector_names = None
+        if not connectors_on_this_worker or self.aggregator is not None or self.probes.needs_broker_check(snapshot):
+            connector_names = snapshot.connector_names or None
+        # assigned once, so the background refresh never reads a value this evaluation is still deciding
+        self.broker_check.connector_names = connector_names
+        if connector_names is not None:
+            broker_failures = yield from self.get_broker_failures(snapshot, deadline)
+        if not connectors_on_this_worker:
+            health_result["failures"].extend(broker_failures)
+        return broker_failures
+
+    def handle_connectors_healthcheck(self, snapshot, health_result):
+        self.handle_unresolved_connectors(snapshot, health_result)
+        # states and worker ids are matched once per distinct value; the passes below only compare integer codes
+        failure_states = snapshot.states.select(self.is_in_unhealthy_state)
+        worker_codes = snapshot.workers.select(self.is_on_this_worker)
+        positions = snapshot.get_failure_positions(failure_states, worker_codes, self.considered_containers)
+        health_result["failures"].extend(snapshot.get_failure(*position) for position in positions)
+        self.log_states(snapshot, failure_states, worker_codes)
+        return "connector" in self.considered_containers and not snapshot.get_resolved_worker_codes().isdisjoint(worker_codes)
+
+    def handle_unresolved_connectors(self, snapshot, health_result):
+        unresolved = snapshot.get_unresolved_names()
+        if unresolved:
+            logging.warning("Evaluation deadline exceeded before the status of {} connector(s) was fetched, treating them as: {}".format(
+                len(unresolved), self.unresolved_policy
+            ))
+            health_result["unresolved"] = unresolved
+            health_result["unresolved_policy"] = self.unresolved_policy
+
+    def handle_broker_healthcheck(self, health_result, connector_names, deadline=deadlines.NO_DEADLINE):
+        with self.timings.phase("handle_broker_healthcheck"):
+            failures = self.broker_check.get_cached_failures()
+            if failures is None:
+                failures = yield from self.check_broker(connector_names, deadline)
+            health_result["failures"].extend(failures)
 
-    def handle_healthcheck(self, connector_statuses, health_result):
-        connectors_on_this_worker = False
-        for connector in connector_statuses:
-            if self.is_on_this_worker(connector["worker_id"]) and "connector" in self.considered_containers:
-                connectors_on_this_worker = True
-                if self.is_in_unhealthy_state(connector["state"]):
-                    logging.warning("Connector '{}' is unhealthy in failure state: {}".format(connector["name"], connector["state"]))
-                    health_result["failures"].append({
-                        "type": "connector",
-                        "connector": connector["name"],
-                        "state": connector["state"],
-                        "worker_id": connector["worker_id"]
-                    })
-                else:
-                    logging.info("Connector '{}' is healthy in state: {}".format(connector["name"], connector["state"]))
-            self.handle_task_healthcheck(connector, health_result)
-        if not connectors_on_this_worker and connector_statuses:
-            self.handle_broker_healthcheck(health_result, connector_statuses[0]["name"])
-
-    def handle_broker_healthcheck(self, health_result, connector_name):
+    def check_broker(self, connector_names, deadline=deadlines.NO_DEADLINE):
+        attempt = 0
+        while True:
+            connector_name = self.broker_check.get_connector_name(connector_names)
+            try:
+                yield self.get_connector_details(connector_name, deadline)
+                return self.broker_check.record([])
+            except Exception as ex:
+                delay = self.broker_check.get_retry_delay(attempt, deadline)
+                if delay is None:
+                    return self.handle_broker_error(connector_name, ex, deadline)
+                self.log_broker_retry(connector_name, ex, delay)
+            yield calls.Sleep(delay)
+            attempt += 1
+
+    def start_broker_check_refresh(self):
+        """Refreshes the broker check in a background thread, so evaluations only read its cached result."""
+        threading.Thread(target=self.run, args=(self.refresh_broker_check(),), name="broker-check", daemon=True).start()
+
+    def refresh_broker_check(self):
+        """Checks the brokers every ttl seconds for as long as the engine runs this step, while evaluations need the check."""
+        logging.info("Server will refresh the broker check in the background every {}s".format(self.broker_check.ttl))
+        self.broker_check.refreshed_in_background = True
+        while True:
+            yield calls.Sleep(self.broker_check.ttl)
+            connector_names = self.broker_check.connector_names
+            if not connector_names:
+                # a result kept while no evaluation needed the check would be stale by the time one needs it again
+                self.broker_check.forget()
+                continue
+            try:
+                yield from self.check_broker(connector_names, deadlines.Deadline(self.evaluation_timeout))
+            except Exception as ex:
+                logging.error("Error while refreshing the broker check. Error: {}".format(ex))
+
+    def get_broker_failures(self, snapshot, deadline=deadlines.NO_DEADLINE):
+        broker_result = self.new_health_result()
+        if len(snapshot) > 0:
+            yield from self.handle_broker_healthcheck(broker_result, snapshot.connector_names, deadline)
+        return broker_result["failures"]
+
+    @staticmethod
+    def log_broker_retry(connector_name, ex, delay):
+        logging.warning("Error while attempting to get details for {}, retrying in {}s. Error: {}".format(connector_name, delay, ex))
+
+    def handle_broker_error(self, connector_name, ex, deadline=deadlines.NO_DEADLINE):
+        """Returns the broker failures of a check whose attempts all failed."""
+        expired = deadline.is_expired()
+        if expired and self.unresolved_policy != deadlines.FAILED:
+            logging.warning("Evaluation deadline exceeded before the broker check completed, treating it as: {}".format(
+                self.unresolved_policy
+            ))
+            return []
+        logging.error("Error while attempting to get details for {}. Assuming unhealthy. Error: {}".format(connector_name, ex))
+        logging.error(ex)
+        failures = [{
+            "type": "broker",
+            "connector": connector_name,
+        }]
+        # a check cut short by the deadline says nothing about the brokers, so only completed checks are cached
+        return failures if expired else self.broker_check.record(failures)
+
+    def log_states(self, snapshot, failure_states, worker_codes):
+        if self.state_log is None and not logging.getLogger().isEnabledFor(logging.WARNING):
+            return
+        log_connectors = "connector" in self.considered_containers
+        log_tasks = "task" in self.considered_containers
+        decode_state = snapshot.states.decode
+        for index, name in enumerate(snapshot.connector_names):
+            if snapshot.connector_flags[index]:
+                continue
+            if log_connectors and snapshot.connector_workers[index] in worker_codes:
+                state = snapshot.connector_states[index]
+                self.log_connector_state(name, decode_state(state), state in failure_states)
+            if log_tasks:
+                for task_index in snapshot.get_task_range(index):
+                    if snapshot.task_workers[task_index] in worker_codes:
+                        state = snapshot.task_states[task_index]
+                        self.log_task_state(name, snapshot.task_ids[task_index], decode_state(state), state in failure_states)
+
+    # messages are passed as arguments rather than formatted, so no string work happens when the level is disabled
+    def log_connector_state(self, name, state, is_unhealthy):
+        if self.state_log is not None and not self.state_log.has_changed(("connector", name), state, is_unhealthy):
+            return
+        if is_unhealthy:
+            logging.warning("Connector '%s' is unhealthy in failure state: %s", name, state)
+        else:
+            logging.info("Connector '%s' is healthy in state: %s", name, state)
+
+    def log_task_state(self, name, task_id, state, is_unhealthy):
+        if self.state_log is not None and not self.state_log.has_changed(("task", name, task_id), state, is_unhealthy):
+            return
+        if is_unhealthy:
+            logging.warning("Connector '%s' task '%s' is unhealthy in failure state: %s", name, task_id, state)
+        else:
+            logging.info("Connector '%s' task '%s' is healthy in state: %s", name, task_id, state)
+
+    def get_all_connectors_health(self, deadline=deadlines.NO_DEADLINE):
+        """Returns the response of GET /connectors?expand=status in bulk mode, or a list of connector statuses otherwise."""
+        if self.collection_mode == "bulk":
+            expanded = yield self.get_connectors_expanded(deadline)
+            # connect versions before 2.3 ignore the expand parameter and return a plain list of connector names
+            if isinstance(expanded, dict):
+                return expanded
+            logging.debug("Kafka Connect ignored expand=status, falling back to per-connector status requests")
+            return (yield from self.get_connectors_health(expanded, deadline))
+        connector_names = yield self.get_connector_names(deadline)
+        return (yield from self.get_connectors_health(connector_names, deadline))
+
+    def build_snapshot(self, connector_statuses):
+        # an expanded response is read straight into the snapshot, without a status dict per connector and task
+        if isinstance(connector_statuses, dict):
+            return snapshots.StatusSnapshot.from_expanded(connector_statuses, self.get_connector_error)
+        return snapshots.StatusSnapshot.from_statuses(connector_statuses)
+
+    def get_connectors_health(self, connector_names, deadline=deadlines.NO_DEADLINE):
+        due_connector_names = self.get_due_connector_names(connector_names)
+        with self.timings.phase("get_connectors_health"):
+            fetched_statuses = yield calls.FetchStatuses(due_connector_names, deadline)
+        # results are collected in the order of connector_names, regardless of completion order
+        statuses = [status if status is not None else self.get_unresolved_status(connector_name)
+                    for connector_name, status in zip(due_connector_names, fetched_statuses)]
+        return self.merge_connectors_health(connector_names, statuses)
+
+    def get_due_connector_names(self, connector_names):
+        if self.state_cache is None:
+            return connector_names
+        return self.state_cache.get_due(connector_names, time.time())
+
+    def merge_connectors_health(self, connector_names, fetched_statuses):
+        if self.state_cache is None:
+            return fetched_statuses
+        now = time.time()
+        unresolved = {}
+        for connector in fetched_statuses:
+            if connector.get("unresolved"):
+                unresolved[connector["name"]] = connector
+            else:
+                self.state_cache.update(connector, self.is_connector_failing(connector), now)
+        logging.debug("Adaptive polling fetched %d of %d connector statuses", len(fetched_statuses), len(connector_names))
+        if not unresolved:
+            return self.state_cache.get_statuses(connector_names)
+        # connectors that ran out of time fall back to their last known status, if there is one
+        cached = {connector["name"]: connector for connector in self.state_cache.get_statuses(connector_names)}
+        return [cached.get(name) or unresolved[name] for name in connector_names]
+
+    def is_connector_failing(self, connector):
+        if "error" in connector or self.is_in_unhealthy_state(connector["state"]):
+            return True
+        return any(self.is_in_unhealthy_state(task["state"]) for task in connector["tasks"])
+
+    def get_connector_health(self, connector_name, deadline=deadlines.NO_DEADLINE):
         try:
-            self.get_connector_details(connector_name)
+            connector_status = yield self.get_connector_status(connector_name, deadline)
+            return self.parse_connector_status(connector_name, connector_status)
         except Exception as ex:
-            logging.error("Error while attempting to get details for {}. Assuming unhealthy. Error: {}".format(connector_name, ex))
-            logging.error(ex)
-            health_result["failures"].append({
-                "type": "broker",
-                "connector": connector_name,
-            })
-
-    def handle_task_healthcheck(self, connector, health_result):
-        if "task" in self.considered_containers:
-            for task in connector["tasks"]:
-                if self.is_on_this_worker(task["worker_id"]):
-                    if self.is_in_unhealthy_state(task["state"]):
-                        logging.warning("Connector '{}' task '{}' is unhealthy in failure state: {}".format(
-                            connector["name"], task["id"], task["state"]
-                        ))
-                        health_result["failures"].append({
-                            "type": "task",
-                            "connector": connector["name"],
-                            "id": task["id"],
-                            "state": task["state"],
-                            "worker_id": task["worker_id"],
-                            "trace": task.get("trace", None)
-                        })
-                    else:
-                        logging.info("Connector '{}' task '{}' is healthy in state: {}".format(
-                            connector["name"], task["id"], task["state"]
-                        ))
-
-    def get_connectors_health(self, connector_names):
-        statuses = []
-        for connector_name in connector_names:
-            statuses.append(self.get_connector_health(connector_name))
-        return statuses
+            if deadline.is_expired():
+                return self.get_unresolved_status(connector_name)
+            return self.get_connector_error(connector_name, ex)
+
+    def get_unresolved_status(self, connector_name):
+        connector_status = {
+            "name": connector_name,
+            "state": "UNRESOLVED",
+            "worker_id": None,
+            "tasks": [],
+            "unresolved": True
+        }
+        if self.unresolved_policy == deadlines.FAILED:
+            connector_status["error"] = "Evaluation deadline exceeded before the connector status was fetched"
+        return connector_status
 
-    def get_connector_health(self, connector_name):
-        connector_status = self.get_connector_status(connector_name)
+    def get_connector_error(self, connector_name, ex):
+        logging.error("Error while attempting to get status for connector '{}'. Assuming unhealthy. Error: {}".format(connector_name, ex))
+        return {
+            "name": connector_name,
+            "state": "UNKNOWN",
+            "worker_id": None,
+            "tasks": [],
+            "error": "{}".format(ex)
+        }
+
+    def parse_connector_status(self, connector_name, connector_status):
         connector_state = connector_status["connector"]["state"].upper()
         connector_worker = connector_status["connector"]["worker_id"]
+        for task in connector_status["tasks"]:
+            if task.get("trace"):
+                task["trace"] = snapshots.intern_trace(task["trace"])
         return {
             "name": connector_name,
             "state": connector_state,
@@ -144,21 +449,22 @@ class Health:
             "tasks": connector_status["tasks"]
         }
 
-    def get_connector_names(self):
-        response = requests.get("{}/connectors".format(self.connect_url), **self.kwargs)
-        response_json = response.json()
-        return response_json
+    @staticmethod
+    def get_connector_names(deadline=deadlines.NO_DEADLINE):
+        return calls.Get("get_connector_names", "/connectors", deadline=deadline)
+
+    @staticmethod
+    def get_connectors_expanded(deadline=deadlines.NO_DEADLINE):
+        # an error body, during a rebalance for example, would otherwise be read as a map of connectors
+        return calls.Get("get_connectors_expanded", "/connectors", params={"expand": "status"}, raise_for_status=True, deadline=deadline)
 
-    def get_connector_status(self, connector_name):
-        response = requests.get("{}/connectors/{}/status".format(self.connect_url, connector_name), **self.kwargs)
-        response_json = response.json()
-        return response_json
+    @staticmethod
+    def get_connector_status(connector_name, deadline=deadlines.NO_DEADLINE):
+        return calls.Get("get_connector_status", helpers.get_connector_path(connector_name, "/status"), deadline=deadline)
 
-    def get_connector_details(self, connector_name):
-        response = requests.get("{}/connectors/{}".format(self.connect_url, connector_name), **self.kwargs)
-        response.raise_for_status()
-        response_json = response.json()
-        return response_json
+    @staticmethod
+    def get_connector_details(connector_name, deadline=deadlines.NO_DEADLINE):
+        return calls.Get("get_connector_details", helpers.get_connector_path(connector_name), raise_for_status=True, deadline=deadline)
 
     def is_in_unhealthy_state(self, state):
         return state.upper() in self.unhealthy_states
@@ -169,8 +475,50 @@ class Health:
     def log_initialization_values(self):
         logging.info("Server will report unhealthy for states: '{}'".format(", ".join(self.unhealthy_states)))
         logging.info("Server will healthcheck against Kafka Connect at: {}".format(self.connect_url))
-        if "auth" in self.kwargs:
+        logging.info("Server will collect connector statuses using collection mode: {}".format(self.collection_mode))
+        if isinstance(self.client, stdlib_client.StdlibConnectClient):
+            logging.info("Server will use the http.client backend for the Kafka Connect REST API")
+        if self.client.auth is not None:
             logging.info("Server will use basic authentication against Kafka Connect")
+        if self.max_concurrency > 1:
+            logging.info("Server will fetch connector statuses with a concurrency of {}".format(self.max_concurrency))
+        if self.state_cache is not None and self.collection_mode == "bulk":
+            logging.warning("Adaptive polling only applies when statuses are fetched per connector, which bulk mode does only "
+                            "against Kafka Connect versions before 2.3. Use --collection-mode per-connector to poll adaptively")
+        elif self.state_cache is not None:
+            logging.info("Server will poll changed or failing connectors every {}s and stable connectors at least every {}s".format(
+                self.state_cache.min_interval, self.state_cache.max_interval
+            ))
+        logging.info("Server will use a connection pool of size {} with timeouts (connect, read): {}".format(
+            self.client.pool_size, self.client.timeout
+        ))
+        if self.evaluation_timeout:
+            logging.info("Server will bound each evaluation to {}s and treat unresolved connectors as: {}".format(
+                self.evaluation_timeout, self.unresolved_policy
+            ))
+        if self.state_log is not None:
+            logging.info("Server will only log connector and task state transitions, with a summary every {}s".format(
+                self.state_log.summary_interval
+            ))
+        if self.broker_check.ttl > 0 or self.broker_check.retries > 0:
+            logging.info("Server will cache the broker check for {}s and retry it {} times with a backoff of {}s".format(
+                self.broker_check.ttl, self.broker_check.retries, self.broker_check.backoff
+            ))
+        if self.history is not None:
+            logging.info("Server will keep the last {} evaluations at /history and report connectors changing state {} times within {}s "
+                         "as flapping".format(self.history.capacity, self.history.flap_threshold, self.history.flap_window))
+        if self.watch is not None:
+            logging.info("Server will stream health changes at /watch, evicting subscribers {} events behind".format(
+                self.watch.buffer_size
+            ))
+        for probe in self.probes.probes.values():
+            if (probe.unhealthy_states, probe.considered_containers, probe.failure_threshold) != (
+                    self.unhealthy_states, self.considered_containers, self.failure_threshold):
+                logging.info("Server will serve /{} for states '{}' of containers '{}' with a failure threshold of {}".format(
+                    probe.name, ", ".join(probe.unhealthy_states), ", ".join(probe.considered_containers), probe.failure_threshold
+                ))
+        if self.aggregator is not None:
+            logging.info("Server will index health results by worker and serve them at /workers/{worker_id}")
         if self.worker_id is not None:
             logging.info("Server will healthcheck connectors and tasks for worker with id '{}'".format(self.worker_id))
         else:
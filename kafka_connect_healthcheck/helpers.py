@@ -13,8 +13,43 @@
 #  ANY KIND, either express or implied. See the License for the specific
 #  language governing permissions and limitations under the License.
 
+import argparse
 import logging
+import os
+import time
+from urllib.parse import quote
+
+IMPORTED_AT = time.perf_counter()
 
 
 def log_line_break():
     logging.info("------------------------------------------------")
+
+
+def parse_bool(value):
+    return str(value).lower().strip() in ["true", "yes", "1", "on"]
+
+
+def parse_non_negative_int(value):
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError("must not be negative: {}".format(value))
+    return number
+
+
+def get_connector_path(connector_name, resource=""):
+    """Returns the Kafka Connect REST path of a connector, quoting its name so any name is sent as a single path segment."""
+    return "/connectors/{}{}".format(quote(connector_name, safe=""), resource)
+
+
+def get_process_uptime():
+    """Returns the seconds since the process was started, or since this module was imported where /proc is not available."""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # the process name may contain spaces, so fields are counted from the parenthesis closing it
+            start_ticks = int(f.read().rpartition(")")[2].split()[19])
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        return max(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 0.0)
+    except (IOError, OSError, ValueError, IndexError):
+        return time.perf_counter() - IMPORTED_AT
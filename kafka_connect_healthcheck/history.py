@@ -0,0 +1,144 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import math
+import threading
+import time
+from array import array
+from collections import Counter
+
+from kafka_connect_healthcheck import snapshots
+
+ABSENT = -1
+MAX_TASK_COUNT = 65535
+
+
+class ConnectorHistory:
+    """The state code and number of unhealthy tasks of one connector in each slot of the ring buffer."""
+
+    __slots__ = ("states", "unhealthy_tasks", "last_seen")
+
+    def __init__(self, capacity):
+        self.states = array("h", [ABSENT]) * capacity
+        self.unhealthy_tasks = array("H", [0]) * capacity
+        self.last_seen = 0
+
+
+class HealthHistory:
+    """A fixed-capacity ring buffer of recent evaluations, stored as columns rather than health results.
+
+    Each evaluation takes one slot holding its timestamp, failure rate and, per connector, a state code and the number of
+    unhealthy tasks. Connectors missing from every stored evaluation are dropped, so memory depends on the capacity and the
+    size of the cluster, never on how long the process runs.
+    """
+
+    def __init__(self, capacity, flap_window=600.0, flap_threshold=3):
+        self.capacity = capacity
+        self.flap_window = flap_window
+        self.flap_threshold = flap_threshold
+        self.timestamps = array("d", [0.0]) * capacity
+        self.failure_rates = array("d", [math.nan]) * capacity
+        self.healthy = array("b", [0]) * capacity
+        self.states = snapshots.SymbolTable()
+        self.connectors = {}
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def record(self, snapshot, health_result, failure_states=frozenset(), timestamp=None):
+        """Stores one evaluation, overwriting the oldest one once the buffer is full. The snapshot is None if collection failed."""
+        unhealthy_tasks = Counter()
+        if snapshot is not None:
+            unhealthy_tasks.update(connector for connector, state in zip(snapshot.get_task_connectors(), snapshot.task_states)
+                                   if state in failure_states)
+        with self.lock:
+            slot = self.count % self.capacity
+            self.count += 1
+            self.timestamps[slot] = timestamp if timestamp is not None else time.time()
+            self.failure_rates[slot] = health_result.get("failure_rate", math.nan)
+            self.healthy[slot] = 1 if health_result["healthy"] else 0
+            for connector in self.connectors.values():
+                connector.states[slot] = ABSENT
+                connector.unhealthy_tasks[slot] = 0
+            if snapshot is not None:
+                self.record_connectors(snapshot, unhealthy_tasks, slot)
+            # a connector last seen a full buffer ago has no stored state left
+            expired = [name for name, connector in self.connectors.items() if connector.last_seen <= self.count - self.capacity]
+            for name in expired:
+                del self.connectors[name]
+
+    def record_connectors(self, snapshot, unhealthy_tasks, slot):
+        # snapshot codes are only valid within one evaluation, so they are translated into this history's codes
+        codes = [self.states.encode(symbol) for symbol in snapshot.states.symbols]
+        for index, (name, state, flags) in enumerate(zip(snapshot.connector_names, snapshot.connector_states, snapshot.connector_flags)):
+            # an unresolved connector's state is unknown rather than changed
+            if flags & snapshots.UNRESOLVED:
+                continue
+            connector = self.connectors.get(name)
+            if connector is None:
+                connector = self.connectors[name] = ConnectorHistory(self.capacity)
+            connector.states[slot] = codes[state]
+            connector.unhealthy_tasks[slot] = min(unhealthy_tasks[index], MAX_TASK_COUNT)
+            connector.last_seen = self.count
+
+    def get_slots(self):
+        size = min(self.count, self.capacity)
+        return [(self.count - size + offset) % self.capacity for offset in range(size)]
+
+    def count_changes(self, connector, slots, since):
+        changes = 0
+        previous = None
+        for slot in slots:
+            if connector.states[slot] == ABSENT or self.timestamps[slot] < since:
+                continue
+            current = (connector.states[slot], connector.unhealthy_tasks[slot])
+            if previous is not None and current != previous:
+                changes += 1
+            previous = current
+        return changes
+
+    def get_summary(self, now=None):
+        """Returns the stored evaluations, oldest first, with the states of each connector and whether it is flapping.
+
+        A connector is flapping when its state or number of unhealthy tasks changed at least flap_threshold times within the
+        last flap_window seconds.
+        """
+        since = (now if now is not None else time.time()) - self.flap_window
+        with self.lock:
+            slots = self.get_slots()
+            evaluations = [{
+                "timestamp": self.timestamps[slot],
+                "healthy": bool(self.healthy[slot]),
+                "failure_rate": None if math.isnan(self.failure_rates[slot]) else self.failure_rates[slot]
+            } for slot in slots]
+            connectors = {}
+            for name, connector in sorted(self.connectors.items()):
+                changes = self.count_changes(connector, slots, since)
+                connectors[name] = {
+                    "states": [self.decode_state(connector.states[slot]) for slot in slots],
+                    "unhealthy_tasks": [connector.unhealthy_tasks[slot] for slot in slots],
+                    "changes": changes,
+                    "flapping": changes >= self.flap_threshold
+                }
+        return {
+            "capacity": self.capacity,
+            "flap_window": self.flap_window,
+            "flap_threshold": self.flap_threshold,
+            "evaluations": evaluations,
+            "connectors": connectors,
+            "flapping": [name for name, connector in connectors.items() if connector["flapping"]]
+        }
+
+    def decode_state(self, code):
+        return self.states.decode(code) if code != ABSENT else None
@@ -0,0 +1,94 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import time
+
+
+class EvaluationIndex:
+    """Results derived from the snapshot and broker check of one evaluation, each built the first time it is asked for."""
+
+    def __init__(self, health, snapshot, broker_failures):
+        self.health = health
+        self.snapshot = snapshot
+        self.broker_failures = broker_failures
+        self.timestamp = time.time()
+        self.results = {}
+
+    def get_health_result(self, key):
+        health_result = self.results.get(key)
+        if health_result is None:
+            health_result = self.build_health_result(key)
+            # only keys seen in this evaluation are kept so arbitrary keys cannot grow the index
+            if self.is_known(key):
+                self.results[key] = health_result
+        return health_result
+
+    def is_known(self, key):
+        return True
+
+    def build_health_result(self, key):
+        raise NotImplementedError
+
+
+class IndexedResults:
+    """Serves results from an index of the last evaluation while it is at most max_age seconds old.
+
+    An older index is still used with the result of a new evaluation, which then decides whether it is stale or failed.
+    """
+
+    def __init__(self, max_age=0):
+        self.max_age = max_age
+        self.current_index = None
+
+    def index(self, *args):
+        # replacing the reference is atomic, so readers never observe a partially built index
+        self.current_index = self.build_index(*args)
+
+    def forget(self):
+        self.current_index = None
+
+    def build_index(self, *args):
+        raise NotImplementedError
+
+    def get_fresh_index(self):
+        current_index = self.current_index
+        if current_index is None or time.time() - current_index.timestamp > self.max_age:
+            return None
+        return current_index
+
+    def get_fresh_health_result(self, key):
+        """Returns the result for key from the index while it is fresh, or None when an evaluation is needed first."""
+        current_index = self.get_fresh_index()
+        if current_index is None:
+            return None
+        health_result = dict(current_index.get_health_result(key))
+        health_result["snapshot_timestamp"] = current_index.timestamp
+        health_result["max_staleness"] = self.max_age
+        return health_result
+
+    def get_evaluated_health_result(self, key, cluster_result):
+        """Returns the result for key from the index of the evaluation that produced cluster_result."""
+        current_index = self.current_index
+        if current_index is None or "error" in cluster_result:
+            return cluster_result
+        health_result = dict(current_index.get_health_result(key))
+        for field in ["snapshot_timestamp", "max_staleness"]:
+            if field in cluster_result:
+                health_result[field] = cluster_result[field]
+        # a message without an error means the snapshot the index was built from is stale
+        if "message" in cluster_result:
+            health_result["healthy"] = False
+            health_result["message"] = cluster_result["message"]
+        return health_result
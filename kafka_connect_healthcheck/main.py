@@ -14,15 +14,25 @@
 #  language governing permissions and limitations under the License.
 
 import logging
+import os
 import signal
 import sys
 from functools import partial
 from http.server import HTTPServer
+from socketserver import ThreadingMixIn
 
+from kafka_connect_healthcheck import coalescer
 from kafka_connect_healthcheck import health
 from kafka_connect_healthcheck import helpers
 from kafka_connect_healthcheck import parser
-from kafka_connect_healthcheck.handler import RequestHandler
+from kafka_connect_healthcheck import poller
+from kafka_connect_healthcheck import probes
+from kafka_connect_healthcheck import stdlib_client
+from kafka_connect_healthcheck.handler import EncodedResponseCache, RequestHandler
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
 
 
 def main():
@@ -35,16 +45,119 @@ def main():
 
     logging.info("Initializing healthcheck server...")
 
-    server_class = HTTPServer
+    server_class = ThreadingHTTPServer
+    client_options = {
+        "pool_size": args.connection_pool_size,
+        "connect_timeout": args.connect_timeout,
+        "read_timeout": args.read_timeout,
+        "keep_alive": args.keep_alive
+    }
+    if args.max_concurrency <= 0:
+        # coroutines cost no thread each, so the asyncio engine fetches as many statuses at once as it pools connections
+        args.max_concurrency = args.connection_pool_size if args.engine == "asyncio" else 1
+    if args.processes > 1:
+        if args.engine == "asyncio":
+            config_parser.error("--processes is only supported by the threaded engine")
+        if args.clusters:
+            config_parser.error("--processes is not supported with --clusters")
+        if args.poll_interval <= 0:
+            config_parser.error("--processes requires --poll-interval, so that only one process polls Kafka Connect")
+        if not hasattr(os, "fork"):
+            config_parser.error("--processes is not supported on this platform")
+
+    if args.clusters:
+        if args.engine == "asyncio":
+            config_parser.error("--clusters is only supported by the threaded engine")
+        run_fleet_server(server_class, args, client_options)
+        return
+
+    # the asyncio engine queries Kafka Connect with its own client, so the cheapest synchronous client is created
+    http_client = stdlib_client.HTTP_CLIENT if args.engine == "asyncio" else args.http_client
+
     health_object = health.Health(args.connect_url, args.connect_worker_id, args.unhealthy_states.split(","),
-                                  args.basic_auth, args.failure_threshold_percentage, args.considered_containers.split(","))
-    handler = partial(RequestHandler, health_object)
-    httpd = server_class(("0.0.0.0", args.healthcheck_port), handler)
-    logging.info("Healthcheck server started at: http://localhost:{}".format(args.healthcheck_port))
+                                  args.basic_auth, args.failure_threshold_percentage, args.considered_containers.split(","),
+                                  args.collection_mode, client_options, args.max_concurrency,
+                                  (args.adaptive_min_interval, args.adaptive_max_interval) if args.adaptive_polling else None,
+                                  args.debug_timings, args.aggregate_workers, evaluation_timeout=args.evaluation_timeout,
+                                  unresolved_policy=args.unresolved_policy, log_mode=args.log_mode,
+                                  log_summary_interval=args.log_summary_interval, history_size=args.history_size,
+                                  flap_window=args.flap_window, flap_threshold=args.flap_threshold, http_client=http_client,
+                                  broker_check_ttl=args.broker_check_ttl, broker_check_retries=args.broker_check_retries,
+                                  broker_check_backoff=args.broker_check_backoff,
+                                  # changes are streamed from the background evaluation loop, so /watch needs a poll interval
+                                  watch_buffer_size=args.watch_buffer_size if args.poll_interval > 0 else 0,
+                                  watch_heartbeat_interval=args.watch_heartbeat_interval,
+                                  probe_settings=get_probe_settings(args))
+    if args.engine == "asyncio":
+        # engines and modes are imported only when used, so the server starts without loading what it does not need
+        from kafka_connect_healthcheck import aio
+        aio.run_server(health_object, args.healthcheck_port, args.basic_auth, client_options, args.poll_interval, args.max_staleness,
+                       args.trace_mode, args.trace_max_lines, args.probe_max_age)
+        return
+
+    health_provider = coalescer.HealthCoalescer(health_object)
+    health_poller = None
+    if args.processes > 1:
+        from kafka_connect_healthcheck import prefork
+        health_poller = prefork.SharedSnapshotPoller(health_object, args.poll_interval, args.max_staleness,
+                                                     prefork.SharedSnapshot(args.shared_memory_size))
+    elif args.poll_interval > 0:
+        health_poller = poller.HealthPoller(health_object, args.poll_interval, args.max_staleness)
+    if health_poller is not None:
+        # connectors, probes and workers are looked up in the index of the latest snapshot for as long as it is served
+        health_object.connectors.max_age = health_poller.max_staleness
+        health_object.set_index_max_age(health_poller.max_staleness)
+        health_provider = health_poller
+    else:
+        health_object.set_index_max_age(args.probe_max_age)
+        if health_object.broker_check.ttl > 0:
+            # without a poller, probes run the evaluation, so the broker check is refreshed on its own schedule instead
+            health_object.start_broker_check_refresh()
+    handler = partial(RequestHandler, health_provider, health_metrics=health_object.metrics, phase_timings=health_object.timings,
+                      health_aggregator=health_object.aggregator, health_history=health_object.history, health_watch=health_object.watch,
+                      health_probes=health_object.probes, health_connectors=health_object.connectors,
+                      response_cache=EncodedResponseCache(), trace_mode=args.trace_mode, trace_max_lines=args.trace_max_lines)
+    if args.processes > 1:
+        # the worker processes relay every request they do not serve from shared memory to this handler
+        prefork.run_server(health_poller, handler, args.healthcheck_port, args.processes, args.trace_mode, args.trace_max_lines)
+        return
+    if health_poller is not None:
+        health_poller.start()
+    serve(server_class, args.healthcheck_port, handler, health_poller, health_object.metrics)
+
+
+def get_probe_settings(args):
+    probe_settings = {}
+    for name in probes.PROBES:
+        settings = {key: getattr(args, "{}_{}".format(name, key)) for key in probes.PROBE_SETTINGS}
+        for key in ["unhealthy_states", "considered_containers"]:
+            settings[key] = settings[key].split(",") if settings[key] else None
+        probe_settings[name] = settings
+    return probe_settings
+
+
+def run_fleet_server(server_class, args, client_options):
+    from kafka_connect_healthcheck import fleet
+    health_fleet = fleet.Fleet(fleet.get_cluster_healths(fleet.load_clusters(args.clusters), args, client_options),
+                               args.poll_interval, args.max_staleness)
+    health_fleet.start()
+    handler = partial(RequestHandler, None, health_fleet=health_fleet, response_cache=EncodedResponseCache(), trace_mode=args.trace_mode,
+                      trace_max_lines=args.trace_max_lines)
+    serve(server_class, args.healthcheck_port, handler, health_fleet)
+
+
+def serve(server_class, port, handler, background=None, health_metrics=None):
+    httpd = server_class(("0.0.0.0", port), handler)
+    startup_duration = helpers.get_process_uptime()
+    if health_metrics is not None:
+        health_metrics.observe_startup(startup_duration)
+    logging.info("Healthcheck server started at: http://localhost:{} in {:.3f}s".format(port, startup_duration))
     helpers.log_line_break()
 
     def stop(status_code, frame):
         logging.info("SIGINT/SIGTERM; exiting...")
+        if background is not None:
+            background.stop()
         httpd.server_close()
         sys.exit(0)
 
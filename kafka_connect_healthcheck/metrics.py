@@ -0,0 +1,182 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import threading
+import time
+from contextlib import contextmanager
+
+from kafka_connect_healthcheck import snapshots
+from kafka_connect_healthcheck import timings
+
+PREFIX = "kafka_connect_healthcheck"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def add_header(lines, name, metric_type, description):
+    lines.append("# HELP {}_{} {}".format(PREFIX, name, description))
+    lines.append("# TYPE {}_{} {}".format(PREFIX, name, metric_type))
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(key, escape_label_value(value)) for key, value in labels) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Histogram:
+    __slots__ = ["buckets", "counts", "total", "count"]
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.total += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            lines.append("{}_bucket{} {}".format(name, format_labels(labels + (("le", format_value(bound)),)), cumulative))
+        lines.append("{}_bucket{} {}".format(name, format_labels(labels + (("le", "+Inf"),)), self.count))
+        lines.append("{}_sum{} {}".format(name, format_labels(labels), format_value(self.total)))
+        lines.append("{}_count{} {}".format(name, format_labels(labels), self.count))
+        return lines
+
+
+class HealthMetrics:
+    """Collects metrics about health evaluations and Kafka Connect REST calls and renders them in the Prometheus text format."""
+
+    def __init__(self, client_stats=None, phase_timings=timings.NULL_TIMINGS):
+        self.client_stats = client_stats
+        self.timings = phase_timings
+        self.lock = threading.Lock()
+        self.evaluation_count = 0
+        self.evaluation_error_count = 0
+        self.evaluation_duration = Histogram()
+        self.upstream_requests = {}
+        self.upstream_durations = {}
+        self.snapshot = snapshots.StatusSnapshot()
+        self.health_result = None
+        self.startup_duration = None
+
+    @contextmanager
+    def track_upstream(self, endpoint):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            yield
+            outcome = "success"
+        finally:
+            duration = time.perf_counter() - start
+            # the phase name is only formatted when timings are kept
+            if self.timings.enabled:
+                self.timings.record("upstream.{}".format(endpoint), duration)
+            with self.lock:
+                key = (endpoint, outcome)
+                self.upstream_requests[key] = self.upstream_requests.get(key, 0) + 1
+                self.upstream_durations.setdefault(endpoint, Histogram()).observe(duration)
+
+    def observe_evaluation(self, snapshot, health_result, duration):
+        with self.lock:
+            self.evaluation_count += 1
+            if "error" in health_result:
+                self.evaluation_error_count += 1
+            self.evaluation_duration.observe(duration)
+            self.snapshot = snapshot if snapshot is not None else snapshots.StatusSnapshot()
+            self.health_result = health_result
+
+    def observe_startup(self, duration):
+        self.startup_duration = duration
+
+    def render(self):
+        with self.lock:
+            lines = []
+            if self.startup_duration is not None:
+                add_header(lines, "startup_seconds", "gauge", "Seconds from the start of the process until the server accepted connections.")
+                lines.append("{}_startup_seconds {}".format(PREFIX, format_value(self.startup_duration)))
+            self.render_health(lines)
+            self.render_states(lines)
+
+            add_header(lines, "evaluations_total", "counter", "Total number of health evaluations.")
+            lines.append("{}_evaluations_total {}".format(PREFIX, self.evaluation_count))
+            add_header(lines, "evaluation_errors_total", "counter", "Total number of health evaluations that raised an error.")
+            lines.append("{}_evaluation_errors_total {}".format(PREFIX, self.evaluation_error_count))
+            add_header(lines, "evaluation_duration_seconds", "histogram", "Duration of health evaluations.")
+            lines.extend(self.evaluation_duration.render("{}_evaluation_duration_seconds".format(PREFIX), ()))
+
+            add_header(lines, "upstream_requests_total", "counter", "Total number of Kafka Connect REST API calls.")
+            for (endpoint, outcome), count in sorted(self.upstream_requests.items()):
+                labels = format_labels((("endpoint", endpoint), ("outcome", outcome)))
+                lines.append("{}_upstream_requests_total{} {}".format(PREFIX, labels, count))
+            add_header(lines, "upstream_request_duration_seconds", "histogram", "Duration of Kafka Connect REST API calls.")
+            for endpoint, histogram in sorted(self.upstream_durations.items()):
+                lines.extend(histogram.render("{}_upstream_request_duration_seconds".format(PREFIX), (("endpoint", endpoint),)))
+
+        if self.client_stats is not None:
+            stats = self.client_stats()
+            add_header(lines, "upstream_connections_created_total", "counter", "Total number of connections opened to Kafka Connect.")
+            lines.append("{}_upstream_connections_created_total {}".format(PREFIX, stats["connections_created"]))
+            add_header(lines, "upstream_connections_reused_total", "counter", "Total number of requests sent on a reused connection.")
+            lines.append("{}_upstream_connections_reused_total {}".format(PREFIX, stats["connections_reused"]))
+        return "\n".join(lines) + "\n"
+
+    def render_health(self, lines):
+        health_result = self.health_result
+        if health_result is None:
+            return
+        add_header(lines, "healthy", "gauge", "Whether the last health evaluation was healthy.")
+        lines.append("{}_healthy {}".format(PREFIX, 1 if health_result["healthy"] else 0))
+        if "failure_rate" in health_result:
+            add_header(lines, "failure_rate", "gauge", "Failure rate of the considered connectors and tasks.")
+            lines.append("{}_failure_rate {}".format(PREFIX, format_value(health_result["failure_rate"])))
+            add_header(lines, "failure_threshold", "gauge", "Failure rate above which the healthcheck reports unhealthy.")
+            lines.append("{}_failure_threshold {}".format(PREFIX, format_value(health_result["failure_threshold"])))
+            add_header(lines, "failures", "gauge", "Number of failures in the last health evaluation by type.")
+            for failure_type in ["connector", "task", "broker"]:
+                count = len([f for f in health_result["failures"] if f["type"] == failure_type])
+                lines.append("{}_failures{} {}".format(PREFIX, format_labels((("type", failure_type),)), count))
+
+    def render_states(self, lines):
+        snapshot = self.snapshot
+        decode_state = snapshot.states.decode
+        add_header(lines, "connector_state", "gauge", "Current state of each connector.")
+        for name, state, worker in zip(snapshot.connector_names, snapshot.connector_states, snapshot.connector_workers):
+            labels = (("connector", name), ("state", decode_state(state)), ("worker_id", snapshot.decode_worker(worker) or ""))
+            lines.append("{}_connector_state{} 1".format(PREFIX, format_labels(labels)))
+        add_header(lines, "task_state", "gauge", "Current state of each task.")
+        for index, connector_index in enumerate(snapshot.get_task_connectors()):
+            labels = (("connector", snapshot.connector_names[connector_index]), ("task", snapshot.task_ids[index]),
+                      ("state", decode_state(snapshot.task_states[index])), ("worker_id", snapshot.decode_worker(snapshot.task_workers[index]) or ""))
+            lines.append("{}_task_state{} 1".format(PREFIX, format_labels(labels)))
@@ -16,6 +16,13 @@
 import argparse
 import os
 
+from kafka_connect_healthcheck import deadlines
+from kafka_connect_healthcheck import helpers
+from kafka_connect_healthcheck import probes
+from kafka_connect_healthcheck import stdlib_client
+from kafka_connect_healthcheck import traces
+from kafka_connect_healthcheck import transitions
+
 
 def get_parser():
     parser = argparse.ArgumentParser(description="A simple healthcheck for Kafka Connect. It can wrap a Kafka Connect "
@@ -67,12 +74,333 @@ def get_parser():
                         help="A number between 1 and 100. If set, this is the percentage of connectors that must fail for the healthcheck to fail."
                         )
 
+    parser.add_argument("--engine",
+                        default=os.environ.get("HEALTHCHECK_ENGINE", "threaded").lower(),
+                        dest="engine",
+                        choices=["threaded", "asyncio"],
+                        nargs="?",
+                        help="The engine used to serve requests and call Kafka Connect. 'asyncio' serves probes and issues "
+                             "REST calls concurrently on a single event loop. Default: threaded."
+                        )
+
+    parser.add_argument("--collection-mode",
+                        default=os.environ.get("HEALTHCHECK_COLLECTION_MODE", "bulk").lower(),
+                        dest="collection_mode",
+                        choices=["bulk", "per-connector"],
+                        nargs="?",
+                        help="How connector statuses are collected. 'bulk' fetches every status in a single request using "
+                             "'expand=status' and falls back to per-connector requests on older Kafka Connect versions. "
+                             "Default: bulk."
+                        )
+
+    parser.add_argument("--max-concurrency",
+                        default=os.environ.get("HEALTHCHECK_MAX_CONCURRENCY", 0),
+                        dest="max_concurrency",
+                        type=int,
+                        nargs="?",
+                        help="The maximum number of connector status requests issued in parallel when statuses are fetched "
+                             "per connector. Default: 1 (sequential) with the threaded engine, the connection pool size with "
+                             "the asyncio engine."
+                        )
+
+    parser.add_argument("--adaptive-polling",
+                        default=os.environ.get("HEALTHCHECK_ADAPTIVE_POLLING", "false"),
+                        dest="adaptive_polling",
+                        type=helpers.parse_bool,
+                        nargs="?",
+                        help="Whether per-connector statuses are cached and stable connectors are polled less often. "
+                             "Default: false."
+                        )
+
+    parser.add_argument("--adaptive-min-interval",
+                        default=os.environ.get("HEALTHCHECK_ADAPTIVE_MIN_INTERVAL", 0),
+                        dest="adaptive_min_interval",
+                        type=float,
+                        nargs="?",
+                        help="Seconds between polls of new, changed or failing connectors when adaptive polling is enabled. "
+                             "Default: 0 (every evaluation)."
+                        )
+
+    parser.add_argument("--adaptive-max-interval",
+                        default=os.environ.get("HEALTHCHECK_ADAPTIVE_MAX_INTERVAL", 60),
+                        dest="adaptive_max_interval",
+                        type=float,
+                        nargs="?",
+                        help="The maximum number of seconds between polls of a stable connector when adaptive polling is "
+                             "enabled. Default: 60."
+                        )
+
+    parser.add_argument("--http-client",
+                        default=os.environ.get("HEALTHCHECK_HTTP_CLIENT", stdlib_client.REQUESTS).lower(),
+                        dest="http_client",
+                        choices=stdlib_client.HTTP_CLIENTS,
+                        nargs="?",
+                        help="The HTTP client used for the Kafka Connect REST API by the threaded engine. 'http.client' only uses "
+                             "the standard library and starts faster. Default: requests."
+                        )
+
+    parser.add_argument("--connection-pool-size",
+                        default=os.environ.get("HEALTHCHECK_CONNECTION_POOL_SIZE", 10),
+                        dest="connection_pool_size",
+                        type=int,
+                        nargs="?",
+                        help="The maximum number of keep-alive connections pooled for Kafka Connect REST API calls. Default: 10."
+                        )
+
+    parser.add_argument("--connect-timeout",
+                        default=os.environ.get("HEALTHCHECK_CONNECT_TIMEOUT", 5.0),
+                        dest="connect_timeout",
+                        type=float,
+                        nargs="?",
+                        help="Seconds to wait when opening a connection to the Kafka Connect REST API. Default: 5."
+                        )
+
+    parser.add_argument("--read-timeout",
+                        default=os.environ.get("HEALTHCHECK_READ_TIMEOUT", 30.0),
+                        dest="read_timeout",
+                        type=float,
+                        nargs="?",
+                        help="Seconds to wait for a response from the Kafka Connect REST API. Default: 30."
+                        )
+
+    parser.add_argument("--keep-alive",
+                        default=os.environ.get("HEALTHCHECK_KEEP_ALIVE", "true"),
+                        dest="keep_alive",
+                        type=helpers.parse_bool,
+                        nargs="?",
+                        help="Whether connections to the Kafka Connect REST API are kept alive and reused. Default: true."
+                        )
+
+    parser.add_argument("--evaluation-timeout",
+                        default=os.environ.get("HEALTHCHECK_EVALUATION_TIMEOUT", 0),
+                        dest="evaluation_timeout",
+                        type=float,
+                        nargs="?",
+                        help="If set, the number of seconds each health evaluation may take. Every Kafka Connect REST call is "
+                             "bounded by the remaining budget and connectors whose status was not fetched in time are "
+                             "reported as unresolved. Default: 0 (unbounded)."
+                        )
+
+    parser.add_argument("--unresolved-policy",
+                        default=os.environ.get("HEALTHCHECK_UNRESOLVED_POLICY", deadlines.FAILED).lower(),
+                        dest="unresolved_policy",
+                        choices=deadlines.UNRESOLVED_POLICIES,
+                        nargs="?",
+                        help="How connectors left unresolved by the evaluation timeout are counted: as 'failed', as 'healthy', "
+                             "or 'ignore'd in the failure rate. Default: failed."
+                        )
+
+    parser.add_argument("--broker-check-ttl",
+                        default=os.environ.get("HEALTHCHECK_BROKER_CHECK_TTL", 30),
+                        dest="broker_check_ttl",
+                        type=float,
+                        nargs="?",
+                        help="Seconds for which the result of the broker connectivity check, made when no connector runs on "
+                             "this worker, is reused. 0 checks on every evaluation. Default: 30."
+                        )
+
+    parser.add_argument("--broker-check-retries",
+                        default=os.environ.get("HEALTHCHECK_BROKER_CHECK_RETRIES", 2),
+                        dest="broker_check_retries",
+                        type=int,
+                        nargs="?",
+                        help="The number of times a failed broker check is retried, each time against the next connector, "
+                             "before a broker failure is reported. Default: 2."
+                        )
+
+    parser.add_argument("--broker-check-backoff",
+                        default=os.environ.get("HEALTHCHECK_BROKER_CHECK_BACKOFF", 0.1),
+                        dest="broker_check_backoff",
+                        type=float,
+                        nargs="?",
+                        help="Seconds to wait before the first retry of a failed broker check, doubled on each further retry. "
+                             "Default: 0.1."
+                        )
+
+    parser.add_argument("--poll-interval",
+                        default=os.environ.get("HEALTHCHECK_POLL_INTERVAL", 0),
+                        dest="poll_interval",
+                        type=float,
+                        nargs="?",
+                        help="If set, the health result is refreshed in the background every this many seconds and requests "
+                             "are served from the latest snapshot. Default: 0 (evaluate on every request)."
+                        )
+
+    parser.add_argument("--max-staleness",
+                        default=os.environ.get("HEALTHCHECK_MAX_STALENESS", 0),
+                        dest="max_staleness",
+                        type=float,
+                        nargs="?",
+                        help="Seconds after which a background snapshot is considered stale and reported as unhealthy. "
+                             "Default: 3 times the poll interval."
+                        )
+
+    parser.add_argument("--probe-max-age",
+                        default=os.environ.get("HEALTHCHECK_PROBE_MAX_AGE", 10),
+                        dest="probe_max_age",
+                        type=float,
+                        nargs="?",
+                        help="Without a poll interval, the seconds for which the /live, /ready, /startup and /workers/{id} "
+                             "results are served from the latest evaluation instead of evaluating again. Default: 10."
+                        )
+
+    parser.add_argument("--processes",
+                        default=os.environ.get("HEALTHCHECK_PROCESSES", 1),
+                        dest="processes",
+                        type=int,
+                        nargs="?",
+                        help="The number of processes serving requests. With more than one, this process polls Kafka Connect "
+                             "and publishes each snapshot into shared memory, and the forked processes serve it. Requires a "
+                             "poll interval. Default: 1."
+                        )
+
+    parser.add_argument("--shared-memory-size",
+                        default=os.environ.get("HEALTHCHECK_SHARED_MEMORY_SIZE", 16777216),
+                        dest="shared_memory_size",
+                        type=int,
+                        nargs="?",
+                        help="The maximum size in bytes of an encoded health result shared with the serving processes. "
+                             "Default: 16777216 (16 MiB)."
+                        )
+
+    parser.add_argument("--watch-buffer-size",
+                        default=os.environ.get("HEALTHCHECK_WATCH_BUFFER_SIZE", 256),
+                        dest="watch_buffer_size",
+                        type=int,
+                        nargs="?",
+                        help="The number of events buffered for each subscriber of /watch. A subscriber that falls further "
+                             "behind is disconnected. 0 disables /watch, which requires a poll interval. Default: 256."
+                        )
+
+    parser.add_argument("--watch-heartbeat-interval",
+                        default=os.environ.get("HEALTHCHECK_WATCH_HEARTBEAT_INTERVAL", 15),
+                        dest="watch_heartbeat_interval",
+                        type=float,
+                        nargs="?",
+                        help="Seconds without events after which a heartbeat comment is sent to /watch subscribers. Default: 15."
+                        )
+
+    parser.add_argument("--aggregate-workers",
+                        default=os.environ.get("HEALTHCHECK_AGGREGATE_WORKERS", "false"),
+                        dest="aggregate_workers",
+                        type=helpers.parse_bool,
+                        nargs="?",
+                        help="Whether the health result of every worker is indexed from one cluster-wide evaluation and "
+                             "served at /workers/{worker_id}. Default: false."
+                        )
+
+    for probe in probes.PROBES:
+        # each probe endpoint judges the shared evaluation by its own settings, falling back to the settings above
+        parser.add_argument("--{}-unhealthy-states".format(probe),
+                            default=os.environ.get("HEALTHCHECK_{}_UNHEALTHY_STATES".format(probe.upper()), "").upper(),
+                            dest="{}_unhealthy_states".format(probe),
+                            nargs="?",
+                            help="A comma separated lists of connector and task states marked as unhealthy by /{}. "
+                                 "Default: the value of --unhealthy-states.".format(probe)
+                            )
+
+        parser.add_argument("--{}-considered-containers".format(probe),
+                            default=os.environ.get("HEALTHCHECK_{}_CONSIDERED_CONTAINERS".format(probe.upper()), "").upper(),
+                            dest="{}_considered_containers".format(probe),
+                            nargs="?",
+                            help="A comma separated lists of container types considered by /{}. "
+                                 "Default: the value of --considered-containers.".format(probe)
+                            )
+
+        parser.add_argument("--{}-failure-threshold-percentage".format(probe),
+                            default=os.environ.get("HEALTHCHECK_{}_FAILURE_THRESHOLD_PERCENTAGE".format(probe.upper())),
+                            dest="{}_failure_threshold_percentage".format(probe),
+                            type=int,
+                            nargs="?",
+                            help="The percentage of connectors and tasks that must fail for /{} to fail. "
+                                 "Default: the value of --failure-threshold-percentage.".format(probe)
+                            )
+
+    parser.add_argument("--history-size",
+                        default=os.environ.get("HEALTHCHECK_HISTORY_SIZE", 60),
+                        dest="history_size",
+                        type=int,
+                        nargs="?",
+                        help="The number of recent evaluations kept in memory and served at /history. 0 disables the history. "
+                             "Default: 60."
+                        )
+
+    parser.add_argument("--flap-window",
+                        default=os.environ.get("HEALTHCHECK_FLAP_WINDOW", 600),
+                        dest="flap_window",
+                        type=float,
+                        nargs="?",
+                        help="The number of seconds of history in which connector state changes are counted. Default: 600."
+                        )
+
+    parser.add_argument("--flap-threshold",
+                        default=os.environ.get("HEALTHCHECK_FLAP_THRESHOLD", 3),
+                        dest="flap_threshold",
+                        type=int,
+                        nargs="?",
+                        help="The number of state changes within the flap window at which a connector is reported as flapping. "
+                             "Default: 3."
+                        )
+
+    parser.add_argument("--clusters",
+                        default=os.environ.get("HEALTHCHECK_CLUSTERS", ""),
+                        dest="clusters",
+                        nargs="?",
+                        help="A JSON object of named Kafka Connect clusters to healthcheck from this process, or the path to a "
+                             "file containing one. Each cluster may set connect_url, connect_worker_id, unhealthy_states, "
+                             "basic_auth, failure_threshold_percentage and considered_containers. Default: empty."
+                        )
+
+    parser.add_argument("--trace-mode",
+                        default=os.environ.get("HEALTHCHECK_TRACE_MODE", traces.FULL).lower(),
+                        dest="trace_mode",
+                        choices=traces.TRACE_MODES,
+                        nargs="?",
+                        help="How task stack traces are rendered in health responses. 'truncated' keeps the first lines of each "
+                             "trace and 'deduplicated' stores each distinct trace once in a 'traces' table referenced by id. "
+                             "Can be overridden per request with the 'traces' query parameter. Default: full."
+                        )
+
+    parser.add_argument("--trace-max-lines",
+                        default=os.environ.get("HEALTHCHECK_TRACE_MAX_LINES", 20),
+                        dest="trace_max_lines",
+                        type=helpers.parse_non_negative_int,
+                        help="The number of lines of each stack trace kept when traces are truncated. Default: 20."
+                        )
+
     parser.add_argument("--basic-auth",
                         default=os.environ.get("HEALTHCHECK_BASIC_AUTH", ""),
                         dest="basic_auth",
                         nargs="?",
                         help="Colon-separated credentials for basic HTTP authentication. Default: empty.")
 
+    parser.add_argument("--debug-timings",
+                        default=os.environ.get("HEALTHCHECK_DEBUG_TIMINGS", "false"),
+                        dest="debug_timings",
+                        type=helpers.parse_bool,
+                        nargs="?",
+                        help="Whether the duration of each evaluation phase and Kafka Connect REST call is recorded and "
+                             "exposed at /debug/timings. Default: false."
+                        )
+
+    parser.add_argument("--log-mode",
+                        default=os.environ.get("HEALTHCHECK_LOG_MODE", transitions.ALL).lower(),
+                        dest="log_mode",
+                        choices=transitions.LOG_MODES,
+                        nargs="?",
+                        help="Which connector and task states are logged. 'all' logs every state on every evaluation and "
+                             "'transitions' only logs states that changed, plus a periodic summary. Default: all."
+                        )
+
+    parser.add_argument("--log-summary-interval",
+                        default=os.environ.get("HEALTHCHECK_LOG_SUMMARY_INTERVAL", 60),
+                        dest="log_summary_interval",
+                        type=float,
+                        nargs="?",
+                        help="The minimum number of seconds between summary lines when only state transitions are logged. "
+                             "Default: 60."
+                        )
+
     parser.add_argument("--log-level",
                         default=os.environ.get("HEALTHCHECK_LOG_LEVEL", "INFO").upper(),
                         dest="log_level",
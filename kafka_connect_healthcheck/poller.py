@@ -0,0 +1,71 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import logging
+import threading
+import time
+
+
+class HealthPoller:
+    """Refreshes the health result on a fixed interval in a background thread and serves the latest snapshot."""
+
+    def __init__(self, health, poll_interval, max_staleness=None):
+        self.health = health
+        self.poll_interval = poll_interval
+        self.max_staleness = max_staleness if max_staleness else poll_interval * 3
+        self.snapshot = None
+        self.first_snapshot = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="health-poller", daemon=True)
+
+    def start(self):
+        logging.info("Server will refresh the health result every {}s and report unhealthy once it is older than {}s".format(
+            self.poll_interval, self.max_staleness
+        ))
+        # the first refresh runs in the background, so the server binds its port and answers /ping right away
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as ex:
+                logging.error("Error while refreshing the health snapshot. Error: {}".format(ex))
+            if self.stop_event.wait(self.poll_interval):
+                return
+
+    def refresh(self):
+        self.publish(self.health.get_health_result())
+
+    def publish(self, health_result):
+        health_result["snapshot_timestamp"] = time.time()
+        health_result["max_staleness"] = self.max_staleness
+        self.snapshot = health_result
+        self.first_snapshot.set()
+
+    def get_health_result(self):
+        # probes sent before the first refresh completes wait for it rather than failing
+        self.first_snapshot.wait()
+        snapshot = self.snapshot
+        if time.time() - snapshot["snapshot_timestamp"] <= self.max_staleness:
+            return snapshot
+        logging.warning("Health snapshot is older than {}s, assuming unhealthy".format(self.max_staleness))
+        stale_result = dict(snapshot)
+        stale_result["healthy"] = False
+        stale_result["message"] = "Health snapshot is older than the max staleness, assuming unhealthy."
+        return stale_result
@@ -0,0 +1,406 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import http.client
+import json
+import logging
+import mmap
+import os
+import shutil
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import HTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from urllib.parse import urlsplit
+
+from kafka_connect_healthcheck import handler
+from kafka_connect_healthcheck import helpers
+from kafka_connect_healthcheck import poller
+from kafka_connect_healthcheck import traces
+
+SEQUENCE = struct.Struct("=Q")
+# body length, status code, snapshot timestamp, max staleness and ETag of the published result
+HEADER = struct.Struct("=QHdd42s")
+BODY_OFFSET = SEQUENCE.size + HEADER.size
+
+# the exit status of a worker process that could not bind the port; restarting it would fail the same way
+BOOT_ERROR = 3
+
+
+class PublishedResult:
+    """One health result read from shared memory, with the responses derived from it for other trace modes or once stale."""
+
+    __slots__ = ("sequence", "status", "body", "etag", "snapshot_timestamp", "max_staleness", "variants")
+
+    def __init__(self, sequence, status, body, etag, snapshot_timestamp, max_staleness):
+        self.sequence = sequence
+        self.status = status
+        self.body = body
+        self.etag = etag
+        self.snapshot_timestamp = snapshot_timestamp
+        self.max_staleness = max_staleness
+        self.variants = {}
+
+    def get_response(self, trace_mode, trace_max_lines):
+        """Returns the status code and encoded response to serve for a trace mode."""
+        stale = time.time() - self.snapshot_timestamp > self.max_staleness
+        if stale:
+            logging.warning("Health snapshot is older than {}s, assuming unhealthy".format(self.max_staleness))
+        key = (traces.FULL if not stale and trace_mode == traces.FULL else trace_mode, stale)
+        variant = self.variants.get(key)
+        if variant is not None:
+            return variant
+        if key == (traces.FULL, False):
+            variant = (self.status, handler.EncodedResponse(self.body, self.etag))
+        else:
+            payload = json.loads(self.body.decode("utf-8"))
+            if stale:
+                payload["healthy"] = False
+                payload["message"] = "Health snapshot is older than the max staleness, assuming unhealthy."
+            encoded = handler.EncodedResponse(*handler.encode_payload(traces.apply_trace_mode(payload, trace_mode, trace_max_lines)))
+            variant = (200 if payload["healthy"] else 503, encoded)
+        self.variants[key] = variant
+        return variant
+
+
+class SharedSnapshot:
+    """The latest encoded health result in an anonymous shared memory mapping, written by the polling process and read by
+    the serving processes forked from it.
+
+    Writes are guarded by a sequence counter (a seqlock): the writer makes it odd before changing the buffer and even again
+    once the result is complete, and readers retry when it was odd or changed while they copied the result. Each process
+    copies a result out of the mapping once per sequence and serves that copy until a new result is published.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = mmap.mmap(-1, BODY_OFFSET + capacity)
+        self.sequence = 0
+        self.latest = None
+
+    def publish(self, health_result):
+        body, etag = handler.encode_payload(health_result)
+        if len(body) > self.capacity:
+            logging.error("The health result is {} bytes, more than the shared memory size of {} bytes".format(len(body), self.capacity))
+            health_result = {
+                "healthy": False,
+                "message": "The health result is larger than the shared memory size, assuming unhealthy.",
+                "snapshot_timestamp": health_result["snapshot_timestamp"],
+                "max_staleness": health_result["max_staleness"]
+            }
+            body, etag = handler.encode_payload(health_result)
+        self.write(200 if health_result["healthy"] else 503, body, etag, health_result["snapshot_timestamp"],
+                   health_result["max_staleness"])
+
+    def write(self, status, body, etag, snapshot_timestamp, max_staleness):
+        SEQUENCE.pack_into(self.buffer, 0, self.sequence + 1)
+        HEADER.pack_into(self.buffer, SEQUENCE.size, len(body), status, snapshot_timestamp, max_staleness, etag.encode("ascii"))
+        self.buffer[BODY_OFFSET:BODY_OFFSET + len(body)] = body
+        self.sequence += 2
+        SEQUENCE.pack_into(self.buffer, 0, self.sequence)
+
+    def get_sequence(self):
+        return SEQUENCE.unpack_from(self.buffer, 0)[0]
+
+    def read(self):
+        """Returns the latest published result, waiting for the first one to be published."""
+        while True:
+            sequence = self.get_sequence()
+            latest = self.latest
+            if latest is not None and latest.sequence == sequence:
+                return latest
+            if sequence == 0 or sequence & 1:
+                # nothing has been published yet, or the writer is in the middle of a result
+                time.sleep(0.05 if sequence == 0 else 0.001)
+                continue
+            length, status, snapshot_timestamp, max_staleness, etag = HEADER.unpack_from(self.buffer, SEQUENCE.size)
+            body = self.buffer[BODY_OFFSET:BODY_OFFSET + length]
+            if self.get_sequence() == sequence:
+                self.latest = PublishedResult(sequence, status, body, etag.decode("ascii"), snapshot_timestamp, max_staleness)
+                return self.latest
+
+    def close(self):
+        self.buffer.close()
+
+
+class SharedSnapshotPoller(poller.HealthPoller):
+    """A health poller that also publishes each snapshot into shared memory for the serving processes."""
+
+    def __init__(self, health, poll_interval, max_staleness=None, shared_snapshot=None):
+        super().__init__(health, poll_interval, max_staleness)
+        self.shared_snapshot = shared_snapshot
+
+    def publish(self, health_result):
+        super().publish(health_result)
+        self.shared_snapshot.publish(health_result)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """An HTTP connection to a server listening on a Unix domain socket."""
+
+    def __init__(self, address):
+        super().__init__("localhost")
+        self.address = address
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.address)
+
+
+class SharedSnapshotHandler(handler.RequestHandler):
+    """Serves / from shared memory and /ping itself, and relays every other request to the polling process, which answers it
+    with the handler of a single process server."""
+
+    # headers the relayed response would otherwise send twice, or that only apply to the connection to the polling process
+    relayed_headers_skipped = ["server", "date", "connection", "keep-alive", "transfer-encoding"]
+
+    def __init__(self, shared_snapshot, internal_address, *args, **kwargs):
+        self.shared_snapshot = shared_snapshot
+        self.internal_address = internal_address
+        super().__init__(None, *args, **kwargs)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path in ["/"]:
+            self.respond_published(self.shared_snapshot.read(), url.query)
+        elif url.path in ["/ping"]:
+            self.respond(*handler.get_ping_response())
+        else:
+            self.relay()
+
+    def respond_published(self, published, query=""):
+        trace_mode = handler.get_trace_mode(query, self.trace_mode)
+        status, encoded = published.get_response(trace_mode, self.trace_max_lines)
+        headers = {"Age": str(int(max(time.time() - published.snapshot_timestamp, 0)))}
+        self.respond(*handler.get_encoded_response(status, encoded, headers, self.headers.get("If-None-Match"),
+                                                   self.headers.get("Accept-Encoding")), compressed=True)
+
+    def relay(self):
+        connection = UnixHTTPConnection(self.internal_address)
+        try:
+            connection.request(self.command, self.path, headers=dict(self.headers))
+            response = connection.getresponse()
+        except OSError as ex:
+            connection.close()
+            logging.error("Worker process {} could not relay {} to the polling process. Error: {}".format(os.getpid(), self.path, ex))
+            self.respond(503, "")
+            return
+        try:
+            self.send_response(response.status)
+            for key, value in response.getheaders():
+                if key.lower() not in self.relayed_headers_skipped:
+                    self.send_header(key, value)
+            if response.length is None and response.status != 304:
+                # a response without a length, such as the /watch stream, ends when the connection is closed
+                self.close_connection = True
+                self.send_header("Connection", "close")
+            self.end_headers()
+            while True:
+                chunk = response.read1(65536)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                self.wfile.flush()
+        finally:
+            connection.close()
+
+
+class PreforkHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class InternalHTTPServer(ThreadingMixIn, UnixStreamServer):
+    """Serves the requests relayed by the worker processes in the polling process."""
+
+    daemon_threads = True
+
+
+class ReusePortHTTPServer(PreforkHTTPServer):
+    """Binds with SO_REUSEPORT, so every process has its own listening socket and the kernel spreads connections across them."""
+
+    def server_bind(self):
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+
+class Prefork:
+    """Runs the health poller in this process and serves its snapshots from a number of forked worker processes.
+
+    With SO_REUSEPORT each worker binds its own socket to the port. Without it, the port is bound once before forking
+    and the workers accept from the socket they inherit. The workers are forked by a supervisor process, itself forked
+    before this process starts any thread, so no worker inherits a lock held by a thread that does not exist in it. The
+    supervisor replaces workers that exit. Requests for anything but / and /ping are relayed by the workers to this
+    process, which serves them over a Unix domain socket with the handler of a single process server.
+    """
+
+    def __init__(self, health_poller, shared_snapshot, port, processes, internal_handler, trace_mode=traces.FULL,
+                 trace_max_lines=None):
+        self.health_poller = health_poller
+        self.shared_snapshot = shared_snapshot
+        self.port = port
+        self.processes = processes
+        self.internal_handler = internal_handler
+        self.internal_directory = tempfile.mkdtemp(prefix="kafka-connect-healthcheck-")
+        self.internal_address = os.path.join(self.internal_directory, "internal.sock")
+        self.handler = partial(SharedSnapshotHandler, shared_snapshot, self.internal_address, trace_mode=trace_mode,
+                               trace_max_lines=trace_max_lines)
+        self.reuse_port = hasattr(socket, "SO_REUSEPORT")
+        self.httpd = None
+        self.internal_httpd = None
+        self.supervisor_pid = None
+        self.pids = set()
+        self.stop_event = threading.Event()
+
+    def start(self):
+        if not self.reuse_port:
+            self.httpd = self.create_server()
+        # bound before forking, so requests relayed by the first workers are accepted once this process serves them
+        self.internal_httpd = InternalHTTPServer(self.internal_address, self.internal_handler)
+        pid = os.fork()
+        if pid == 0:
+            # the supervisor never returns into the code that forked it
+            os._exit(self.run_supervisor())
+        self.supervisor_pid = pid
+        threading.Thread(target=self.internal_httpd.serve_forever, name="prefork-internal", daemon=True).start()
+
+    def create_server(self):
+        server_class = ReusePortHTTPServer if self.reuse_port else PreforkHTTPServer
+        return server_class(("0.0.0.0", self.port), self.handler)
+
+    def run_supervisor(self):
+        signal.signal(signal.SIGINT, self.stop_supervisor)
+        signal.signal(signal.SIGTERM, self.stop_supervisor)
+        self.internal_httpd.socket.close()
+        for _ in range(self.processes):
+            self.fork_worker()
+        while True:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                return 1
+            self.pids.discard(pid)
+            if os.WIFEXITED(status) and os.WEXITSTATUS(status) == BOOT_ERROR:
+                self.stop_workers()
+                return BOOT_ERROR
+            logging.warning("Worker process {} exited with status {}, starting a new one".format(pid, status))
+            self.fork_worker()
+
+    def stop_supervisor(self, status_code, frame):
+        self.stop_workers()
+        os._exit(0)
+
+    def fork_worker(self):
+        pid = os.fork()
+        if pid > 0:
+            self.pids.add(pid)
+            return
+        # the worker never returns into the code that forked it
+        os._exit(self.run_worker())
+
+    def run_worker(self):
+        signal.signal(signal.SIGINT, lambda status_code, frame: os._exit(0))
+        signal.signal(signal.SIGTERM, lambda status_code, frame: os._exit(0))
+        try:
+            httpd = self.httpd if self.httpd is not None else self.create_server()
+        except OSError as ex:
+            logging.error("Worker process {} could not bind port {}. Error: {}".format(os.getpid(), self.port, ex))
+            return BOOT_ERROR
+        logging.debug("Worker process {} is serving health results from shared memory".format(os.getpid()))
+        try:
+            httpd.serve_forever()
+        except Exception as ex:
+            logging.error("Worker process {} failed. Error: {}".format(os.getpid(), ex))
+        return 1
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.health_poller.refresh()
+            except Exception as ex:
+                logging.error("Error while refreshing the health snapshot. Error: {}".format(ex))
+            self.check_supervisor()
+            self.stop_event.wait(self.health_poller.poll_interval)
+
+    def check_supervisor(self):
+        pid, status = os.waitpid(self.supervisor_pid, os.WNOHANG)
+        if pid == 0:
+            return
+        self.supervisor_pid = None
+        if os.WIFEXITED(status) and os.WEXITSTATUS(status) == BOOT_ERROR:
+            raise RuntimeError("A worker process could not bind port {}".format(self.port))
+        raise RuntimeError("The worker supervisor process exited with status {}".format(status))
+
+    def stop_workers(self):
+        pids = list(self.pids)
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in pids:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self.pids.clear()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.supervisor_pid is not None:
+            self.pids.add(self.supervisor_pid)
+            self.supervisor_pid = None
+        self.stop_workers()
+        if self.httpd is not None:
+            self.httpd.server_close()
+        if self.internal_httpd is not None:
+            self.internal_httpd.server_close()
+        shutil.rmtree(self.internal_directory, ignore_errors=True)
+
+
+def run_server(health_poller, internal_handler, port, processes, trace_mode=traces.FULL, trace_max_lines=None):
+    shared_snapshot = health_poller.shared_snapshot
+    prefork = Prefork(health_poller, shared_snapshot, port, processes, internal_handler, trace_mode, trace_max_lines)
+    logging.info("Server will refresh the health result every {}s and report unhealthy once it is older than {}s".format(
+        health_poller.poll_interval, health_poller.max_staleness
+    ))
+    prefork.start()
+    startup_duration = helpers.get_process_uptime()
+    health_poller.health.metrics.observe_startup(startup_duration)
+    logging.info("Healthcheck server started at: http://localhost:{} with {} worker processes in {:.3f}s".format(
+        port, processes, startup_duration
+    ))
+    helpers.log_line_break()
+
+    def stop(status_code, frame):
+        logging.info("SIGINT/SIGTERM; exiting...")
+        prefork.stop()
+        shared_snapshot.close()
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    try:
+        prefork.run()
+    except RuntimeError as ex:
+        logging.error("{}; exiting...".format(ex))
+        prefork.stop()
+        sys.exit(1)
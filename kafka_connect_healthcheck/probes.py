@@ -0,0 +1,107 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+from kafka_connect_healthcheck import indexes
+
+LIVE = "live"
+READY = "ready"
+STARTUP = "startup"
+PROBES = [LIVE, READY, STARTUP]
+PROBE_SETTINGS = ["unhealthy_states", "considered_containers", "failure_threshold_percentage"]
+
+
+class Probe:
+    """The unhealthy states, considered containers and failure threshold one probe endpoint judges an evaluation by."""
+
+    def __init__(self, name, unhealthy_states, considered_containers, failure_threshold):
+        self.name = name
+        self.unhealthy_states = [x.upper().strip() for x in unhealthy_states]
+        self.considered_containers = [x.lower().strip() for x in considered_containers]
+        self.failure_threshold = failure_threshold
+
+    def is_in_unhealthy_state(self, state):
+        return state.upper() in self.unhealthy_states
+
+
+def get_probes(health, probe_settings=None):
+    """Creates the probes served by a Health object. Settings a probe does not set are taken from the healthcheck itself."""
+    probes = []
+    for name in PROBES:
+        settings = (probe_settings or {}).get(name) or {}
+        unhealthy_states = settings.get("unhealthy_states") or health.unhealthy_states
+        considered_containers = settings.get("considered_containers") or health.considered_containers
+        failure_threshold_percentage = settings.get("failure_threshold_percentage")
+        failure_threshold = failure_threshold_percentage * .01 if failure_threshold_percentage is not None else health.failure_threshold
+        probes.append(Probe(name, unhealthy_states, considered_containers, failure_threshold))
+    return probes
+
+
+class ProbeIndex(indexes.EvaluationIndex):
+    """The result of every probe for one evaluation, built from its snapshot the first time a probe asks for it."""
+
+    def __init__(self, health, snapshot, broker_failures):
+        super().__init__(health, snapshot, broker_failures)
+        self.worker_codes = snapshot.workers.select(health.is_on_this_worker)
+        self.has_connectors = not snapshot.get_resolved_worker_codes().isdisjoint(self.worker_codes)
+
+    def build_health_result(self, probe):
+        snapshot = self.snapshot
+        health_result = {"failures": [], "failure_states": probe.unhealthy_states}
+        # the evaluation already logged the unresolved connectors, so they are only reported here
+        unresolved = snapshot.get_unresolved_names()
+        if unresolved:
+            health_result["unresolved"] = unresolved
+            health_result["unresolved_policy"] = self.health.unresolved_policy
+        failure_states = snapshot.states.select(probe.is_in_unhealthy_state)
+        positions = snapshot.get_failure_positions(failure_states, self.worker_codes, probe.considered_containers)
+        health_result["failures"].extend(snapshot.get_failure(*position) for position in positions)
+        # a probe that considers no connector on this worker falls back to the broker check, as the healthcheck does
+        if not self.is_covered(probe) and len(snapshot) > 0:
+            health_result["failures"].extend(self.broker_failures)
+        self.health.calculate_health_result(snapshot, health_result, probe.considered_containers, probe.failure_threshold)
+        return health_result
+
+    def is_covered(self, probe):
+        return "connector" in probe.considered_containers and self.has_connectors
+
+
+class HealthProbes(indexes.IndexedResults):
+    """Serves the /live, /ready and /startup results from the snapshot of the last evaluation, so every probe shares one sweep.
+
+    Each probe has its own unhealthy states, considered containers and failure threshold, and its result has the same shape
+    and values as the result of a healthcheck started with those settings. Probes arriving within max_age seconds of an
+    evaluation are served from it without evaluating again.
+    """
+
+    def __init__(self, health, probes, max_age=0):
+        super().__init__(max_age)
+        self.health = health
+        self.probes = {probe.name: probe for probe in probes}
+
+    def needs_broker_check(self, snapshot):
+        if len(snapshot) == 0:
+            return False
+        worker_codes = snapshot.workers.select(self.health.is_on_this_worker)
+        has_connectors = not snapshot.get_resolved_worker_codes().isdisjoint(worker_codes)
+        return any("connector" not in probe.considered_containers or not has_connectors for probe in self.probes.values())
+
+    def build_index(self, snapshot, broker_failures):
+        return ProbeIndex(self.health, snapshot, broker_failures)
+
+    def get_fresh_probe_health_result(self, name):
+        return self.get_fresh_health_result(self.probes[name])
+
+    def get_probe_health_result(self, name, cluster_result):
+        return self.get_evaluated_health_result(self.probes[name], cluster_result)
@@ -0,0 +1,322 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import sys
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, chain, compress, repeat
+from operator import itemgetter, not_, sub
+
+# connector flags
+ERROR = 1
+UNRESOLVED = 2
+
+NO_WORKER = -1
+
+
+def intern_trace(trace):
+    # a broker outage fails many tasks with the same trace; interning keeps a single copy of it in memory
+    return sys.intern(trace)
+
+
+def find_codes(column, codes):
+    """Returns the indexes of the items of an array column equal to any of codes, in ascending order.
+
+    The column is searched as bytes, so the scan runs in C and Python code only runs for the items that match. A match
+    that is not aligned to an item spans two items and is skipped.
+    """
+    data = column.tobytes()
+    size = column.itemsize
+    indexes = []
+    for code in codes:
+        pattern = array(column.typecode, [code]).tobytes()
+        position = data.find(pattern)
+        while position >= 0:
+            if position % size:
+                position = data.find(pattern, position + 1)
+                continue
+            indexes.append(position // size)
+            position = data.find(pattern, position + size)
+    if len(codes) > 1:
+        indexes.sort()
+    return indexes
+
+
+class SymbolCodes(dict):
+    """The codes of a symbol table, encoding a value the first time it is looked up."""
+
+    __slots__ = ("symbols",)
+
+    def __init__(self, symbols):
+        super().__init__()
+        self.symbols = symbols
+
+    def __missing__(self, value):
+        code = len(self.symbols)
+        self.symbols.append(sys.intern(value))
+        self[value] = code
+        return code
+
+
+class SymbolTable:
+    """Encodes repeated strings such as states and worker ids as small integers, keeping one interned copy of each."""
+
+    __slots__ = ("symbols", "codes")
+
+    def __init__(self):
+        self.symbols = []
+        # lookups of known symbols never leave C, so whole columns are encoded with map(codes.__getitem__, values)
+        self.codes = SymbolCodes(self.symbols)
+
+    def encode(self, value):
+        return self.codes[value]
+
+    def decode(self, code):
+        return self.symbols[code]
+
+    def select(self, predicate):
+        """Returns the codes of every symbol matching the predicate, so filters run once per distinct value."""
+        return frozenset(code for code, symbol in enumerate(self.symbols) if predicate(symbol))
+
+
+class StatusSnapshot:
+    """The connector and task statuses of one evaluation, stored as parallel array-backed columns.
+
+    States and worker ids are encoded through symbol tables, so each connector and task costs a few integer slots
+    instead of a dict. Tasks are stored contiguously per connector; the tasks of connector i are those between
+    task_offsets[i] and task_offsets[i + 1]. Errors and traces are rare and kept in sparse dicts keyed by index.
+
+    Columns are filled and scanned with map, compress and itemgetter over whole columns, so the per-item work runs in C
+    rather than in a Python loop.
+    """
+
+    __slots__ = ("states", "workers", "connector_names", "connector_states", "connector_workers", "connector_flags",
+                 "connector_errors", "task_offsets", "task_ids", "task_states", "task_workers", "task_traces")
+
+    def __init__(self):
+        self.states = SymbolTable()
+        self.workers = SymbolTable()
+        # tasks and connectors that are not assigned to a worker have no worker id
+        self.workers.codes[None] = NO_WORKER
+        self.connector_names = []
+        self.connector_states = array("i")
+        self.connector_workers = array("i")
+        self.connector_flags = array("b")
+        self.connector_errors = {}
+        self.task_offsets = array("i", [0])
+        self.task_ids = []
+        self.task_states = array("i")
+        self.task_workers = array("i")
+        self.task_traces = {}
+
+    @classmethod
+    def from_statuses(cls, connector_statuses):
+        snapshot = cls()
+        snapshot.add_connectors(connector_statuses)
+        return snapshot
+
+    @classmethod
+    def from_expanded(cls, expanded, get_connector_error):
+        snapshot = cls()
+        snapshot.add_expanded(expanded, get_connector_error)
+        return snapshot
+
+    def __len__(self):
+        return len(self.connector_names)
+
+    def add_connectors(self, connector_statuses):
+        state_codes = self.states.codes
+        worker_codes = self.workers.codes
+        task_ids = self.task_ids
+        for connector in connector_statuses:
+            index = len(self.connector_names)
+            flags = (ERROR if "error" in connector else 0) | (UNRESOLVED if connector.get("unresolved") else 0)
+            self.connector_names.append(sys.intern(connector["name"]))
+            self.connector_states.append(state_codes[connector["state"]])
+            self.connector_workers.append(worker_codes[connector["worker_id"]])
+            self.connector_flags.append(flags)
+            if flags & ERROR:
+                self.connector_errors[index] = connector["error"]
+            for task in connector["tasks"]:
+                trace = task.get("trace")
+                if trace is not None:
+                    self.task_traces[len(task_ids)] = trace
+                task_ids.append(task["id"])
+                self.task_states.append(state_codes[task["state"]])
+                self.task_workers.append(worker_codes[task["worker_id"]])
+            self.task_offsets.append(len(task_ids))
+
+    def add_expanded(self, expanded, get_connector_error):
+        """Adds the connectors of a GET /connectors?expand=status response, reading the decoded response straight into the
+        columns.
+
+        Each column is filled in one pass over every task of the response with map and itemgetter, so no Python code runs
+        per task and no status dict is built per connector or task. A response with a malformed status is read connector by
+        connector instead, and a connector whose status cannot be read is added as the status get_connector_error returns
+        for its name and the error, like the per-connector path does.
+        """
+        lengths = self.get_lengths()
+        try:
+            self.add_expanded_columns(expanded)
+        except Exception:
+            self.truncate(lengths)
+            for connector_name, expanded_connector in expanded.items():
+                self.add_expanded_connector(connector_name, expanded_connector, get_connector_error)
+
+    def add_expanded_columns(self, expanded):
+        state_codes = self.states.codes
+        worker_codes = self.workers.codes
+        first_task = len(self.task_ids)
+        connector_statuses = list(map(itemgetter("status"), expanded.values()))
+        connectors = list(map(itemgetter("connector"), connector_statuses))
+        connector_tasks = list(map(itemgetter("tasks"), connector_statuses))
+        tasks = list(chain.from_iterable(connector_tasks))
+        task_counts = list(map(len, connector_tasks))
+        traces = list(map(dict.get, tasks, repeat("trace")))
+
+        # array.fromlist converts a list in C, where array.extend would go through the iterator item by item
+        self.connector_names.extend(map(sys.intern, expanded))
+        self.connector_states.fromlist(list(map(state_codes.__getitem__, map(str.upper, map(itemgetter("state"), connectors)))))
+        self.connector_workers.fromlist(list(map(worker_codes.__getitem__, map(itemgetter("worker_id"), connectors))))
+        self.connector_flags.frombytes(bytes(len(connectors)))
+        self.task_offsets.fromlist(list(map(first_task.__add__, accumulate(task_counts))))
+        self.task_ids.extend(map(itemgetter("id"), tasks))
+        self.task_states.fromlist(list(map(state_codes.__getitem__, map(itemgetter("state"), tasks))))
+        self.task_workers.fromlist(list(map(worker_codes.__getitem__, map(itemgetter("worker_id"), tasks))))
+        if traces.count(None) < len(traces):
+            for task_index, trace in enumerate(traces, first_task):
+                if trace is not None:
+                    self.task_traces[task_index] = intern_trace(trace)
+
+    def add_expanded_connector(self, connector_name, expanded_connector, get_connector_error):
+        lengths = self.get_lengths()
+        try:
+            self.add_expanded_columns({connector_name: expanded_connector})
+        except Exception as ex:
+            self.truncate(lengths)
+            self.add_connectors([get_connector_error(connector_name, ex)])
+
+    def get_lengths(self):
+        return len(self.connector_names), len(self.task_ids)
+
+    def truncate(self, lengths):
+        """Removes the connectors and tasks added after get_lengths returned lengths, when reading them failed midway."""
+        connector_count, task_count = lengths
+        for column in (self.connector_names, self.connector_states, self.connector_workers, self.connector_flags):
+            del column[connector_count:]
+        del self.task_offsets[connector_count + 1:]
+        for column in (self.task_ids, self.task_states, self.task_workers):
+            del column[task_count:]
+        for task_index in [task_index for task_index in self.task_traces if task_index >= task_count]:
+            del self.task_traces[task_index]
+
+    def decode_worker(self, code):
+        return self.workers.decode(code) if code != NO_WORKER else None
+
+    def get_task_range(self, connector_index):
+        return range(self.task_offsets[connector_index], self.task_offsets[connector_index + 1])
+
+    def get_status(self, connector_index):
+        """Returns the status of one connector in the shape it was added in, so it can be evaluated on its own."""
+        flags = self.connector_flags[connector_index]
+        status = {
+            "name": self.connector_names[connector_index],
+            "state": self.states.decode(self.connector_states[connector_index]),
+            "worker_id": self.decode_worker(self.connector_workers[connector_index]),
+            "tasks": [{
+                "id": self.task_ids[index],
+                "state": self.states.decode(self.task_states[index]),
+                "worker_id": self.decode_worker(self.task_workers[index]),
+                "trace": self.task_traces.get(index)
+            } for index in self.get_task_range(connector_index)]
+        }
+        if flags & ERROR:
+            status["error"] = self.connector_errors[connector_index]
+        if flags & UNRESOLVED:
+            status["unresolved"] = True
+        return status
+
+    def get_task_count(self):
+        return len(self.task_ids)
+
+    def get_task_connector(self, task_index):
+        return bisect_right(self.task_offsets, task_index) - 1
+
+    def get_task_connectors(self):
+        """Returns the connector index of every task, in task order."""
+        task_counts = map(sub, self.task_offsets[1:], self.task_offsets)
+        return chain.from_iterable(map(repeat, range(len(self.connector_names)), task_counts))
+
+    def has_flags(self):
+        return self.connector_flags.count(0) < len(self.connector_flags)
+
+    def get_unresolved_names(self):
+        return [self.connector_names[index] for index in find_codes(self.connector_flags, (UNRESOLVED, ERROR | UNRESOLVED))]
+
+    def get_unresolved_count(self):
+        return len(self.get_unresolved_names())
+
+    def get_resolved_worker_codes(self):
+        """Returns the worker codes of resolved connectors, ignoring connectors whose status could not be fetched."""
+        if not self.has_flags():
+            return set(self.connector_workers)
+        return set(compress(self.connector_workers, map(not_, self.connector_flags)))
+
+    def get_failure_positions(self, failure_states, worker_codes=None, considered_containers=("connector", "task")):
+        """Returns the (connector index, task index) of every failure in evaluation order, or a task index of -1 for connectors.
+
+        Connectors whose status could not be fetched fail regardless of their worker. A worker_codes of None matches any worker.
+        Failures are found by searching the state columns for the failure states, so the cost of the Python code grows with
+        the number of failures rather than with the number of connectors and tasks.
+        """
+        positions = []
+        if "connector" in considered_containers:
+            connector_indexes = [index for index in find_codes(self.connector_states, failure_states) if not self.connector_flags[index]
+                                 and (worker_codes is None or self.connector_workers[index] in worker_codes)]
+            connector_indexes.extend(find_codes(self.connector_flags, (ERROR, ERROR | UNRESOLVED)))
+            positions.extend(zip(connector_indexes, repeat(-1)))
+        if "task" in considered_containers:
+            task_indexes = find_codes(self.task_states, failure_states)
+            if worker_codes is not None:
+                task_indexes = [index for index in task_indexes if self.task_workers[index] in worker_codes]
+            if len(task_indexes) < len(self.connector_names):
+                task_connectors = map(self.get_task_connector, task_indexes)
+            else:
+                # with this many failures, one pass over the task offsets is cheaper than a binary search per failure
+                task_connectors = map(list(self.get_task_connectors()).__getitem__, task_indexes)
+            positions.extend(zip(task_connectors, task_indexes))
+        # tasks are stored in connector order, so sorting interleaves each connector's failure with its task failures
+        positions.sort()
+        return positions
+
+    def get_failure(self, connector_index, task_index):
+        if task_index < 0:
+            failure = {
+                "type": "connector",
+                "connector": self.connector_names[connector_index],
+                "state": self.states.decode(self.connector_states[connector_index]),
+                "worker_id": self.decode_worker(self.connector_workers[connector_index])
+            }
+            if connector_index in self.connector_errors:
+                failure["error"] = self.connector_errors[connector_index]
+            return failure
+        return {
+            "type": "task",
+            "connector": self.connector_names[connector_index],
+            "id": self.task_ids[task_index],
+            "state": self.states.decode(self.task_states[task_index]),
+            "worker_id": self.decode_worker(self.task_workers[task_index]),
+            "trace": self.task_traces.get(task_index)
+        }
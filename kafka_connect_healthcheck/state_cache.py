@@ -0,0 +1,69 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import random
+import threading
+
+
+class CacheEntry:
+    __slots__ = ["connector", "fingerprint", "interval", "next_poll"]
+
+    def __init__(self, connector, fingerprint, interval, next_poll):
+        self.connector = connector
+        self.fingerprint = fingerprint
+        self.interval = interval
+        self.next_poll = next_poll
+
+
+class ConnectorStateCache:
+    """Caches the last known status of each connector and decides when each one is due to be polled again.
+
+    Connectors that are new, failing or whose state changed since the last poll are polled every min_interval seconds.
+    Connectors that stay unchanged and healthy back off exponentially, with jitter, up to max_interval seconds.
+    """
+
+    def __init__(self, min_interval, max_interval, jitter=0.25):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.jitter = jitter
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get_due(self, connector_names, now):
+        with self.lock:
+            return [name for name in connector_names if name not in self.entries or self.entries[name].next_poll <= now]
+
+    def update(self, connector, is_failing, now):
+        fingerprint = self.get_fingerprint(connector)
+        with self.lock:
+            entry = self.entries.get(connector["name"])
+            if entry is None or is_failing or entry.fingerprint != fingerprint:
+                interval = self.min_interval
+            else:
+                interval = min(max(entry.interval * 2, 1.0), self.max_interval)
+            # jitter only ever shortens the interval so max_interval stays a hard bound on how long a failure can be hidden
+            next_poll = now + interval * random.uniform(1 - self.jitter, 1)
+            self.entries[connector["name"]] = CacheEntry(connector, fingerprint, interval, next_poll)
+
+    def get_statuses(self, connector_names):
+        with self.lock:
+            # connectors that no longer exist are dropped so the cache does not grow without bound
+            self.entries = {name: self.entries[name] for name in connector_names if name in self.entries}
+            return [self.entries[name].connector for name in connector_names if name in self.entries]
+
+    @staticmethod
+    def get_fingerprint(connector):
+        tasks = tuple((task.get("id"), task.get("state"), task.get("worker_id")) for task in connector["tasks"])
+        return connector["state"], connector["worker_id"], tasks
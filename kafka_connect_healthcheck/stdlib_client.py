@@ -0,0 +1,144 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import base64
+import json
+import threading
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from urllib.parse import urlencode, urlsplit
+
+REQUESTS = "requests"
+HTTP_CLIENT = "http.client"
+HTTP_CLIENTS = [REQUESTS, HTTP_CLIENT]
+
+
+class HTTPError(Exception):
+    pass
+
+
+class Response:
+    """The parts of a requests response the healthcheck uses, read fully so the connection can be reused."""
+
+    __slots__ = ("status_code", "reason", "content", "url")
+
+    def __init__(self, status_code, reason, content, url):
+        self.status_code = status_code
+        self.reason = reason
+        self.content = content
+        self.url = url
+
+    def json(self):
+        return json.loads(self.content.decode("utf-8"))
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise HTTPError("{} {} for url: {}".format(self.status_code, self.reason, self.url))
+
+
+class StdlibConnectClient:
+    """HTTP client for the Kafka Connect REST API built on http.client, with the same interface as ConnectClient.
+
+    It avoids importing requests and urllib3, which makes up most of the startup time of the healthcheck. Idle keep-alive
+    connections are kept in a pool of up to pool_size connections.
+    """
+
+    def __init__(self, connect_url, auth=None, pool_size=10, connect_timeout=5.0, read_timeout=30.0, keep_alive=True):
+        self.connect_url = connect_url
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.keep_alive = keep_alive
+        self.auth = tuple(auth.split(":", 1)) if auth and ":" in auth else None
+
+        url = urlsplit(connect_url)
+        self.connection_class = HTTPSConnection if url.scheme == "https" else HTTPConnection
+        self.host = url.hostname
+        self.port = url.port
+        self.base_path = url.path.rstrip("/")
+        self.headers = {"Accept": "application/json", "Connection": "keep-alive" if keep_alive else "close"}
+        if self.auth is not None:
+            self.headers["Authorization"] = "Basic {}".format(base64.b64encode(":".join(self.auth).encode("utf-8")).decode("ascii"))
+
+        self.idle_connections = []
+        self.request_count = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.lock = threading.Lock()
+
+    def get(self, path, params=None, timeout=None):
+        with self.lock:
+            self.request_count += 1
+        target = "{}{}".format(self.base_path, path)
+        if params:
+            target = "{}?{}".format(target, urlencode(params))
+        url = "{}{}".format(self.connect_url, path)
+        connect_timeout, read_timeout = timeout or self.timeout
+        connection = self.get_idle_connection()
+        if connection is not None:
+            try:
+                return self.send(connection, target, url, read_timeout)
+            except (HTTPException, ConnectionError):
+                # the server closed the idle connection; the request is retried once on a new one
+                pass
+        return self.send(self.create_connection(connect_timeout), target, url, read_timeout)
+
+    def send(self, connection, target, url, read_timeout):
+        try:
+            connection.sock.settimeout(read_timeout)
+            connection.request("GET", target, headers=self.headers)
+            response = connection.getresponse()
+            content = response.read()
+        except Exception:
+            connection.close()
+            raise
+        if self.keep_alive and not response.will_close:
+            self.release_connection(connection)
+        else:
+            connection.close()
+        return Response(response.status, response.reason, content, url)
+
+    def create_connection(self, connect_timeout):
+        connection = self.connection_class(self.host, self.port, timeout=connect_timeout)
+        connection.connect()
+        with self.lock:
+            self.connections_created += 1
+        return connection
+
+    def get_idle_connection(self):
+        with self.lock:
+            if not self.idle_connections:
+                return None
+            self.connections_reused += 1
+            return self.idle_connections.pop()
+
+    def release_connection(self, connection):
+        with self.lock:
+            if len(self.idle_connections) < self.pool_size:
+                self.idle_connections.append(connection)
+                return
+        connection.close()
+
+    def get_stats(self):
+        return {
+            "requests": self.request_count,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "pool_size": self.pool_size
+        }
+
+    def close(self):
+        with self.lock:
+            idle_connections, self.idle_connections = self.idle_connections, []
+        for connection in idle_connections:
+            connection.close()
@@ -0,0 +1,122 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import threading
+import time
+from array import array
+
+DEFAULT_CAPACITY = 1024
+
+
+class Samples:
+    """Fixed-capacity ring buffer holding the most recent durations of one phase."""
+
+    __slots__ = ["values", "index", "count"]
+
+    def __init__(self, capacity):
+        self.values = array("d", [0.0]) * capacity
+        self.index = 0
+        self.count = 0
+
+    def add(self, value):
+        self.values[self.index] = value
+        self.index = (self.index + 1) % len(self.values)
+        self.count += 1
+
+    def get_summary(self):
+        recent = sorted(self.values[:min(self.count, len(self.values))])
+        return {
+            "count": self.count,
+            "p50": get_percentile(recent, 0.50),
+            "p95": get_percentile(recent, 0.95),
+            "p99": get_percentile(recent, 0.99),
+            "max": recent[-1]
+        }
+
+
+class Phase:
+    __slots__ = ["timings", "name", "start"]
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timings.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Timings:
+    """Records the duration of each phase of a health evaluation into bounded sample buffers."""
+
+    enabled = True
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def phase(self, name):
+        return Phase(self, name)
+
+    def record(self, name, duration):
+        with self.lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = Samples(self.capacity)
+            samples.add(duration)
+
+    def get_summary(self):
+        with self.lock:
+            summaries = {name: samples.get_summary() for name, samples in self.samples.items()}
+        return {
+            "unit": "seconds",
+            "phases": {name: summary for name, summary in sorted(summaries.items()) if not name.startswith("upstream.")},
+            "upstream": {name[9:]: summary for name, summary in sorted(summaries.items()) if name.startswith("upstream.")}
+        }
+
+
+class NullPhase:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class NullTimings:
+    """Used when timings are disabled; every call is a no-op that allocates nothing."""
+
+    enabled = False
+    null_phase = NullPhase()
+
+    def phase(self, name):
+        return self.null_phase
+
+    def record(self, name, duration):
+        pass
+
+
+NULL_TIMINGS = NullTimings()
+
+
+def get_percentile(sorted_values, percentile):
+    index = min(int(round(percentile * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
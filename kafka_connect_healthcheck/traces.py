@@ -0,0 +1,68 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import hashlib
+
+FULL = "full"
+TRUNCATED = "truncated"
+DEDUPLICATED = "deduplicated"
+TRACE_MODES = [FULL, TRUNCATED, DEDUPLICATED]
+
+
+def get_trace_id(trace):
+    # derived from the content so the id of a trace stays the same across evaluations
+    return hashlib.sha1(trace.encode("utf-8")).hexdigest()[:12]
+
+
+def truncate_trace(trace, max_lines):
+    lines = trace.split("\n", max_lines)
+    if len(lines) <= max_lines:
+        return trace
+    return "\n".join(lines[:max_lines] + ["\t... {} more lines".format(lines[max_lines].count("\n") + 1)])
+
+
+def apply_trace_mode(health_result, trace_mode, max_lines):
+    """Returns the health result with the task traces in its failures rendered for the given verbosity.
+
+    'truncated' keeps the first max_lines lines of each trace. 'deduplicated' moves each distinct trace into a top-level
+    'traces' table and replaces the trace of each failure with a 'trace_id' referencing it. The result of a single task
+    carries its trace at the top level, which is rendered the same way.
+    """
+    failures = health_result.get("failures", [])
+    if trace_mode == FULL or not (health_result.get("trace") or any(failure.get("trace") for failure in failures)):
+        return health_result
+
+    trace_table = {}
+    formatted_result = dict(format_trace(health_result, trace_mode, max_lines, trace_table))
+    if failures:
+        formatted_result["failures"] = [format_trace(failure, trace_mode, max_lines, trace_table) for failure in failures]
+    if trace_mode == DEDUPLICATED:
+        formatted_result["traces"] = trace_table
+    return formatted_result
+
+
+def format_trace(item, trace_mode, max_lines, trace_table):
+    """Returns a copy of a failure or task result with its trace rendered, or the item itself when it has no trace."""
+    trace = item.get("trace")
+    if not trace:
+        return item
+    item = dict(item)
+    if trace_mode == TRUNCATED:
+        item["trace"] = truncate_trace(trace, max_lines)
+    else:
+        del item["trace"]
+        item["trace_id"] = get_trace_id(trace)
+        trace_table[item["trace_id"]] = trace
+    return item
@@ -0,0 +1,72 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import logging
+import threading
+import time
+
+ALL = "all"
+TRANSITIONS = "transitions"
+LOG_MODES = [ALL, TRANSITIONS]
+
+
+class StateTransitionLog:
+    """Remembers the last logged state of each connector and task so that only changes are logged.
+
+    Keys are ("connector", name) or ("task", name, task_id). A summary of every tracked state is logged at most once
+    per summary_interval seconds.
+    """
+
+    def __init__(self, summary_interval=60.0):
+        self.summary_interval = summary_interval
+        self.states = {}
+        self.seen = set()
+        self.last_summary = time.monotonic()
+        self.lock = threading.Lock()
+
+    def has_changed(self, key, state, is_unhealthy):
+        with self.lock:
+            self.seen.add(key)
+            previous = self.states.get(key)
+            self.states[key] = (state, is_unhealthy)
+        return previous is None or previous[0] != state
+
+    def finish_evaluation(self, health_result):
+        with self.lock:
+            seen, self.seen = self.seen, set()
+            if health_result is None:
+                return
+            # connectors and tasks that were not reported by this evaluation were deleted or moved to another worker
+            removed = [key for key in self.states if key not in seen]
+            for key in removed:
+                del self.states[key]
+        for key in removed:
+            if key[0] == "connector":
+                logging.info("Connector '%s' is no longer reported on this worker", key[1])
+            else:
+                logging.info("Connector '%s' task '%s' is no longer reported on this worker", key[1], key[2])
+        self.log_summary(health_result)
+
+    def log_summary(self, health_result):
+        now = time.monotonic()
+        if now - self.last_summary < self.summary_interval:
+            return
+        self.last_summary = now
+        with self.lock:
+            states = list(self.states.items())
+        connectors = [is_unhealthy for key, (state, is_unhealthy) in states if key[0] == "connector"]
+        tasks = [is_unhealthy for key, (state, is_unhealthy) in states if key[0] == "task"]
+        logging.info("Summary: %d connectors (%d unhealthy) and %d tasks (%d unhealthy), healthy: %s",
+                     len(connectors), sum(connectors), len(tasks), sum(tasks), health_result.get("healthy"))
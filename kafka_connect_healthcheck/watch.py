@@ -0,0 +1,194 @@
+#  -*- coding: utf-8 -*-
+#
+#  Copyright 2019 Shawn Seymour. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"). You
+#  may not use this file except in compliance with the License. A copy of
+#  the License is located at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  or in the "license" file accompanying this file. This file is
+#  distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+#  ANY KIND, either express or implied. See the License for the specific
+#  language governing permissions and limitations under the License.
+
+import json
+import logging
+import threading
+from collections import deque
+
+from kafka_connect_healthcheck import snapshots
+
+CONTENT_TYPE = "text/event-stream"
+HEARTBEAT = b": keep-alive\n\n"
+
+
+def encode_event(event_type, event_id, data):
+    return "id: {}\nevent: {}\ndata: {}\n\n".format(event_id, event_type, json.dumps(data)).encode("utf-8")
+
+
+def get_connector_states(snapshot):
+    """Returns the state, worker id and task states of every connector, or None for connectors whose status is unknown."""
+    connectors = {}
+    decode_state = snapshot.states.decode
+    for index, name in enumerate(snapshot.connector_names):
+        if snapshot.connector_flags[index] & snapshots.UNRESOLVED:
+            connectors[name] = None
+            continue
+        tasks = {}
+        for task_index in snapshot.get_task_range(index):
+            task_state = decode_state(snapshot.task_states[task_index])
+            tasks[snapshot.task_ids[task_index]] = (task_state, snapshot.decode_worker(snapshot.task_workers[task_index]))
+        connectors[name] = (decode_state(snapshot.connector_states[index]), snapshot.decode_worker(snapshot.connector_workers[index]), tasks)
+    return connectors
+
+
+class Subscription:
+    """The events waiting to be sent to one subscriber. A subscriber that falls capacity events behind is evicted."""
+
+    __slots__ = ("events", "capacity", "notify", "initialized", "evicted")
+
+    def __init__(self, capacity, notify):
+        self.events = deque()
+        self.capacity = capacity
+        self.notify = notify
+        self.initialized = False
+        self.evicted = False
+
+    def offer(self, event):
+        if len(self.events) >= self.capacity:
+            self.evicted = True
+            self.events.clear()
+        else:
+            self.events.append(event)
+        self.notify()
+        return not self.evicted
+
+    def drain(self):
+        events = []
+        while self.events:
+            events.append(self.events.popleft())
+        return events
+
+    def take(self):
+        """Returns the waiting events as one chunk to send, or None when none are waiting or the subscriber was evicted."""
+        events = self.drain()
+        return b"".join(events) if events and not self.evicted else None
+
+
+class WatchHub:
+    """Turns the results of the evaluation loop into a stream of events shared by every subscriber of /watch.
+
+    A new subscriber first receives a 'snapshot' event with the health and every connector and task state, then only
+    changes: 'health' when the result flips between healthy and unhealthy, and 'connector' and 'task' when a state or
+    worker id changes, including connectors and tasks that appear (previous_state null) or disappear (state null). Each
+    event is encoded once and shared by every subscriber.
+    """
+
+    def __init__(self, buffer_size=256, heartbeat_interval=15.0):
+        self.buffer_size = buffer_size
+        self.heartbeat_interval = heartbeat_interval
+        self.subscriptions = set()
+        self.sequence = 0
+        self.healthy = None
+        self.failure_rate = None
+        self.connectors = None
+        self.snapshot_event = None
+        self.lock = threading.Lock()
+
+    def subscribe(self, notify):
+        """Adds a subscriber. notify is called, from the evaluation loop, whenever events are waiting for it."""
+        subscription = Subscription(self.buffer_size, notify)
+        with self.lock:
+            self.subscriptions.add(subscription)
+            if self.healthy is not None:
+                self.initialize(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def publish(self, snapshot, health_result):
+        # an evaluation that failed to collect statuses says nothing about connector states, so they are kept
+        connectors = get_connector_states(snapshot) if snapshot is not None else None
+        with self.lock:
+            self.sequence += 1
+            events = []
+            if self.healthy is not None and health_result["healthy"] != self.healthy:
+                events.append(encode_event("health", self.sequence, {
+                    "healthy": health_result["healthy"],
+                    "failure_rate": health_result.get("failure_rate"),
+                    "previous_healthy": self.healthy
+                }))
+            if connectors is not None:
+                connectors = self.merge_unresolved(connectors)
+                if self.connectors is not None:
+                    events.extend(self.get_change_events(self.connectors, connectors))
+                self.connectors = connectors
+            self.healthy = health_result["healthy"]
+            self.failure_rate = health_result.get("failure_rate")
+            self.snapshot_event = None
+            for subscription in list(self.subscriptions):
+                if not subscription.initialized:
+                    self.initialize(subscription)
+                    continue
+                for event in events:
+                    if not subscription.offer(event):
+                        logging.warning("Evicting a /watch subscriber that fell {} events behind".format(self.buffer_size))
+                        self.subscriptions.discard(subscription)
+                        break
+
+    def merge_unresolved(self, connectors):
+        # an unresolved connector keeps its last known state rather than disappearing
+        previous = self.connectors or {}
+        return {name: state if state is not None else previous.get(name) for name, state in connectors.items()
+                if state is not None or name in previous}
+
+    def initialize(self, subscription):
+        if self.snapshot_event is None:
+            self.snapshot_event = encode_event("snapshot", self.sequence, self.get_snapshot())
+        subscription.initialized = True
+        subscription.offer(self.snapshot_event)
+
+    def get_snapshot(self):
+        connectors = {}
+        for name, (state, worker_id, tasks) in sorted((self.connectors or {}).items()):
+            connectors[name] = {
+                "state": state,
+                "worker_id": worker_id,
+                "tasks": [{"id": task_id, "state": task_state, "worker_id": task_worker_id}
+                          for task_id, (task_state, task_worker_id) in sorted(tasks.items())]
+            }
+        return {"healthy": self.healthy, "failure_rate": self.failure_rate, "connectors": connectors}
+
+    def get_change_events(self, previous_connectors, connectors):
+        events = []
+        for name in sorted(set(previous_connectors) | set(connectors)):
+            previous = previous_connectors.get(name)
+            current = connectors.get(name)
+            if previous == current:
+                continue
+            if previous is None or current is None or previous[:2] != current[:2]:
+                events.append(encode_event("connector", self.sequence, {
+                    "connector": name,
+                    "state": current[0] if current is not None else None,
+                    "previous_state": previous[0] if previous is not None else None,
+                    "worker_id": current[1] if current is not None else previous[1]
+                }))
+            previous_tasks = previous[2] if previous is not None else {}
+            tasks = current[2] if current is not None else {}
+            for task_id in sorted(set(previous_tasks) | set(tasks)):
+                previous_task = previous_tasks.get(task_id)
+                task = tasks.get(task_id)
+                if previous_task == task:
+                    continue
+                events.append(encode_event("task", self.sequence, {
+                    "connector": name,
+                    "id": task_id,
+                    "state": task[0] if task is not None else None,
+                    "previous_state": previous_task[0] if previous_task is not None else None,
+                    "worker_id": task[1] if task is not None else previous_task[1]
+                }))
+        return events
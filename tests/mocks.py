@@ -1,8 +1,15 @@
+import json
 import os
 import socket
+import time
+from collections import Counter
 from functools import partial
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from threading import Thread
+from urllib.parse import parse_qs, unquote, urlparse
+
+# Number of requests received per mock name and path, used to assert how often the healthcheck calls Kafka Connect
+request_counts = Counter()
 
 
 # Mocks Kafka Connect REST API responses for integration tests
@@ -10,6 +17,9 @@ class MockServerRequestHandler(BaseHTTPRequestHandler):
 
     def __init__(self, mock_name, *args, **kwargs):
         self.mock_name = mock_name
+        # mocks named "keep-alive" keep connections open between requests, as kafka connect does
+        if "keep-alive" in mock_name:
+            self.protocol_version = "HTTP/1.1"
         super().__init__(*args, **kwargs)
 
     def do_GET(self):
@@ -19,15 +29,33 @@ class MockServerRequestHandler(BaseHTTPRequestHandler):
                 if "Basic" not in self.headers.get("Authorization"):
                     self.response(401, payload="{}")
 
-            if self.path == "/connectors":
+            # connector names are decoded from the path, as kafka connect does
+            url = urlparse(self.path)._replace(path=unquote(urlparse(self.path).path))
+            request_counts[(self.mock_name, url.path)] += 1
+            if "slow" in self.mock_name:
+                time.sleep(1)
+
+            if url.path == "/connectors":
                 with open(os.path.join(os.getcwd(), "tests/data/mocks/{}-connectors.json".format(self.mock_name)), "r") as f:
-                    self.response(200, payload=f.read())
+                    payload = f.read()
+                # mocks named "rebalancing" answer the listing with kafka connect's error body, as during a rebalance
+                if "rebalancing" in self.mock_name:
+                    self.response(409, payload=payload)
+                    return
+                # mocks named "legacy" behave like kafka connect versions before 2.3, which ignore the expand parameter
+                if "status" in parse_qs(url.query).get("expand", []) and "legacy" not in self.mock_name:
+                    payload = json.dumps(self.get_expanded_statuses(json.loads(payload), url.path))
+                self.response(200, payload=payload)
             else:
-                split_path = self.path.split("/")
+                split_path = url.path.split("/")
                 if len(split_path) >= 4 and split_path[3] == "status":
                     connector_name = split_path[2]
-                    path = os.path.join(os.getcwd(), "./tests/data/mocks/{}-connector-{}.json".format(self.mock_name, connector_name))
-                    with open(path, "r") as f:
+                    if connector_name not in self.get_connector_names():
+                        # kafka connect answers with an error body for connectors it does not know
+                        message = "No status found for connector {}".format(connector_name)
+                        self.response(404, payload=json.dumps({"error_code": 404, "message": message}))
+                        return
+                    with open(self.get_status_path(connector_name, url.path), "r") as f:
                         self.response(status_code, payload=f.read())
                 else:
                     connector_name = split_path[2]
@@ -41,11 +69,32 @@ class MockServerRequestHandler(BaseHTTPRequestHandler):
             print("Error while handling mock GET request: {}".format(ex))
             self.response(500, "")
 
+    def get_connector_names(self):
+        with open(os.path.join(os.getcwd(), "tests/data/mocks/{}-connectors.json".format(self.mock_name)), "r") as f:
+            return json.load(f)
+
+    def get_expanded_statuses(self, connector_names, request_path):
+        expanded = {}
+        for connector_name in connector_names:
+            with open(self.get_status_path(connector_name, request_path), "r") as f:
+                expanded[connector_name] = {"status": json.load(f)}
+        return expanded
+
+    def get_status_path(self, connector_name, request_path):
+        path = os.path.join(os.getcwd(), "./tests/data/mocks/{}-connector-{}.json".format(self.mock_name, connector_name))
+        # mocks named "flapping" serve the "-alternate" status of a connector, if it has one, on every other request
+        alternate_path = path.replace(".json", "-alternate.json")
+        if "flapping" in self.mock_name and request_counts[(self.mock_name, request_path)] % 2 == 0 and os.path.exists(alternate_path):
+            return alternate_path
+        return path
+
     def response(self, status_code, payload):
         self.send_response(status_code)
+        body = payload.encode('utf-8')
         self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
         self.end_headers()
-        self.wfile.write(payload.encode('utf-8'))
+        self.wfile.write(body)
 
     def log_message(self, format, *args):
         return
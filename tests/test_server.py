@@ -1,10 +1,22 @@
 # tests/test_server.py
 
+import gzip
+import http.client
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 import requests
 
+from kafka_connect_healthcheck import broker_check
+from kafka_connect_healthcheck import fleet
+from kafka_connect_healthcheck import health
+from kafka_connect_healthcheck import metrics
+from kafka_connect_healthcheck import parser
+from kafka_connect_healthcheck import snapshots
+from tests import mocks
+
 scenario_0 = ({}, "0-healthcheck-server-healthy")
 scenario_1 = ({"HEALTHCHECK_UNHEALTHY_STATES": "FAILED"}, "1-healthy")
 scenario_2 = ({"HEALTHCHECK_UNHEALTHY_STATES": "FAILED"}, "2-unhealthy")
@@ -25,6 +37,98 @@ scenario_16 = ({"HEALTHCHECK_FAILURE_THRESHOLD_PERCENTAGE": "50"}, "16-healthy-t
 scenario_17 = ({"HEALTHCHECK_CONSIDERED_CONTAINERS": "CONNECTOR"}, "17-healthy-container-connector")
 scenario_18 = ({"HEALTHCHECK_CONSIDERED_CONTAINERS": "TASK"}, "18-healthy-container-task")
 scenario_19 = ({"HEALTHCHECK_CONSIDERED_CONTAINERS": "TASK"}, "19-unhealthy-container-task")
+scenario_20 = ({"HEALTHCHECK_CONNECT_WORKER_ID": "my.worker.name:8083", "HEALTHCHECK_COLLECTION_MODE": "per-connector"},
+               "20-unhealthy-per-connector-multiple-connectors")
+scenario_21 = ({"HEALTHCHECK_CONNECT_WORKER_ID": "my.worker.name:8083"}, "21-unhealthy-legacy-expand-multiple-connectors")
+scenario_22 = ({"HEALTHCHECK_COLLECTION_MODE": "per-connector", "HEALTHCHECK_MAX_CONCURRENCY": "4"}, "22-unhealthy-connector-status-error")
+scenario_23 = ({"HEALTHCHECK_CONNECT_WORKER_ID": "my.worker.name:8083", "HEALTHCHECK_POLL_INTERVAL": "5"},
+               "10-unhealthy-multiple-connectors")
+scenario_24 = ({"HEALTHCHECK_POLL_INTERVAL": "60", "HEALTHCHECK_MAX_STALENESS": "0.5"}, "1-healthy")
+scenario_25 = ({}, "25-healthy-slow")
+scenario_26 = ({"HEALTHCHECK_ENGINE": "asyncio", "HEALTHCHECK_CONNECT_WORKER_ID": "my.worker.name:8083",
+                "HEALTHCHECK_COLLECTION_MODE": "per-connector", "HEALTHCHECK_MAX_CONCURRENCY": "4"}, "10-unhealthy-multiple-connectors")
+scenario_27 = ({"HEALTHCHECK_ENGINE": "asyncio", "HEALTHCHECK_BASIC_AUTH": "username:password"}, "14-basic-auth")
+scenario_28 = ({"HEALTHCHECK_ENGINE": "asyncio"}, "28-healthy-slow")
+scenario_29 = ({"HEALTHCHECK_COLLECTION_MODE": "per-connector", "HEALTHCHECK_ADAPTIVE_POLLING": "true"}, "29-unhealthy-adaptive-polling")
+scenario_30 = ({"HEALTHCHECK_ENGINE": "asyncio", "HEALTHCHECK_COLLECTION_MODE": "per-connector", "HEALTHCHECK_ADAPTIVE_POLLING": "true"},
+               "30-unhealthy-adaptive-polling-asyncio")
+scenario_31 = ({"HEALTHCHECK_CONNECT_WORKER_ID": "my.worker.name:8083", "HEALTHCHECK_COLLECTION_MODE": "per-connector"},
+               "10-unhealthy-multiple-connectors")
+scenario_32 = ({"HEALTHCHECK_ENGINE": "asyncio", "HEALTHCHECK_CONNECT_WORKER_ID": "my.worker.name:8083",
+                "HEALTHCHECK_COLLECTION_MODE": "per-connector"}, "10-unhealthy-multiple-connectors")
+scenario_33 = ({"HEALTHCHECK_DEBUG_TIMINGS": "true", "HEALTHCHECK_COLLECTION_MODE": "per-connector",
+                "HEALTHCHECK_CONNECT_WORKER_ID": "unhealthy.worker:8083"}, "13-unhealthy-broker-connection")
+scenario_34 = ({"HEALTHCHECK_ENGINE": "asyncio", "HEALTHCHECK_DEBUG_TIMINGS": "true", "HEALTHCHECK_COLLECTION_MODE": "per-connector",
+                "HEALTHCHECK_CONNECT_WORKER_ID": "unhealthy.worker:8083"}, "13-unhealthy-broker-connection")
+scenario_35 = ({"HEALTHCHECK_AGGREGATE_WORKERS": "true", "HEALTHCHECK_POLL_INTERVAL": "60"},
+               "7-unhealthy-worker-id-with-other-workers-healthy")
+scenario_36 = ({"HEALTHCHECK_ENGINE": "asyncio", "HEALTHCHECK_AGGREGATE_WORKERS": "true", "HEALTHCHECK_COLLECTION_MODE": "per-connector"},
+               "6-healthy-worker-id-with-other-workers-failing")
+scenario_37 = ({"HEALTHCHECK_CLUSTERS": json.dumps({"strict": {"connect_worker_id": "my.worker.name:8083"},
+                                                     "lenient": {"failure_threshold_percentage": 50, "considered_containers": "TASK"}})},
+               "10-unhealthy-multiple-connectors")
+scenario_38 = ({"HEALTHCHECK_CLUSTERS": scenario_37[0]["HEALTHCHECK_CLUSTERS"], "HEALTHCHECK_POLL_INTERVAL": "60"},
+               "10-unhealthy-multiple-connectors")
+scenario_39 = ({"HEALTHCHECK_CONNECT_WORKER_ID": "my.worker.name:8083", "HEALTHCHECK_POLL_INTERVAL": "60"},
+               "10-unhealthy-multiple-connectors")
+scenario_40 = ({"HEALTHCHECK_ENGINE": "asyncio", "HEALTHCHECK_CONNECT_WORKER_ID": "my.worker.name:8083", "HEALTHCHECK_POLL_INTERVAL": "60"},
+               "10-unhealthy-multiple-connectors")
+scenario_41 = ({"HEALTHCHECK_TRACE_MAX_LINES": "2"}, "41-unhealthy-repeated-traces")
+scenario_42 = ({"HEALTHCHECK_ENGINE": "asyncio", "HEALTHCHECK_TRACE_MODE": "deduplicated"}, "41-unhealthy-repeated-traces")
+scenario_43 = ({"HEALTHCHECK_COLLECTION_MODE": "per-connector", "HEALTHCHECK_EVALUATION_TIMEOUT": "1.5"}, "43-healthy-slow-deadline")
+scenario_44 = ({"HEALTHCHECK_ENGINE": "asyncio", "HEALTHCHECK_COLLECTION_MODE": "per-connector", "HEALTHCHECK_EVALUATION_TIMEOUT": "1.5",
+                "HEALTHCHECK_UNRESOLVED_POLICY": "healthy"}, "43-healthy-slow-deadline")
+scenario_45 = ({"HEALTHCHECK_COLLECTION_MODE": "per-connector", "HEALTHCHECK_MAX_CONCURRENCY": "1", "HEALTHCHECK_EVALUATION_TIMEOUT": "1.5",
+                "HEALTHCHECK_UNRESOLVED_POLICY": "ignore"}, "43-healthy-slow-deadline")
+scenario_46 = ({"HEALTHCHECK_LOG_MODE": "transitions", "HEALTHCHECK_LOG_SUMMARY_INTERVAL": "0"}, "10-unhealthy-multiple-connectors")
+scenario_47 = ({"HEALTHCHECK_ENGINE": "asyncio", "HEALTHCHECK_LOG_MODE": "transitions"}, "10-unhealthy-multiple-connectors")
+scenario_48 = ({"HEALTHCHECK_HISTORY_SIZE": "4", "HEALTHCHECK_FLAP_THRESHOLD": "3"}, "48-flapping")
+scenario_49 = ({"HEALTHCHECK_ENGINE": "asyncio", "HEALTHCHECK_HISTORY_SIZE": "4", "HEALTHCHECK_FLAP_THRESHOLD": "3"}, "48-flapping")
+scenario_50 = ({"HEALTHCHECK_HISTORY_SIZE": "0"}, "1-healthy")
+scenario_51 = ({"HEALTHCHECK_UNHEALTHY_STATES": "FAILED", "HEALTHCHECK_HTTP_CLIENT": "http.client"}, "2-unhealthy")
+scenario_52 = ({"HEALTHCHECK_CONNECT_WORKER_ID": "unhealthy.worker:8083", "HEALTHCHECK_HTTP_CLIENT": "http.client"},
+               "13-unhealthy-broker-connection")
+scenario_53 = ({"HEALTHCHECK_BASIC_AUTH": "username:password", "HEALTHCHECK_HTTP_CLIENT": "http.client"}, "14-basic-auth")
+scenario_54 = ({"HEALTHCHECK_CONNECT_WORKER_ID": "my.worker.name:8083", "HEALTHCHECK_COLLECTION_MODE": "per-connector",
+                "HEALTHCHECK_MAX_CONCURRENCY": "4", "HEALTHCHECK_HTTP_CLIENT": "http.client"}, "20-unhealthy-per-connector-multiple-connectors")
+scenario_55 = ({"HEALTHCHECK_CONNECT_WORKER_ID": "my.worker.name:8083", "HEALTHCHECK_POLL_INTERVAL": "5", "HEALTHCHECK_PROCESSES": "4"},
+               "10-unhealthy-multiple-connectors")
+scenario_56 = ({"HEALTHCHECK_CONNECT_WORKER_ID": "my.worker.name:8083", "HEALTHCHECK_POLL_INTERVAL": "60", "HEALTHCHECK_PROCESSES": "2"},
+               "10-unhealthy-multiple-connectors")
+scenario_57 = ({"HEALTHCHECK_ENGINE": "asyncio"}, "41-unhealthy-repeated-traces")
+scenario_58 = ({"HEALTHCHECK_CONNECT_WORKER_ID": "idle.worker:8083", "HEALTHCHECK_BROKER_CHECK_TTL": "60",
+                "HEALTHCHECK_BROKER_CHECK_RETRIES": "1"}, "58-unhealthy-broker-rotation")
+scenario_59 = ({"HEALTHCHECK_ENGINE": "asyncio", "HEALTHCHECK_CONNECT_WORKER_ID": "idle.worker:8083", "HEALTHCHECK_BROKER_CHECK_TTL": "60",
+                "HEALTHCHECK_BROKER_CHECK_RETRIES": "1"}, "58-unhealthy-broker-rotation")
+scenario_60 = ({"HEALTHCHECK_CONNECT_WORKER_ID": "idle.worker:8083", "HEALTHCHECK_BROKER_CHECK_TTL": "0"}, "9-healthy-multiple-connectors")
+scenario_61 = ({"HEALTHCHECK_POLL_INTERVAL": "0.3"}, "48-flapping")
+scenario_62 = ({"HEALTHCHECK_ENGINE": "asyncio", "HEALTHCHECK_POLL_INTERVAL": "0.3"}, "48-flapping")
+scenario_63 = ({"HEALTHCHECK_POLL_INTERVAL": "0.3", "HEALTHCHECK_WATCH_BUFFER_SIZE": "1"}, "48-flapping")
+scenario_64 = ({"HEALTHCHECK_CONNECT_WORKER_ID": "my.worker.name:8083", "HEALTHCHECK_POLL_INTERVAL": "60",
+                "HEALTHCHECK_LIVE_FAILURE_THRESHOLD_PERCENTAGE": "50", "HEALTHCHECK_READY_CONSIDERED_CONTAINERS": "CONNECTOR",
+                "HEALTHCHECK_STARTUP_UNHEALTHY_STATES": "UNASSIGNED"}, "10-unhealthy-multiple-connectors")
+scenario_65 = (dict(scenario_64[0], HEALTHCHECK_ENGINE="asyncio"), "10-unhealthy-multiple-connectors")
+scenario_66 = ({}, "10-unhealthy-multiple-connectors")
+scenario_67 = ({"HEALTHCHECK_POLL_INTERVAL": "60"}, "10-unhealthy-multiple-connectors")
+scenario_68 = ({"HEALTHCHECK_ENGINE": "asyncio"}, "10-unhealthy-multiple-connectors")
+scenario_69 = ({"HEALTHCHECK_ENGINE": "asyncio", "HEALTHCHECK_POLL_INTERVAL": "60"}, "10-unhealthy-multiple-connectors")
+scenario_70 = ({}, "70-unhealthy-rebalancing")
+scenario_71 = ({"HEALTHCHECK_ENGINE": "asyncio"}, "70-unhealthy-rebalancing")
+scenario_72 = ({"HEALTHCHECK_COLLECTION_MODE": "per-connector"}, "72-healthy-keep-alive")
+scenario_73 = ({"HEALTHCHECK_COLLECTION_MODE": "per-connector", "HEALTHCHECK_HTTP_CLIENT": "http.client"}, "72-healthy-keep-alive")
+scenario_74 = ({"HEALTHCHECK_COLLECTION_MODE": "per-connector", "HEALTHCHECK_ENGINE": "asyncio"}, "72-healthy-keep-alive")
+scenario_75 = ({"HEALTHCHECK_COLLECTION_MODE": "per-connector", "HEALTHCHECK_CONNECT_WORKER_ID": "idle.worker:8083",
+                "HEALTHCHECK_BROKER_CHECK_TTL": "0"}, "75-healthy-connector-names")
+scenario_76 = (dict(scenario_75[0], HEALTHCHECK_HTTP_CLIENT="http.client"), "75-healthy-connector-names")
+scenario_77 = (dict(scenario_75[0], HEALTHCHECK_ENGINE="asyncio"), "75-healthy-connector-names")
+scenario_78 = ({"HEALTHCHECK_AGGREGATE_WORKERS": "true", "HEALTHCHECK_CONNECT_WORKER_ID": "idle.worker:8083",
+                "HEALTHCHECK_BROKER_CHECK_TTL": "0"}, "9-healthy-multiple-connectors")
+scenario_79 = (dict(scenario_78[0], HEALTHCHECK_ENGINE="asyncio"), "9-healthy-multiple-connectors")
+scenario_80 = ({"HEALTHCHECK_CONNECT_WORKER_ID": "idle.worker:8083", "HEALTHCHECK_BROKER_CHECK_TTL": "0.5"}, "9-healthy-multiple-connectors")
+scenario_81 = (dict(scenario_80[0], HEALTHCHECK_ENGINE="asyncio"), "9-healthy-multiple-connectors")
+scenario_83 = ({}, "10-unhealthy-multiple-connectors")
+scenario_84 = ({"HEALTHCHECK_ENGINE": "asyncio"}, "10-unhealthy-multiple-connectors")
+scenario_85 = ({"HEALTHCHECK_PROBE_MAX_AGE": "0"}, "10-unhealthy-multiple-connectors")
 other_scenarios = ({}, None)
 
 
@@ -45,7 +149,7 @@ def test_1_healthy(run_backend, request):
         assert json.loads(response.content.decode("utf-8")) == json.load(f)
 
 
-@pytest.mark.parametrize("run_backend", [scenario_2], indirect=True)
+@pytest.mark.parametrize("run_backend", [scenario_2, scenario_51], indirect=True)
 def test_2_unhealthy(run_backend):
     with open("tests/data/expected/2-unhealthy.json", "r") as f:
         response = requests.get("http://localhost:18083")
@@ -138,7 +242,7 @@ def test_12_unhealthy_task_with_trace(run_backend):
         assert json.loads(response.content.decode("utf-8")) == json.load(f)
 
 
-@pytest.mark.parametrize("run_backend", [scenario_13], indirect=True)
+@pytest.mark.parametrize("run_backend", [scenario_13, scenario_52], indirect=True)
 def test_13_unhealthy_broker_connection(run_backend):
     with open("tests/data/expected/13-unhealthy-broker-connection.json", "r") as f:
         response = requests.get("http://localhost:18083")
@@ -146,7 +250,7 @@ def test_13_unhealthy_broker_connection(run_backend):
         assert json.loads(response.content.decode("utf-8")) == json.load(f)
 
 
-@pytest.mark.parametrize("run_backend", [scenario_14], indirect=True)
+@pytest.mark.parametrize("run_backend", [scenario_14, scenario_53], indirect=True)
 def test_14_basic_auth(run_backend):
     with open("tests/data/expected/14-basic-auth.json", "r") as f:
         response = requests.get("http://localhost:18083")
@@ -194,7 +298,698 @@ def test_19_unhealthy_container_task(run_backend):
         assert json.loads(response.content.decode("utf-8")) == json.load(f)
 
 
-@pytest.mark.parametrize("test_input", ["test", "does/not/exist", "kafka", "this-is-a-long/url", "connectors"])
+@pytest.mark.parametrize("run_backend", [scenario_20, scenario_54], indirect=True)
+def test_20_unhealthy_per_connector_multiple_connectors(run_backend):
+    with open("tests/data/expected/20-unhealthy-per-connector-multiple-connectors.json", "r") as f:
+        response = requests.get("http://localhost:18083")
+        assert response.status_code == 503
+        assert json.loads(response.content.decode("utf-8")) == json.load(f)
+
+
+@pytest.mark.parametrize("run_backend", [scenario_21], indirect=True)
+def test_21_unhealthy_legacy_expand_multiple_connectors(run_backend):
+    with open("tests/data/expected/21-unhealthy-legacy-expand-multiple-connectors.json", "r") as f:
+        response = requests.get("http://localhost:18083")
+        assert response.status_code == 503
+        assert json.loads(response.content.decode("utf-8")) == json.load(f)
+
+
+@pytest.mark.parametrize("run_backend", [scenario_22], indirect=True)
+def test_22_unhealthy_connector_status_error(run_backend):
+    with open("tests/data/expected/22-unhealthy-connector-status-error.json", "r") as f:
+        response = requests.get("http://localhost:18083")
+        assert response.status_code == 503
+        assert json.loads(response.content.decode("utf-8")) == json.load(f)
+
+
+@pytest.mark.parametrize("run_backend", [scenario_23, scenario_55], indirect=True)
+def test_23_unhealthy_background_poller(run_backend):
+    with open("tests/data/expected/10-unhealthy-multiple-connectors.json", "r") as f:
+        response = requests.get("http://localhost:18083")
+        actual_response = json.loads(response.content.decode("utf-8"))
+        assert response.status_code == 503
+        assert int(response.headers.get("Age")) >= 0
+        assert actual_response.pop("max_staleness") == 15.0
+        assert actual_response.pop("snapshot_timestamp") <= time.time()
+        assert actual_response == json.load(f)
+
+
+@pytest.mark.parametrize("run_backend", [scenario_24], indirect=True)
+def test_24_unhealthy_stale_snapshot(run_backend):
+    time.sleep(1)
+    response = requests.get("http://localhost:18083")
+    actual_response = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 503
+    assert actual_response["healthy"] is False
+    assert actual_response["failures"] == []
+    assert actual_response["max_staleness"] == 0.5
+    assert actual_response["message"] == "Health snapshot is older than the max staleness, assuming unhealthy."
+
+
+@pytest.mark.parametrize("run_backend", [scenario_25], indirect=True)
+def test_25_concurrent_probes_are_coalesced(run_backend):
+    with open("tests/data/expected/1-healthy.json", "r") as f, ThreadPoolExecutor(max_workers=5) as executor:
+        expected_response = json.load(f)
+        futures = [executor.submit(requests.get, "http://localhost:18083") for _ in range(5)]
+        time.sleep(0.2)
+
+        start = time.time()
+        ping_response = requests.get("http://localhost:18083/ping")
+        assert ping_response.status_code == 200
+        assert time.time() - start < 0.5
+
+        for future in futures:
+            response = future.result()
+            assert response.status_code == 200
+            assert json.loads(response.content.decode("utf-8")) == expected_response
+    assert mocks.request_counts[("25-healthy-slow", "/connectors")] == 1
+
+
+@pytest.mark.parametrize("run_backend", [scenario_26], indirect=True)
+def test_26_asyncio_unhealthy_multiple_connectors(run_backend):
+    with open("tests/data/expected/10-unhealthy-multiple-connectors.json", "r") as f, requests.Session() as session:
+        expected_response = json.load(f)
+        for _ in range(2):
+            response = session.get("http://localhost:18083")
+            assert response.status_code == 503
+            assert json.loads(response.content.decode("utf-8")) == expected_response
+
+
+@pytest.mark.parametrize("run_backend", [scenario_27], indirect=True)
+def test_27_asyncio_basic_auth(run_backend):
+    with open("tests/data/expected/14-basic-auth.json", "r") as f:
+        response = requests.get("http://localhost:18083")
+        assert response.status_code == 200
+        assert json.loads(response.content.decode("utf-8")) == json.load(f)
+
+
+@pytest.mark.parametrize("run_backend", [scenario_28], indirect=True)
+def test_28_asyncio_concurrent_probes_are_coalesced(run_backend):
+    with open("tests/data/expected/1-healthy.json", "r") as f, ThreadPoolExecutor(max_workers=5) as executor:
+        expected_response = json.load(f)
+        futures = [executor.submit(requests.get, "http://localhost:18083") for _ in range(5)]
+        time.sleep(0.2)
+
+        start = time.time()
+        ping_response = requests.get("http://localhost:18083/ping")
+        assert ping_response.status_code == 200
+        assert json.loads(ping_response.content.decode("utf-8")) == {"status": "UP"}
+        assert time.time() - start < 0.5
+
+        for future in futures:
+            response = future.result()
+            assert response.status_code == 200
+            assert json.loads(response.content.decode("utf-8")) == expected_response
+    assert mocks.request_counts[("28-healthy-slow", "/connectors")] == 1
+
+
+@pytest.mark.parametrize("run_backend", [scenario_29, scenario_30], indirect=True)
+def test_29_unhealthy_adaptive_polling(run_backend, request):
+    mock_name = request.node.callspec.params["run_backend"][1]
+    with open("tests/data/expected/29-unhealthy-adaptive-polling.json", "r") as f:
+        expected_response = json.load(f)
+        for _ in range(3):
+            response = requests.get("http://localhost:18083")
+            assert response.status_code == 503
+            assert json.loads(response.content.decode("utf-8")) == expected_response
+    # new connectors are polled again on the next probe; once stable, they are served from the cache
+    # while the failing connector is polled on every probe
+    assert mocks.request_counts[(mock_name, "/connectors")] == 3
+    assert mocks.request_counts[(mock_name, "/connectors/s3-source/status")] == 2
+    assert mocks.request_counts[(mock_name, "/connectors/s3-sink/status")] == 3
+
+
+@pytest.mark.parametrize("run_backend", [scenario_31, scenario_32], indirect=True)
+def test_31_metrics(run_backend):
+    response = requests.get("http://localhost:18083/metrics")
+    assert response.status_code == 200
+    assert response.headers.get("Content-type") == "text/plain; version=0.0.4; charset=utf-8"
+    lines = response.content.decode("utf-8").splitlines()
+    assert "kafka_connect_healthcheck_healthy 0" in lines
+    assert "kafka_connect_healthcheck_failure_rate 0.3" in lines
+    assert "kafka_connect_healthcheck_failure_threshold 0.0" in lines
+    assert "kafka_connect_healthcheck_failures{type=\"task\"} 2" in lines
+    assert "kafka_connect_healthcheck_connector_state{connector=\"s3-source\",state=\"FAILED\",worker_id=\"my.worker.name:8083\"} 1" in lines
+    assert "kafka_connect_healthcheck_task_state{connector=\"s3-sink\",task=\"2\",state=\"FAILED\",worker_id=\"my.worker.name:8083\"} 1" in lines
+    assert "kafka_connect_healthcheck_evaluations_total 1" in lines
+    assert any(line.startswith("kafka_connect_healthcheck_startup_seconds ") for line in lines)
+    assert "kafka_connect_healthcheck_evaluation_duration_seconds_count 1" in lines
+    assert "kafka_connect_healthcheck_upstream_requests_total{endpoint=\"get_connector_names\",outcome=\"success\"} 1" in lines
+    assert "kafka_connect_healthcheck_upstream_requests_total{endpoint=\"get_connector_status\",outcome=\"success\"} 2" in lines
+    assert "kafka_connect_healthcheck_upstream_request_duration_seconds_count{endpoint=\"get_connector_status\"} 2" in lines
+    assert "kafka_connect_healthcheck_upstream_connections_created_total 3" in lines
+
+
+def test_31_metrics_unassigned_task():
+    health_metrics = metrics.HealthMetrics()
+    snapshot = snapshots.StatusSnapshot.from_statuses([{"name": "s3-sink", "state": "RUNNING", "worker_id": "my.worker.name:8083",
+                                                         "tasks": [{"id": 0, "state": "UNASSIGNED", "worker_id": None}]}])
+    health_metrics.observe_evaluation(snapshot, {"healthy": True, "failures": []}, 0.1)
+    # a task without a worker is labelled like a connector without one, with an empty worker id
+    assert "kafka_connect_healthcheck_task_state{connector=\"s3-sink\",task=\"0\",state=\"UNASSIGNED\",worker_id=\"\"} 1" in \
+        health_metrics.render().splitlines()
+
+
+@pytest.mark.parametrize("run_backend", [scenario_33, scenario_34], indirect=True)
+def test_33_debug_timings(run_backend):
+    for _ in range(3):
+        assert requests.get("http://localhost:18083").status_code == 503
+    response = requests.get("http://localhost:18083/debug/timings")
+    assert response.status_code == 200
+    timings = json.loads(response.content.decode("utf-8"))
+    assert timings["unit"] == "seconds"
+    assert sorted(timings["phases"].keys()) == ["build_snapshot", "calculate_health_result", "collect_statuses", "evaluation",
+                                                "get_connectors_health", "handle_broker_healthcheck", "handle_healthcheck", "index_connectors",
+                                                "index_probes", "json_encode",
+                                                "logging", "record_history"]
+    assert sorted(timings["upstream"].keys()) == ["get_connector_details", "get_connector_names", "get_connector_status"]
+    evaluation = timings["phases"]["evaluation"]
+    assert evaluation["count"] == 3
+    assert 0 <= evaluation["p50"] <= evaluation["p95"] <= evaluation["p99"] <= evaluation["max"]
+
+
+@pytest.mark.parametrize("run_backend", [scenario_35], indirect=True)
+def test_35_aggregate_workers(run_backend):
+    sweeps = mocks.request_counts[("7-unhealthy-worker-id-with-other-workers-healthy", "/connectors")]
+    with open("tests/data/expected/7-unhealthy-worker-id-with-other-workers-healthy.json", "r") as f:
+        response = requests.get("http://localhost:18083/workers/kafka-connect:8083")
+        actual_response = json.loads(response.content.decode("utf-8"))
+        assert response.status_code == 503
+        assert int(response.headers.get("Age")) >= 0
+        assert actual_response.pop("max_staleness") == 180.0
+        assert actual_response.pop("snapshot_timestamp") <= time.time()
+        assert actual_response == json.load(f)
+
+    for worker_id in ["test-worker", "unknown-worker%3A8083"]:
+        response = requests.get("http://localhost:18083/workers/{}".format(worker_id))
+        actual_response = json.loads(response.content.decode("utf-8"))
+        assert response.status_code == 200
+        assert actual_response["failures"] == []
+        assert actual_response["failure_rate"] == 0.0
+
+    assert requests.get("http://localhost:18083/workers/").status_code == 404
+    # every worker is served from the snapshot of a single cluster-wide sweep
+    assert mocks.request_counts[("7-unhealthy-worker-id-with-other-workers-healthy", "/connectors")] == sweeps
+
+
+@pytest.mark.parametrize("run_backend", [scenario_36], indirect=True)
+def test_36_asyncio_aggregate_workers(run_backend):
+    with open("tests/data/expected/6-healthy-worker-id-with-other-workers-failing.json", "r") as f:
+        response = requests.get("http://localhost:18083/workers/KAFKA-CONNECT:8083")
+        assert response.status_code == 200
+        assert json.loads(response.content.decode("utf-8")) == json.load(f)
+
+    response = requests.get("http://localhost:18083/workers/failing-worker")
+    actual_response = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 503
+    assert [failure["type"] for failure in actual_response["failures"]] == ["connector", "task"]
+    assert actual_response["failure_rate"] == 1.0
+
+
+@pytest.mark.parametrize("run_backend", [scenario_37, scenario_38], indirect=True)
+def test_37_clusters(run_backend):
+    with open("tests/data/expected/10-unhealthy-multiple-connectors.json", "r") as f:
+        response = requests.get("http://localhost:18083/clusters/strict")
+        actual_response = json.loads(response.content.decode("utf-8"))
+        actual_response.pop("max_staleness", None)
+        actual_response.pop("snapshot_timestamp", None)
+        assert response.status_code == 503
+        assert actual_response == json.load(f)
+
+    response = requests.get("http://localhost:18083/clusters/lenient")
+    actual_response = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 200
+    assert actual_response["failure_rate"] == 0.25
+    assert actual_response["failure_threshold"] == 0.5
+
+    for path in ["", "clusters"]:
+        response = requests.get("http://localhost:18083/{}".format(path))
+        summary = json.loads(response.content.decode("utf-8"))
+        assert response.status_code == 503
+        assert summary["healthy"] is False
+        assert list(summary["clusters"].keys()) == ["strict", "lenient"]
+        assert summary["clusters"]["strict"]["healthy"] is False
+        assert summary["clusters"]["strict"]["failures"] == 3
+        assert summary["clusters"]["lenient"]["healthy"] is True
+
+    assert requests.get("http://localhost:18083/clusters/unknown").status_code == 404
+    assert requests.get("http://localhost:18083/metrics").status_code == 404
+
+
+@pytest.mark.parametrize("run_backend", [scenario_39, scenario_40, scenario_56], indirect=True)
+def test_39_etag_not_modified(run_backend):
+    response = requests.get("http://localhost:18083")
+    etag = response.headers.get("ETag")
+    assert response.status_code == 503
+    assert etag.startswith('"') and etag.endswith('"')
+    assert requests.get("http://localhost:18083").headers.get("ETag") == etag
+
+    for if_none_match in [etag, "W/{}".format(etag), '"other", {}'.format(etag), "*"]:
+        response = requests.get("http://localhost:18083", headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304
+        assert response.headers.get("ETag") == etag
+        assert response.content == b""
+        assert "Content-Length" not in response.headers
+
+    response = requests.get("http://localhost:18083", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 503
+    assert json.loads(response.content.decode("utf-8"))["failure_rate"] == 0.3
+
+
+@pytest.mark.parametrize("run_backend", [scenario_41], indirect=True)
+def test_41_trace_modes(run_backend):
+    full = json.loads(requests.get("http://localhost:18083").content.decode("utf-8"))
+    assert [failure["trace"].count("\n") for failure in full["failures"]] == [4, 4, 4, 1]
+    assert "traces" not in full
+
+    response = requests.get("http://localhost:18083/?traces=truncated")
+    truncated = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 503
+    assert truncated["failures"][0]["trace"] == "org.apache.kafka.connect.errors.ConnectException: broker unavailable\n" \
+                                                "\tat Worker.frame0(Worker.java:100)\n\t... 3 more lines"
+    assert truncated["failures"][3]["trace"] == full["failures"][3]["trace"]
+    assert response.headers.get("ETag") != requests.get("http://localhost:18083").headers.get("ETag")
+
+    deduplicated = json.loads(requests.get("http://localhost:18083/?traces=deduplicated").content.decode("utf-8"))
+    trace_ids = [failure["trace_id"] for failure in deduplicated["failures"]]
+    assert trace_ids[0] == trace_ids[1] == trace_ids[2] != trace_ids[3]
+    assert deduplicated["traces"] == {trace_ids[0]: full["failures"][0]["trace"], trace_ids[3]: full["failures"][3]["trace"]}
+    assert all("trace" not in failure for failure in deduplicated["failures"])
+
+    # the result of a single task carries its trace at the top level, which is rendered the same way
+    task = json.loads(requests.get("http://localhost:18083/connectors/s3-sink/tasks/0?traces=truncated").content.decode("utf-8"))
+    assert task["trace"] == truncated["failures"][0]["trace"]
+    task = json.loads(requests.get("http://localhost:18083/connectors/s3-sink/tasks/0?traces=deduplicated").content.decode("utf-8"))
+    assert "trace" not in task
+    assert task["traces"] == {task["trace_id"]: full["failures"][0]["trace"]}
+
+
+def test_41_trace_max_lines_must_not_be_negative():
+    with pytest.raises(SystemExit):
+        parser.get_parser().parse_args(["--trace-max-lines", "-1"])
+    assert parser.get_parser().parse_args(["--trace-max-lines", "0"]).trace_max_lines == 0
+
+
+@pytest.mark.parametrize("run_backend", [scenario_42], indirect=True)
+def test_42_asyncio_trace_mode_flag(run_backend):
+    deduplicated = json.loads(requests.get("http://localhost:18083").content.decode("utf-8"))
+    assert len(deduplicated["traces"]) == 2
+    assert len(deduplicated["failures"]) == 4
+
+    full = json.loads(requests.get("http://localhost:18083/?traces=full").content.decode("utf-8"))
+    assert "traces" not in full
+    assert full["failures"][0]["trace"] == deduplicated["traces"][deduplicated["failures"][0]["trace_id"]]
+
+
+@pytest.mark.parametrize("run_backend", [scenario_43], indirect=True)
+def test_43_deadline_unresolved_failed(run_backend):
+    start = time.time()
+    response = requests.get("http://localhost:18083")
+    actual_response = json.loads(response.content.decode("utf-8"))
+    assert time.time() - start < 2.5
+    assert response.status_code == 503
+    assert actual_response["unresolved"] == ["local-file-source"]
+    assert actual_response["unresolved_policy"] == "failed"
+    assert actual_response["failures"][0] == {
+        "type": "connector",
+        "connector": "local-file-source",
+        "state": "UNRESOLVED",
+        "worker_id": None,
+        "error": "Evaluation deadline exceeded before the connector status was fetched"
+    }
+    assert actual_response["failure_rate"] == 1.0
+
+
+@pytest.mark.parametrize("run_backend", [scenario_44, scenario_45], indirect=True)
+def test_44_deadline_unresolved_not_failed(run_backend, request):
+    policy = request.node.callspec.params["run_backend"][0]["HEALTHCHECK_UNRESOLVED_POLICY"]
+    start = time.time()
+    response = requests.get("http://localhost:18083")
+    actual_response = json.loads(response.content.decode("utf-8"))
+    assert time.time() - start < 2.5
+    assert response.status_code == 200
+    assert actual_response["unresolved"] == ["local-file-source"]
+    assert actual_response["unresolved_policy"] == policy
+    assert actual_response["failures"] == []
+    assert actual_response["failure_rate"] == 0.0
+
+
+@pytest.mark.parametrize("run_backend", [scenario_46, scenario_47], indirect=True)
+def test_46_log_mode_transitions(run_backend):
+    with open("tests/data/expected/10-unhealthy-multiple-connectors.json", "r") as f:
+        expected_response = json.load(f)
+    # repeated evaluations only change what is logged, never the health result
+    for _ in range(3):
+        response = requests.get("http://localhost:18083")
+        assert response.status_code == 503
+        assert json.loads(response.content.decode("utf-8")) == expected_response
+
+
+@pytest.mark.parametrize("run_backend", [scenario_48, scenario_49], indirect=True)
+def test_48_history_flapping(run_backend):
+    status_codes = [requests.get("http://localhost:18083").status_code for _ in range(6)]
+    assert all(first != second for first, second in zip(status_codes, status_codes[1:]))
+    failing = [status_code == 503 for status_code in status_codes[-4:]]
+    response = requests.get("http://localhost:18083/history")
+    history = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 200
+    assert history["capacity"] == 4
+    assert history["flap_threshold"] == 3
+    # only the last 4 evaluations are kept, oldest first
+    assert [not evaluation["healthy"] for evaluation in history["evaluations"]] == failing
+    assert [evaluation["failure_rate"] for evaluation in history["evaluations"]] == [0.2 if f else 0.0 for f in failing]
+    assert history["connectors"]["s3-sink"] == {
+        "states": ["RUNNING", "RUNNING", "RUNNING", "RUNNING"],
+        "unhealthy_tasks": [1 if f else 0 for f in failing],
+        "changes": 3,
+        "flapping": True
+    }
+    assert history["connectors"]["s3-source"]["changes"] == 0
+    assert history["flapping"] == ["s3-sink"]
+
+
+@pytest.mark.parametrize("run_backend", [scenario_50], indirect=True)
+def test_50_history_disabled(run_backend):
+    assert requests.get("http://localhost:18083").status_code == 200
+    assert requests.get("http://localhost:18083/history").status_code == 404
+
+
+@pytest.mark.parametrize("run_backend", [scenario_55], indirect=True)
+def test_55_prefork_shared_snapshot(run_backend):
+    with open("tests/data/expected/10-unhealthy-multiple-connectors.json", "r") as f, ThreadPoolExecutor(max_workers=8) as executor:
+        expected_response = json.load(f)
+        requests.get("http://localhost:18083")
+        sweeps = mocks.request_counts[("10-unhealthy-multiple-connectors", "/connectors")]
+        responses = list(executor.map(lambda _: requests.get("http://localhost:18083"), range(32)))
+    # every process serves the snapshot published by the polling process, so probes never reach Kafka Connect
+    assert len({response.headers.get("ETag") for response in responses}) == 1
+    for response in responses:
+        actual_response = json.loads(response.content.decode("utf-8"))
+        assert response.status_code == 503
+        assert actual_response.pop("snapshot_timestamp") <= time.time()
+        assert actual_response.pop("max_staleness") == 15.0
+        assert actual_response == expected_response
+    assert mocks.request_counts[("10-unhealthy-multiple-connectors", "/connectors")] == sweeps
+
+    deduplicated = json.loads(requests.get("http://localhost:18083/?traces=deduplicated").content.decode("utf-8"))
+    assert deduplicated["failures"] == expected_response["failures"]
+    assert requests.get("http://localhost:18083/ping").status_code == 200
+
+    # every other endpoint is relayed to the polling process and served from the same snapshot
+    assert requests.get("http://localhost:18083/ready").status_code == 503
+    connector_response = requests.get("http://localhost:18083/connectors/s3-sink")
+    assert connector_response.status_code == 503
+    assert json.loads(connector_response.content.decode("utf-8"))["connector"] == "s3-sink"
+    assert requests.get("http://localhost:18083/connectors/unknown").status_code == 404
+    metrics_response = requests.get("http://localhost:18083/metrics")
+    assert metrics_response.status_code == 200
+    assert "kafka_connect_healthcheck_" in metrics_response.content.decode("utf-8")
+    with requests.get("http://localhost:18083/watch", stream=True, timeout=5) as response:
+        assert response.status_code == 200
+        assert response.headers.get("Connection") == "close"
+        assert read_watch_events(response, 1)[0]["event"] == "snapshot"
+
+
+@pytest.mark.parametrize("run_backend", [scenario_41, scenario_57], indirect=True)
+def test_57_keep_alive_and_gzip(run_backend):
+    connection = http.client.HTTPConnection("localhost", 18083)
+    responses = []
+    for accept_encoding in ["identity", "gzip", "gzip;q=0", "deflate, gzip", "gzip"]:
+        connection.request("GET", "/", headers={"Accept-Encoding": accept_encoding})
+        response = connection.getresponse()
+        body = response.read()
+        # every request is served on the same persistent connection
+        assert response.version == 11
+        assert not response.will_close
+        assert int(response.getheader("Content-Length")) == len(body)
+        assert response.getheader("Vary") == "Accept-Encoding"
+        responses.append((response, body))
+
+    identity, gzipped, refused, preferred, cached = responses
+    assert identity[0].getheader("Content-Encoding") is None
+    assert refused[0].getheader("Content-Encoding") is None
+    assert refused[1] == identity[1]
+    assert gzipped[0].getheader("Content-Encoding") == "gzip"
+    assert gzip.decompress(gzipped[1]) == identity[1]
+    assert preferred[1] == cached[1] == gzipped[1]
+    assert gzipped[0].getheader("ETag") != identity[0].getheader("ETag")
+
+    connection.request("GET", "/", headers={"Accept-Encoding": "gzip", "If-None-Match": gzipped[0].getheader("ETag")})
+    response = connection.getresponse()
+    assert response.status == 304
+    assert response.read() == b""
+    assert response.getheader("Content-Length") is None
+    connection.close()
+
+
+@pytest.mark.parametrize("run_backend", [scenario_58, scenario_59], indirect=True)
+def test_58_broker_check_retried_and_cached(run_backend):
+    details_paths = [("58-unhealthy-broker-rotation", "/connectors/{}".format(name)) for name in ["s3-source", "s3-sink"]]
+    before = [mocks.request_counts[path] for path in details_paths]
+    for _ in range(3):
+        response = requests.get("http://localhost:18083")
+        actual_response = json.loads(response.content.decode("utf-8"))
+        assert response.status_code == 503
+        assert actual_response["failures"] == [{"type": "broker", "connector": "s3-sink"}]
+    # the failed attempt was retried against the next connector, and later probes read the cached result
+    assert [mocks.request_counts[path] - count for path, count in zip(details_paths, before)] == [1, 1]
+
+
+@pytest.mark.parametrize("run_backend", [scenario_60], indirect=True)
+def test_60_broker_check_rotates(run_backend):
+    details_paths = [("9-healthy-multiple-connectors", "/connectors/{}".format(name)) for name in ["s3-source", "s3-sink"]]
+    before = [mocks.request_counts[path] for path in details_paths]
+    for _ in range(4):
+        response = requests.get("http://localhost:18083")
+        assert response.status_code == 200
+        assert json.loads(response.content.decode("utf-8"))["failures"] == []
+    assert [mocks.request_counts[path] - count for path, count in zip(details_paths, before)] == [2, 2]
+
+
+def read_watch_events(response, count=None):
+    events = []
+    event = {}
+    for line in response.iter_lines(chunk_size=1, decode_unicode=True):
+        if line.startswith(":"):
+            continue
+        if line:
+            key, _, value = line.partition(": ")
+            event[key] = json.loads(value) if key == "data" else value
+            continue
+        events.append(event)
+        event = {}
+        if count is not None and len(events) == count:
+            break
+    return events
+
+
+@pytest.mark.parametrize("run_backend", [scenario_61, scenario_62], indirect=True)
+def test_61_watch_stream(run_backend):
+    with requests.get("http://localhost:18083/watch", stream=True, timeout=5) as response:
+        assert response.status_code == 200
+        assert response.headers.get("Content-type") == "text/event-stream"
+        events = read_watch_events(response, 5)
+
+    snapshot = events[0]
+    assert snapshot["event"] == "snapshot"
+    assert sorted(snapshot["data"]["connectors"]) == ["s3-sink", "s3-source"]
+    assert [task["id"] for task in snapshot["data"]["connectors"]["s3-sink"]["tasks"]] == [0, 1]
+    # every later evaluation flips task 0 of s3-sink, and with it the health result
+    changes = events[1:]
+    assert {event["event"] for event in changes} == {"health", "task"}
+    for event in changes:
+        if event["event"] == "task":
+            assert (event["data"]["connector"], event["data"]["id"]) == ("s3-sink", 0)
+            assert {event["data"]["state"], event["data"]["previous_state"]} == {"FAILED", "RUNNING"}
+        else:
+            assert event["data"]["healthy"] != event["data"]["previous_healthy"]
+    assert [int(event["id"]) for event in events] == sorted(int(event["id"]) for event in events)
+
+
+@pytest.mark.parametrize("run_backend", [scenario_63], indirect=True)
+def test_63_watch_evicts_slow_subscribers(run_backend):
+    # each evaluation produces two events, more than a buffer of one holds, so the stream ends after the snapshot
+    with requests.get("http://localhost:18083/watch", stream=True, timeout=5) as response:
+        events = read_watch_events(response)
+    assert [event["event"] for event in events] == ["snapshot"]
+
+
+@pytest.mark.parametrize("run_backend", [scenario_64, scenario_65], indirect=True)
+def test_64_probes(run_backend):
+    sweeps = mocks.request_counts[("10-unhealthy-multiple-connectors", "/connectors")]
+    with open("tests/data/expected/10-unhealthy-multiple-connectors.json", "r") as f:
+        expected_response = json.load(f)
+    response = requests.get("http://localhost:18083/")
+    actual_response = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 503
+    assert actual_response["failures"] == expected_response["failures"]
+
+    response = requests.get("http://localhost:18083/live")
+    actual_response = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 200
+    assert actual_response["failures"] == expected_response["failures"]
+    assert (actual_response["failure_rate"], actual_response["failure_threshold"]) == (0.3, 0.5)
+    assert actual_response.pop("max_staleness") == 180.0
+    assert actual_response.pop("snapshot_timestamp") <= time.time()
+
+    response = requests.get("http://localhost:18083/ready")
+    actual_response = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 503
+    assert actual_response["failures"] == expected_response["failures"][:1]
+    assert actual_response["failure_rate"] == 0.5
+
+    response = requests.get("http://localhost:18083/startup")
+    actual_response = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 200
+    assert actual_response["failures"] == []
+    assert actual_response["failure_states"] == ["UNASSIGNED"]
+
+    # every probe is derived from the snapshot of a single sweep
+    assert mocks.request_counts[("10-unhealthy-multiple-connectors", "/connectors")] == sweeps
+
+
+@pytest.mark.parametrize("run_backend", [scenario_66, scenario_67, scenario_68, scenario_69], indirect=True)
+def test_66_connector_endpoints(run_backend, request):
+    polled = "HEALTHCHECK_POLL_INTERVAL" in request.node.callspec.params["run_backend"][0]
+    if polled:
+        # waits for the first snapshot, so the index is built before the counts are taken
+        requests.get("http://localhost:18083/")
+    paths = [("10-unhealthy-multiple-connectors", path) for path in ["/connectors", "/connectors/s3-sink/status"]]
+    before = [mocks.request_counts[path] for path in paths]
+
+    response = requests.get("http://localhost:18083/connectors/s3-sink")
+    actual_response = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 503
+    assert ("snapshot_timestamp" in actual_response) == polled
+    assert (actual_response["connector"], actual_response["state"], actual_response["worker_id"]) == ("s3-sink", "RUNNING",
+                                                                                                      "my.worker.name:8083")
+    assert [(failure["type"], failure.get("id")) for failure in actual_response["failures"]] == [("task", 2)]
+    assert actual_response["failure_rate"] == 0.2
+
+    response = requests.get("http://localhost:18083/connectors/s3-sink/tasks/0")
+    actual_response = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 200
+    assert (actual_response["connector"], actual_response["id"], actual_response["state"]) == ("s3-sink", 0, "RUNNING")
+
+    assert requests.get("http://localhost:18083/connectors/s3-sink/tasks/2").status_code == 503
+    for path in ["connectors/s3-sink/tasks/9", "connectors/s3-sink/tasks/first", "connectors/unknown", "connectors/"]:
+        response = requests.get("http://localhost:18083/{}".format(path))
+        assert response.status_code == 404
+        assert response.content == b""
+
+    # connectors are looked up in the latest snapshot, or fetched one at a time, and never cause a sweep
+    assert [mocks.request_counts[path] - count for path, count in zip(paths, before)] == [0, 0 if polled else 4]
+
+
+@pytest.mark.parametrize("run_backend", [scenario_70, scenario_71], indirect=True)
+def test_70_connector_listing_error(run_backend):
+    response = requests.get("http://localhost:18083/")
+    actual_response = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 503
+    assert actual_response["message"] == "Exception raised while attempting to calculate health result, assuming unhealthy."
+    assert "409" in actual_response["error"]
+    # the error body is not mistaken for connectors named after its fields
+    assert "failures" not in actual_response
+    assert "error_code" not in requests.get("http://localhost:18083/metrics").text
+
+
+@pytest.mark.parametrize("run_backend", [scenario_72, scenario_73, scenario_74], indirect=True)
+def test_72_connection_pool_stats(run_backend):
+    for _ in range(3):
+        assert requests.get("http://localhost:18083").status_code == 200
+    lines = requests.get("http://localhost:18083/metrics").content.decode("utf-8").splitlines()
+    # four evaluations each list the connectors and fetch one status, all on the first pooled connection
+    assert "kafka_connect_healthcheck_upstream_connections_created_total 1" in lines
+    assert "kafka_connect_healthcheck_upstream_connections_reused_total 7" in lines
+
+
+@pytest.mark.parametrize("run_backend", [scenario_75, scenario_76, scenario_77], indirect=True)
+def test_75_connector_names_are_quoted(run_backend):
+    paths = [("75-healthy-connector-names", path.format(name)) for name in ["s3 sink", "zürich-source"]
+             for path in ["/connectors/{}/status", "/connectors/{}"]]
+    before = [mocks.request_counts[path] for path in paths]
+    for _ in range(2):
+        response = requests.get("http://localhost:18083")
+        actual_response = json.loads(response.content.decode("utf-8"))
+        assert response.status_code == 200
+        assert actual_response["failures"] == []
+    # every status was fetched, and the broker check of each evaluation fetched the details of the next connector in turn
+    assert [mocks.request_counts[path] - count for path, count in zip(paths, before)] == [2, 1, 2, 1]
+
+    response = requests.get("http://localhost:18083/connectors/s3%20sink")
+    assert response.status_code == 200
+    assert json.loads(response.content.decode("utf-8"))["connector"] == "s3 sink"
+
+
+@pytest.mark.parametrize("run_backend", [scenario_78, scenario_79], indirect=True)
+def test_78_aggregate_workers_check_brokers_once(run_backend):
+    paths = [("9-healthy-multiple-connectors", "/connectors/{}".format(name)) for name in ["s3-source", "s3-sink"]]
+    before = sum(mocks.request_counts[path] for path in paths)
+    for _ in range(3):
+        assert requests.get("http://localhost:18083").status_code == 200
+    assert requests.get("http://localhost:18083/workers/idle.worker:8083").status_code == 200
+    # the result and the per-worker index share the broker check of each evaluation, and the worker is served from the last one
+    assert sum(mocks.request_counts[path] for path in paths) - before == 3
+
+
+@pytest.mark.parametrize("run_backend", [scenario_80, scenario_81], indirect=True)
+def test_80_broker_check_refreshes_in_background(run_backend):
+    paths = [("9-healthy-multiple-connectors", "/connectors/{}".format(name)) for name in ["s3-source", "s3-sink"]]
+    before = sum(mocks.request_counts[path] for path in paths)
+    assert requests.get("http://localhost:18083").status_code == 200
+    time.sleep(1.3)
+    # the checks after the first one run without any probe
+    assert sum(mocks.request_counts[path] for path in paths) - before >= 3
+
+
+def test_80_background_broker_check_expires():
+    check = broker_check.BrokerCheck(ttl=30)
+    check.refreshed_in_background = True
+    check.record([], now=100.0)
+    assert check.get_cached_failures(now=145.0) == []
+    # a refresh that stopped running no longer vouches for the brokers, so evaluations check them again
+    assert check.get_cached_failures(now=160.0) is None
+
+
+def test_82_clusters_not_ready_until_first_refresh():
+    # the fixture waits for a healthy server, so the fleet is run in-process to observe it before its first refresh
+    port = mocks.get_free_port()
+    mocks.start_mock_server(port, "82-healthy-slow")
+    cluster_health = health.Health("http://localhost:{}".format(port), None, ["FAILED"], None, 0, ["CONNECTOR", "TASK"])
+    health_fleet = fleet.Fleet({"slow": cluster_health}, poll_interval=60)
+    health_fleet.start()
+    try:
+        summary = health_fleet.get_summary()
+        assert summary["healthy"] is False
+        assert summary["clusters"]["slow"] == {"healthy": False, "failures": 0,
+                                               "message": "The first health evaluation of this cluster has not finished yet."}
+        assert health_fleet.providers["slow"].first_snapshot.wait(5)
+        assert health_fleet.get_cluster_health_result("slow")["healthy"] is True
+        assert health_fleet.get_summary()["healthy"] is True
+    finally:
+        health_fleet.stop()
+
+
+@pytest.mark.parametrize("run_backend", [scenario_83, scenario_84, scenario_85], indirect=True)
+def test_83_probes_share_one_sweep_without_poller(run_backend, request):
+    max_age = float(request.node.callspec.params["run_backend"][0].get("HEALTHCHECK_PROBE_MAX_AGE", 10))
+    before = mocks.request_counts[("10-unhealthy-multiple-connectors", "/connectors")]
+    for index, probe in enumerate(["live", "ready", "startup"]):
+        response = requests.get("http://localhost:18083/{}".format(probe))
+        actual_response = json.loads(response.content.decode("utf-8"))
+        assert response.status_code == 503
+        assert actual_response.get("max_staleness") == (max_age if index > 0 and max_age > 0 else None)
+    # without a poll interval, only the first probe evaluates unless the probe max age is 0
+    assert mocks.request_counts[("10-unhealthy-multiple-connectors", "/connectors")] - before == (1 if max_age > 0 else 3)
+
+
+@pytest.mark.parametrize("run_backend", [other_scenarios], indirect=True)
+def test_debug_timings_disabled(run_backend):
+    response = requests.get("http://localhost:18083/debug/timings")
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("test_input", ["test", "does/not/exist", "kafka", "this-is-a-long/url", "connectors", "watch"])
 @pytest.mark.parametrize("run_backend", [other_scenarios], indirect=True)
 def test_for_404s(run_backend, test_input):
     response = requests.get("http://localhost:18083/{}".format(test_input))